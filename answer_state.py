@@ -0,0 +1,261 @@
+from array import array
+
+# 作答状态：所有题目的作答按位压缩放在一块连续 bytearray 里，第一次改动时才分配
+# 交叉表按原始（未乱序）坐标逐行展开存位，多选每个选项一位，单选存 (下标+1)，0 表示未作答
+# 拖图题每个图片一个字节，存 (区域下标+1)，0 表示未放置
+
+SINGLE_WIDTH = 2
+
+
+def _bits_size(n):
+    return (n + 7) // 8
+
+
+def encode_answer(q, user):
+    """把 QuizMain 的作答格式编码成 AnswerStore 里的原始字节，未作答返回 None"""
+    if user is None:
+        return None
+    t = q['type']
+    if t in ('cross_table', 'multi_choice'):
+        flags = [v for row in user for v in row] if t == 'cross_table' else list(user)
+        out = bytearray(_bits_size(len(flags)))
+        for i, v in enumerate(flags):
+            if v:
+                out[i >> 3] |= 1 << (i & 7)
+        return bytes(out)
+    if t == 'single_choice':
+        return (0 if user < 0 else user + 1).to_bytes(SINGLE_WIDTH, 'little')
+    if t == 'drag_image':
+        return bytes(0 if z < 0 else z + 1 for z in user)
+    return None
+
+
+class AnswerSnapshot:
+    def __init__(self, versions, offsets, widths, arena):
+        self.versions = versions
+        self.offsets = offsets
+        self.widths = widths
+        self.arena = arena
+
+
+class AnswerStore:
+    def __init__(self, questions):
+        self.questions = questions
+        n = len(questions)
+        self._arena = bytearray()
+        self._offsets = array('q', [-1]) * n
+        self._widths = array('I', [0]) * n  # 交叉表的列数，多选的选项数
+        self.versions = array('I', [0]) * n
+        self.seq = 0
+        self.dirty = set()
+        # 改动监听（如会话日志），需实现 bit_changed / single_changed / region_changed
+        self.observer = None
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def _layout(self, q):
+        t = q['type']
+        if t == 'cross_table':
+            cols = len(q['col_names'][0]['items'])
+            return _bits_size(len(q['row_names']) * cols), cols
+        if t == 'multi_choice':
+            n = len(q['options'])
+            return _bits_size(n), n
+        if t == 'single_choice':
+            return SINGLE_WIDTH, 0
+        if t == 'drag_image':
+            n = len(q.get('items', []))
+            return n, n
+        return 0, 0
+
+    def _capacity(self, q):
+        """交叉表、多选可写的位数，拖图题可写的字节数"""
+        t = q['type']
+        if t == 'cross_table':
+            return len(q['row_names']) * len(q['col_names'][0]['items'])
+        if t == 'multi_choice':
+            return len(q['options'])
+        if t == 'drag_image':
+            return len(q.get('items', []))
+        return 0
+
+    def _region(self, idx, layout=None):
+        off = self._offsets[idx]
+        if off < 0:
+            size, width = layout or self._layout(self.questions[idx])
+            off = self._offsets[idx] = len(self._arena)
+            self._widths[idx] = width
+            self._arena.extend(bytes(size))
+        return off
+
+    def _touch(self, idx):
+        self.seq += 1
+        self.versions[idx] = self.seq
+        self.dirty.add(idx)
+
+    # 会话日志和考试服务的记录也走下面这些写入，越界会写到别的题的数据上；考试服务整批生效前也先用它们检查
+    def check_bit(self, idx, bit):
+        if not 0 <= bit < self._capacity(self.questions[idx]):
+            raise IndexError(f'bit {bit} out of range for question {idx}')
+
+    def check_single(self, idx, option):
+        if option is not None and option >= len(self.questions[idx].get('options', ())):
+            raise IndexError(f'option {option} out of range for question {idx}')
+
+    def check_region(self, idx, size):
+        expected, _ = self._layout(self.questions[idx])
+        if size != expected:
+            raise ValueError(f'answer data for question {idx} is {size} bytes, expected {expected}')
+
+    def _set_bit(self, idx, bit, value):
+        self.check_bit(idx, bit)
+        pos = self._region(idx) + (bit >> 3)
+        mask = 1 << (bit & 7)
+        old = self._arena[pos]
+        new = old | mask if value else old & ~mask
+        if new != old:
+            self._arena[pos] = new
+            self._touch(idx)
+            if self.observer is not None:
+                self.observer.bit_changed(idx, bit, value)
+
+    def set_cell(self, idx, row, col, value):
+        """交叉表勾选，row/col 为原始坐标"""
+        self._region(idx)
+        if not 0 <= col < self._widths[idx]:
+            raise IndexError(f'column {col} out of range for question {idx}')
+        self._set_bit(idx, row * self._widths[idx] + col, value)
+
+    def set_choice(self, idx, option, value):
+        self._set_bit(idx, option, value)
+
+    set_bit = set_choice
+
+    def set_single(self, idx, option):
+        self.check_single(idx, option)
+        off = self._region(idx)
+        raw = 0 if option is None or option < 0 else option + 1
+        if int.from_bytes(self._arena[off:off + SINGLE_WIDTH], 'little') != raw:
+            self._arena[off:off + SINGLE_WIDTH] = raw.to_bytes(SINGLE_WIDTH, 'little')
+            self._touch(idx)
+            if self.observer is not None:
+                self.observer.single_changed(idx, option)
+
+    def set_placement(self, idx, item, zone):
+        """拖图题：第 item 个图片放到 zone 区域，-1 为取消放置"""
+        off = self._region(idx)
+        if not 0 <= item < self._widths[idx]:
+            raise IndexError(f'item {item} out of range for question {idx}')
+        raw = 0 if zone is None or zone < 0 else zone + 1
+        if self._arena[off + item] != raw:
+            self._arena[off + item] = raw
+            self._touch(idx)
+            if self.observer is not None:
+                self.observer.region_changed(idx, bytes(self._arena[off:off + self._widths[idx]]))
+
+    def width(self, idx):
+        """已分配的题的列数/选项数/图片数，与 bits() 一起可以不读题目就恢复这题"""
+        return self._widths[idx]
+
+    def bits(self, idx):
+        """某题的原始压缩数据（未分配时为 None）"""
+        off = self._offsets[idx]
+        if off < 0:
+            return None
+        size, _ = self._layout(self.questions[idx])
+        return bytes(self._arena[off:off + size])
+
+    def answered(self, idx):
+        """是否有任何作答（勾了又取消的算未答）"""
+        off = self._offsets[idx]
+        if off < 0:
+            return False
+        size, _ = self._layout(self.questions[idx])
+        return any(self._arena[off:off + size])
+
+    def clear(self, idx):
+        """清空某题作答，复习时重做用"""
+        if self._offsets[idx] >= 0:
+            size, _ = self._layout(self.questions[idx])
+            self.load(idx, bytes(size))
+
+    def load(self, idx, data, width=None):
+        """整题写入压缩数据，用于恢复会话；长度必须与该题的存储大小一致。
+        给出 width（来自可信的一方，如考试服务的会话状态）时按 (len(data), width) 分配，不读题目"""
+        if width is None:
+            self.check_region(idx, len(data))
+        off = self._region(idx, None if width is None else (len(data), width))
+        self._arena[off:off + len(data)] = data
+        self._touch(idx)
+        if self.observer is not None:
+            self.observer.region_changed(idx, data)
+
+    def get(self, idx):
+        """解码成 QuizMain 原来的作答格式（交叉表二维布尔表 / 单选下标 / 多选布尔列表）"""
+        q = self.questions[idx]
+        t = q['type']
+        off = self._offsets[idx]
+        if t == 'cross_table':
+            rows = len(q['row_names'])
+            cols = len(q['col_names'][0]['items'])
+            if off < 0:
+                return [[False] * cols for _ in range(rows)]
+            buf = self._arena
+            return [[bool(buf[off + ((i * cols + j) >> 3)] >> ((i * cols + j) & 7) & 1) for j in range(cols)]
+                    for i in range(rows)]
+        if t == 'multi_choice':
+            n = len(q['options'])
+            if off < 0:
+                return [False] * n
+            buf = self._arena
+            return [bool(buf[off + (j >> 3)] >> (j & 7) & 1) for j in range(n)]
+        if t == 'single_choice':
+            if off < 0:
+                return None
+            raw = int.from_bytes(self._arena[off:off + SINGLE_WIDTH], 'little')
+            return raw - 1 if raw else None
+        if t == 'drag_image':
+            n = len(q.get('items', []))
+            if off < 0:
+                return [-1] * n
+            return [v - 1 for v in self._arena[off:off + n]]
+        return None
+
+    __getitem__ = get
+
+    def copy(self):
+        """冻结一份当前作答，后台批改用，之后的改动不影响它"""
+        other = AnswerStore.__new__(AnswerStore)
+        other.questions = self.questions
+        other._arena = bytearray(self._arena)
+        other._offsets = array('q', self._offsets)
+        other._widths = array('I', self._widths)
+        other.versions = array('I', self.versions)
+        other.seq = self.seq
+        other.dirty = set()
+        other.observer = None
+        return other
+
+    def snapshot(self):
+        return AnswerSnapshot(array('I', self.versions), array('q', self._offsets),
+                              array('I', self._widths), bytes(self._arena))
+
+    def restore(self, offsets, widths, arena):
+        """用快照里的原始数据整体恢复（不触发监听）"""
+        self._offsets = array('q', offsets)
+        self._widths = array('I', widths)
+        self._arena = bytearray(arena)
+
+    def diff(self, snapshot):
+        """自快照以来改动过的题目下标"""
+        old = snapshot.versions
+        return [i for i, v in enumerate(self.versions) if v != old[i]]
+
+    def take_dirty(self):
+        dirty, self.dirty = self.dirty, set()
+        return sorted(dirty)
+
+    def nbytes(self):
+        return (len(self._arena) + self._offsets.itemsize * len(self._offsets)
+                + self._widths.itemsize * len(self._widths) + self.versions.itemsize * len(self.versions))
@@ -0,0 +1,47 @@
+from PyQt5.QtWidgets import QApplication
+
+# 全局样式表：只在 QApplication 上设一次，题型控件只设 objectName 或动态属性
+# 逐个控件 setStyleSheet 会让 Qt 重新 polish 该控件和它的全部子控件，交叉表每格一个勾选框时尤其慢
+
+APP_STYLE = """
+QLabel#crossTableHeader {
+    background-color: #F2F2F2;
+    border: 1px solid #aaa;
+    padding: 8px;
+}
+QTableView#crossTable {
+    gridline-color: #000;
+    font-size: 15px;
+}
+QTableWidget#crossTable::item {
+    border: 2px solid #000;
+}
+QLabel#dragItem {
+    border: 1px solid #aaa;
+    background: white;
+}
+QRadioButton[correct="true"], QCheckBox[correct="true"], QWidget#richOption[correct="true"] {
+    color: green;
+    font-weight: bold;
+}
+"""
+
+
+def install_style(app=None):
+    """把 APP_STYLE 追加到应用样式表，重复调用不会重复追加"""
+    app = app or QApplication.instance()
+    if app is None or app.property('quizStyleInstalled'):
+        return
+    app.setProperty('quizStyleInstalled', True)
+    app.setStyleSheet(app.styleSheet() + APP_STYLE)
+
+
+def set_flag(widget, name, value):
+    """设置样式表里用到的动态属性；值没变时不重新 polish"""
+    value = bool(value)
+    if bool(widget.property(name)) == value:
+        return
+    widget.setProperty(name, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)
@@ -0,0 +1,401 @@
+import os
+import sys
+import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import question_types
+from compiled_bank import content_hash, compile_bank, HASH_SIZE
+from question_bank import open_bank
+from search_index import question_text
+
+# 题库检查：导入、合并题库时逐题按题型校验结构（答案维度、下标范围等），并找出完全重复和近似重复的题目；不依赖 PyQt5
+# 校验和 MinHash 签名在子进程里分块计算，结果按题目内容哈希缓存在 <题库>.lint，再次检查时只算新增或改过的题
+# 近似重复：题面文字取三字片段做 MinHash，签名分 BANDS 段做 LSH 分桶，同桶的再按签名估计的相似度确认，
+# 不做两两比较，百万题也只是几次排序
+
+LINT_VERSION = 2    # 校验规则或签名算法改了就加一，旧缓存作废
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE = 3
+NEAR_THRESHOLD = 0.8
+CACHE_SUFFIX = '.lint'
+
+_PRIME = np.uint64((1 << 31) - 1)
+_perm_rng = np.random.default_rng(LINT_VERSION)
+_A = _perm_rng.integers(1, int(_PRIME), NUM_PERM, dtype=np.uint64)[:, None]
+_B = _perm_rng.integers(0, int(_PRIME), NUM_PERM, dtype=np.uint64)[:, None]
+_EMPTY_SIG = np.full(NUM_PERM, int(_PRIME), dtype=np.uint32)
+
+
+def _is_str_list(v, min_len=1):
+    return isinstance(v, list) and len(v) >= min_len and all(isinstance(s, str) for s in v)
+
+
+def _is_index(v, n):
+    return isinstance(v, int) and not isinstance(v, bool) and 0 <= v < n
+
+
+def _dups(names, label):
+    return [f'{label} 有重复项'] if len(set(names)) != len(names) else []
+
+
+def check_cross_table(q):
+    rows, groups = q.get('row_names'), q.get('col_names')
+    problems = []
+    if not _is_str_list(rows):
+        problems.append('row_names 应为非空字符串列表')
+    if not (isinstance(groups, list) and groups and isinstance(groups[0], dict)
+            and _is_str_list(groups[0].get('items'))):
+        problems.append("col_names[0]['items'] 应为非空字符串列表")
+    if problems:
+        return problems
+    cols = groups[0]['items']
+    problems += _dups(rows, 'row_names') + _dups(cols, "col_names[0]['items']")
+    answer = q.get('answer')
+    if not isinstance(answer, list) or len(answer) != len(rows):
+        n = len(answer) if isinstance(answer, list) else '非列表'
+        problems.append(f'answer 有 {n} 行，row_names 有 {len(rows)} 行')
+        return problems
+    for i, row in enumerate(answer):
+        if not isinstance(row, list) or len(row) != len(cols):
+            problems.append(f'answer 第 {i + 1} 行应有 {len(cols)} 列（与 col_names[0] 一致）')
+            break
+        if any(v not in (0, 1) for v in row):
+            problems.append(f'answer 第 {i + 1} 行只能是 0/1')
+            break
+    return problems
+
+
+def check_single_choice(q):
+    options = q.get('options')
+    if not _is_str_list(options, 2):
+        return ['options 应为至少两项的字符串列表']
+    if not _is_index(q.get('answer'), len(options)):
+        return [f"answer 应为 0..{len(options) - 1} 的选项下标，实际为 {q.get('answer')!r}"]
+    return _dups(options, 'options')
+
+
+def check_multi_choice(q):
+    options, answer = q.get('options'), q.get('answer')
+    if not _is_str_list(options, 2):
+        return ['options 应为至少两项的字符串列表']
+    if not isinstance(answer, list) or not answer:
+        return ['answer 应为非空的选项下标列表']
+    problems = _dups(options, 'options')
+    bad = [a for a in answer if not _is_index(a, len(options))]
+    if bad:
+        problems.append(f'answer 里的选项下标越界：{bad}')
+    elif len(set(answer)) != len(answer):
+        problems.append('answer 有重复的选项下标')
+    return problems
+
+
+def check_drag_image(q):
+    zones, items, answer = q.get('zones'), q.get('items'), q.get('answer')
+    problems = []
+    if not isinstance(zones, list) or not zones or not all(
+            isinstance(z, dict) and isinstance(z.get('rect'), list) and len(z['rect']) == 4 for z in zones):
+        problems.append('zones 应为非空列表，每项带 [x, y, w, h] 的 rect')
+    if not isinstance(items, list) or not items or not all(
+            isinstance(it, dict) and isinstance(it.get('image'), str) for it in items):
+        problems.append('items 应为非空列表，每项带 image 路径')
+    if problems:
+        return problems
+    if not isinstance(answer, list) or len(answer) != len(items):
+        return [f'answer 应有 {len(items)} 项（与 items 一致）']
+    bad = [a for a in answer if not (isinstance(a, int) and -1 <= a < len(zones))]
+    if bad:
+        problems.append(f'answer 里的区域下标越界：{bad}')
+    return problems
+
+
+def check_question(q):
+    """返回问题描述列表，空列表表示通过"""
+    if not isinstance(q, dict):
+        return ['不是 JSON 对象']
+    if not isinstance(q.get('type'), str):
+        # 列表、对象之类不可哈希，查题型注册表会抛 TypeError
+        return [f"题型应为字符串：{q.get('type')!r}"]
+    qtype = question_types.of(q)
+    if qtype is None:
+        return [f"未知题型 {q.get('type')!r}"]
+    problems = [] if isinstance(q.get('question'), str) and q['question'].strip() else ['缺少题干']
+    limit = q.get('time_limit')
+    if limit is not None and (isinstance(limit, bool) or not isinstance(limit, (int, float)) or limit <= 0):
+        problems.append(f'time_limit 应为正的秒数：{limit!r}')
+    return problems + qtype.validate(q)
+
+
+def normalized_text(q):
+    """查重用的题面：题型 + 题干/选项/行列名，小写并合并空白"""
+    return f"{q.get('type')}\n" + ' '.join(question_text(q).split())
+
+
+def minhash(text):
+    """文字三字片段的 MinHash 签名（NUM_PERM 个 uint32）"""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < SHINGLE:
+        return _EMPTY_SIG.copy()
+    h = codes[:-2] * np.uint64(0x9E3779B1) ^ codes[1:-1] * np.uint64(0x85EBCA77) ^ codes[2:] * np.uint64(0xC2B2AE3D)
+    h = np.unique(h & np.uint64(0xFFFFFFFF))
+    return ((_A * h + _B) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+_bank = None
+
+
+def _init_worker(bank_path):
+    global _bank
+    _bank = open_bank(bank_path, cache_size=0)
+
+
+def _lint_chunk(indices):
+    problems = {}
+    exact = np.zeros(len(indices), dtype=f'S{HASH_SIZE}')
+    sigs = np.empty((len(indices), NUM_PERM), dtype=np.uint32)
+    for k, idx in enumerate(indices):
+        try:
+            q = _bank[idx]
+        except ValueError as e:
+            problems[idx] = [f'不是合法的 JSON：{e}']
+            sigs[k] = _EMPTY_SIG
+            continue
+        found = check_question(q)
+        if found:
+            problems[idx] = found
+        try:
+            text = normalized_text(q)
+        except (AttributeError, TypeError):
+            # 结构坏到取不出题面的题只报问题，不参与查重
+            sigs[k] = _EMPTY_SIG
+            continue
+        exact[k] = content_hash(text.encode())
+        sigs[k] = minhash(text)
+    return indices, problems, exact, sigs
+
+
+def bank_digests(bank):
+    """每题原始内容的哈希；编译后的题库里已存好，与编译前 JSON 的哈希相同"""
+    if hasattr(bank, 'content_hash'):
+        keys = [bank.content_hash(i) for i in range(len(bank))]
+    else:
+        keys = [content_hash(bank.raw(i)) for i in range(len(bank))]
+    return np.array(keys, dtype=f'S{HASH_SIZE}')
+
+
+def load_cache(path):
+    """返回 (排好序的内容哈希, 查重哈希, 签名, {内容哈希: 问题列表})，缓存不存在或版本不符时返回 None"""
+    try:
+        with np.load(path) as data:
+            if tuple(data['meta']) != (LINT_VERSION, NUM_PERM):
+                return None
+            problems = dict(zip(data['problem_keys'].tolist(), json.loads(str(data['problem_text']))))
+            return data['keys'], data['exact'], data['sigs'], problems
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_cache(path, digests, exact, sigs, problems):
+    keys, first = np.unique(digests, return_index=True)
+    problem_keys = sorted({digests[idx] for idx in problems})
+    by_key = {digests[idx]: found for idx, found in problems.items()}
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            np.savez(f, meta=np.array([LINT_VERSION, NUM_PERM]), keys=keys, exact=exact[first], sigs=sigs[first],
+                     problem_keys=np.array(problem_keys, dtype=f'S{HASH_SIZE}'),
+                     problem_text=np.array(json.dumps([by_key[k] for k in problem_keys], ensure_ascii=False)))
+        os.replace(tmp, path)
+    except OSError:
+        pass  # 题库目录只读时不缓存
+
+
+def _runs(sorted_keys):
+    """相同键的连续段：返回 (起点, 终点) 数组，只含长度大于 1 的段"""
+    n = len(sorted_keys)
+    if n < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    brk = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+    starts = np.r_[0, brk]
+    ends = np.r_[brk, n]
+    multi = ends - starts > 1
+    return starts[multi], ends[multi]
+
+
+def exact_groups(exact):
+    """查重哈希相同的题目分组（题号升序）"""
+    order = np.argsort(exact, kind='stable')
+    starts, ends = _runs(exact[order])
+    return [np.sort(order[a:b]) for a, b in zip(starts, ends)]
+
+
+def _find(parent, i):
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+
+def near_groups(sigs, threshold=NEAR_THRESHOLD):
+    """LSH 分桶找近似重复：签名某一段完全相同的题进同一个桶，和桶里第一题的签名相似度达到 threshold 就并成一组"""
+    n = len(sigs)
+    pairs = []
+    for band in range(BANDS):
+        block = sigs[:, band * ROWS:(band + 1) * ROWS].astype(np.uint64)
+        h = np.zeros(n, dtype=np.uint64)
+        for r in range(ROWS):
+            h = (h * np.uint64(0x100000001B3)) ^ block[:, r]
+        order = np.argsort(h, kind='stable')
+        starts, ends = _runs(h[order])
+        if not len(starts):
+            continue
+        lengths = ends - starts
+        first = np.repeat(order[starts], lengths - 1)
+        # 每个桶除第一题外的成员
+        member = np.ones(n, dtype=bool)
+        member[starts] = False
+        inside = np.zeros(n + 1, dtype=np.int64)
+        np.add.at(inside, starts, 1)
+        np.add.at(inside, ends, -1)
+        member &= np.cumsum(inside[:n]) > 0
+        others = order[member]
+        similar = (sigs[first] == sigs[others]).mean(axis=1) >= threshold
+        pairs.append(np.stack([first[similar], others[similar]], axis=1))
+    if not pairs:
+        return []
+    pairs = np.concatenate(pairs)
+    pairs = np.unique(pairs[:, 0] * n + pairs[:, 1])
+    parent = list(range(n))
+    for a, b in zip((pairs // n).tolist(), (pairs % n).tolist()):
+        ra, rb = _find(parent, a), _find(parent, b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    groups = {}
+    for i in np.unique(np.r_[pairs // n, pairs % n]).tolist():
+        groups.setdefault(_find(parent, i), []).append(i)
+    return [np.array(sorted(g)) for g in groups.values()]
+
+
+class LintReport:
+    def __init__(self, count, problems, exact, near, checked):
+        self.count = count
+        self.problems = problems    # {题号: [问题, ...]}
+        self.exact = exact          # [题号数组, ...]
+        self.near = near            # [(题号数组, 与第一题的估计相似度数组), ...]
+        self.checked = checked      # 本次实际校验的题数（其余来自缓存）
+
+    def lines(self):
+        for idx in sorted(self.problems):
+            for p in self.problems[idx]:
+                yield f'第 {idx + 1} 题：{p}'
+        for g in self.exact:
+            yield '完全重复：' + '、'.join(f'第 {i + 1} 题' for i in g)
+        for g, sims in self.near:
+            yield '近似重复：' + '、'.join(f'第 {i + 1} 题' for i in g) + f'（相似度约 {sims.min():.2f}）'
+
+    def to_json(self):
+        return {
+            'count': self.count,
+            'checked': self.checked,
+            'problems': {str(i): p for i, p in sorted(self.problems.items())},
+            'exact_duplicates': [g.tolist() for g in self.exact],
+            'near_duplicates': [{'questions': g.tolist(), 'similarity': round(float(s.min()), 3)} for g, s in self.near],
+        }
+
+
+def lint_bank(path, workers=None, chunk_size=2000, threshold=NEAR_THRESHOLD, use_cache=True):
+    bank = open_bank(path)
+    try:
+        n = len(bank)
+        digests = bank_digests(bank)
+    finally:
+        bank.close()
+    exact = np.zeros(n, dtype=f'S{HASH_SIZE}')
+    sigs = np.empty((n, NUM_PERM), dtype=np.uint32)
+    problems = {}
+    todo = np.arange(n)
+    cache_path = path + CACHE_SUFFIX
+    cached = load_cache(cache_path) if use_cache else None
+    if cached is not None:
+        keys, c_exact, c_sigs, c_problems = cached
+        pos = np.minimum(np.searchsorted(keys, digests), max(len(keys) - 1, 0))
+        hit = (keys[pos] == digests) if len(keys) else np.zeros(n, dtype=bool)
+        exact[hit] = c_exact[pos[hit]]
+        sigs[hit] = c_sigs[pos[hit]]
+        for idx in np.flatnonzero(hit).tolist():
+            found = c_problems.get(digests[idx])
+            if found:
+                problems[idx] = found
+        todo = np.flatnonzero(~hit)
+
+    if len(todo):
+        workers = workers or os.cpu_count() or 1
+        chunks = [todo[i:i + chunk_size].tolist() for i in range(0, len(todo), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(path,)) as pool:
+            limit = workers * 2
+            pending = deque()
+            results = iter(chunks)
+
+            def collect(future):
+                indices, found, ex, sg = future.result()
+                problems.update(found)
+                exact[indices] = ex
+                sigs[indices] = sg
+
+            for chunk in results:
+                pending.append(pool.submit(_lint_chunk, chunk))
+                if len(pending) >= limit:
+                    collect(pending.popleft())
+            while pending:
+                collect(pending.popleft())
+        if use_cache:
+            save_cache(cache_path, digests, exact, sigs, problems)
+
+    # 没有题面的坏题不参与查重；完全相同的题只拿第一道去做 LSH，找到的近似组再展开成全部成员
+    valid = np.flatnonzero(exact != b'')
+    exact_found = [valid[g] for g in exact_groups(exact[valid])]
+    _, first, inverse = np.unique(exact[valid], return_index=True, return_inverse=True)
+    reps = valid[first]
+    near = []
+    for g in near_groups(sigs[reps], threshold):
+        members = valid[np.isin(inverse, g)]
+        near.append((members, (sigs[reps[g[1:]]] == sigs[reps[g[0]]]).mean(axis=1)))
+    return LintReport(n, problems, exact_found, near, len(todo))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='检查题库结构并查找重复题，可在通过后编译题库')
+    parser.add_argument('bank', help='题库：.json / .jsonl / .qbank')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    parser.add_argument('--threshold', type=float, default=NEAR_THRESHOLD, help='近似重复的相似度下限')
+    parser.add_argument('--no-cache', action='store_true', help='不读写 <题库>.lint 缓存')
+    parser.add_argument('--json', help='把检查结果写成 JSON')
+    parser.add_argument('--compile', metavar='QBANK', help='没有结构问题时编译成二进制题库')
+    args = parser.parse_args(argv)
+
+    report = lint_bank(args.bank, args.workers, args.chunk_size, args.threshold, not args.no_cache)
+    for line in report.lines():
+        print(line)
+    print(f'共 {report.count} 题，本次校验 {report.checked} 题；结构问题 {len(report.problems)} 题，'
+          f'完全重复 {len(report.exact)} 组，近似重复 {len(report.near)} 组', file=sys.stderr)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report.to_json(), f, ensure_ascii=False, indent=2)
+    if report.problems:
+        return 1
+    if args.compile:
+        total, parsed = compile_bank(args.bank, args.compile)
+        print(f'{args.compile}: 共{total}题，重新编译{parsed}题', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from grading import check_answer, grade_exam
+from question_bank import open_bank
+
+# 命令行批量批改答题卡，不依赖 PyQt5
+# 答题卡每行一个 JSON：{"id": ..., "questions": [题库下标, ...], "answers": {"题库下标": 作答}}
+# questions 省略时按整份题库批改；answers 也可以是与 questions 等长的列表
+# 作答格式与 QuizMain.user_answers 相同：交叉表为二维布尔表，单选为下标，多选为布尔列表
+# 可带 "student"、"group"（班级）字段，原样写进结果；--store 时同时追加到成绩库
+
+_bank = None
+
+
+def _init_worker(bank_path):
+    global _bank
+    _bank = open_bank(bank_path)
+
+
+def grade_sheet(bank, sheet, per_question=True):
+    qidx = sheet.get('questions')
+    if qidx is None:
+        qidx = range(len(bank))
+    answers = sheet.get('answers') or {}
+    if isinstance(answers, dict):
+        user = [answers.get(str(i)) for i in qidx]
+    else:
+        user = list(answers) + [None] * (len(qidx) - len(answers))
+    questions = [bank[i] for i in qidx]
+    # 答题卡是外部输入，形状不对的整张按出错报告，不给分数
+    for i, q, u in zip(qidx, questions, user):
+        try:
+            check_answer(q, u)
+        except ValueError as e:
+            raise ValueError(f'题库下标 {i}：{e}') from None
+    scores = grade_exam(questions, user)
+    out = {'id': sheet.get('id'), 'score': scores.total_score, 'total': scores.total_count}
+    for key in ('student', 'group'):
+        if key in sheet:
+            out[key] = sheet[key]
+    if per_question:
+        out['questions'] = [
+            {'index': i, 'type': scores.types[k], 'correct': int(scores.correct[k]), 'total': int(scores.total[k]),
+             'missed': int(scores.missed[k]), 'over': int(scores.over[k])}
+            for k, i in enumerate(qidx) if scores.graded[k]
+        ]
+    return out
+
+
+def _grade_chunk(lines, per_question):
+    out = []
+    for line in lines:
+        try:
+            res = grade_sheet(_bank, json.loads(line), per_question)
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            res = {'error': f'{type(e).__name__}: {e}', 'line': line.strip()[:200]}
+        out.append(json.dumps(res, ensure_ascii=False))
+    return out
+
+
+def _chunks(lines, size):
+    chunk = []
+    for line in lines:
+        if not line.strip():
+            continue
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def grade_stream(bank_path, lines, workers=None, chunk_size=256, per_question=True):
+    """按块分发到进程池，保持输入顺序逐行产出结果；同时在途的块数有上限，内存不随答题卡数量增长"""
+    workers = workers or os.cpu_count() or 1
+    # 先在主进程打开一次：路径错误立即报错，JSON 题库的偏移索引也只建一次，子进程直接复用
+    open_bank(bank_path).close()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(bank_path,)) as pool:
+        limit = workers * 2
+        pending = deque()
+        for chunk in _chunks(lines, chunk_size):
+            pending.append(pool.submit(_grade_chunk, chunk, per_question))
+            if len(pending) >= limit:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def store_result(store, res):
+    if 'error' in res:
+        return
+    rows = res['questions']
+    store.append([r['index'] for r in rows], [r['type'] for r in rows],
+                 *([r[k] for r in rows] for k in ('correct', 'total', 'missed', 'over')),
+                 student=res.get('student', ''), group=res.get('group', ''))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批量批改答题卡')
+    parser.add_argument('bank', help='题库：.json / .jsonl / .qbank')
+    parser.add_argument('sheets', help='答题卡 JSONL，- 表示标准输入')
+    parser.add_argument('-o', '--output', default='-', help='结果 JSONL，默认标准输出')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=256)
+    parser.add_argument('--summary-only', action='store_true', help='只输出每份答题卡的总分')
+    parser.add_argument('--store', help='同时把成绩追加到这个成绩库目录')
+    args = parser.parse_args(argv)
+    if args.store and args.summary_only:
+        parser.error('--store 需要逐题成绩，不能与 --summary-only 同用')
+
+    store = None
+    if args.store:
+        from results_store import ResultsStore, StoreLockedError
+        try:
+            store = ResultsStore(args.store)
+        except StoreLockedError as e:
+            sys.exit(str(e))
+    fin = sys.stdin if args.sheets == '-' else open(args.sheets, encoding='utf-8')
+    fout = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        for line in grade_stream(args.bank, fin, args.workers, args.chunk_size, not args.summary_only):
+            fout.write(line + '\n')
+            if store is not None:
+                store_result(store, json.loads(line))
+    finally:
+        if fin is not sys.stdin:
+            fin.close()
+        if fout is not sys.stdout:
+            fout.close()
+        if store is not None:
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import subprocess
+import tempfile
+import statistics
+
+# 无界面运行：python bench.py [--size N] [--update-baseline]
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+DEFAULT_MIX = {'cross_table': 0.4, 'single_choice': 0.3, 'multi_choice': 0.3}
+# 新进程里从解释器启动到第一题画出来；画完直接退出，不计退出清理
+STARTUP_SCRIPT = '''
+import os, sys
+from PyQt5.QtWidgets import QApplication
+import main
+app = QApplication(sys.argv[:1])
+win = main.QuizMain(main.open_bank(sys.argv[1]), paper=main.ExamPaper(0, range(50)))
+win.show()
+win.repaint()
+os._exit(0)
+'''
+
+
+def make_question(kind, rng, rows=6, cols=8):
+    stem = '题干' * rng.randint(5, 40)
+    if kind == 'cross_table':
+        return {
+            'type': 'cross_table', 'question': stem, 'row_header': '行', 'col_header': '列',
+            'row_names': [f'行{i}' for i in range(rows)],
+            'col_names': [{'group': '分组', 'items': [f'列{j}' for j in range(cols)]}],
+            'answer': [[rng.randint(0, 1) for _ in range(cols)] for _ in range(rows)],
+        }
+    n = rng.randint(3, 6)
+    options = [f'选项{i}' * rng.randint(1, 4) for i in range(n)]
+    if kind == 'single_choice':
+        return {'type': 'single_choice', 'question': stem, 'options': options, 'answer': rng.randrange(n)}
+    return {'type': 'multi_choice', 'question': stem, 'options': options,
+            'answer': sorted(rng.sample(range(n), rng.randint(1, n)))}
+
+
+def make_bank(n, mix=None, seed=0, rows=6, cols=8):
+    """按题型比例生成合成题库"""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds, weights = zip(*mix.items())
+    return [make_question(rng.choices(kinds, weights)[0], rng, rows, cols) for _ in range(n)]
+
+
+def measure(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return statistics.median(times)
+
+
+def run(size, mix=None, repeat=5):
+    from question_bank import open_bank
+    from compiled_bank import compile_bank
+    from cross_table import cross_table_class
+    from grading import grade_exam
+    from exam_paper import assemble
+    import main
+
+    app = QApplication.instance() or QApplication([])
+    results = {}
+    questions = make_bank(size, mix)
+    tmp = tempfile.mkdtemp(prefix='quiz-bench-')
+    json_path = os.path.join(tmp, 'bank.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(questions, f, ensure_ascii=False)
+
+    # 题库加载：首次建索引 / 索引已缓存 / 编译后的二进制题库
+    def load_cold():
+        if os.path.exists(json_path + '.idx'):
+            os.remove(json_path + '.idx')
+        open_bank(json_path).close()
+    results['bank_load_json_cold'] = measure(load_cold, repeat)
+    results['bank_load_json_indexed'] = measure(lambda: open_bank(json_path).close(), repeat)
+    qbank_path = os.path.join(tmp, 'bank.qbank')
+    compile_bank(json_path, qbank_path)
+    results['bank_load_qbank'] = measure(lambda: open_bank(qbank_path).close(), repeat)
+
+    # 冷启动到第一题：含导入 PyQt5 和各模块，题库索引已缓存
+    cmd = [sys.executable, '-c', STARTUP_SCRIPT, json_path]
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results['startup_first_question'] = measure(
+        lambda: subprocess.run(cmd, cwd=cwd, check=True, stderr=subprocess.DEVNULL), repeat)
+
+    bank = open_bank(json_path)
+    created = []
+    # 固定组卷种子，首题题型每次一致
+    results['quiz_init'] = measure(lambda: created.append(main.QuizMain(bank, paper=assemble(bank, seed=0))), repeat)
+    for w in created:
+        w.close()
+        w.deleteLater()
+    app.processEvents()
+
+    # 百万题库里抽 50 题：只需要题数，不读题目
+    results['assemble_50_of_1m'] = measure(lambda: assemble(range(1_000_000), 50, seed=1), repeat)
+
+    win = main.QuizMain(bank, paper=assemble(bank, seed=0))
+    win.show()
+    app.processEvents()
+    # 搜索索引的后台线程会和下面的计时抢 GIL，先停掉让各项结果可比
+    win.search_index.stop()
+
+    # 每种题型的 update_ui 耗时
+    by_type = {}
+    for idx in range(len(win.questions)):
+        by_type.setdefault(win.questions[idx]['type'], []).append(idx)
+    for kind, indices in sorted(by_type.items()):
+        picks = indices[:20]
+
+        def nav():
+            for idx in picks:
+                win.cur_idx = idx
+                win.update_ui()
+        results[f'update_ui_{kind}'] = measure(nav, repeat) / len(picks)
+
+    # 交叉表控件构建耗时与矩阵大小
+    rng = random.Random(1)
+    for rows, cols in ((4, 7), (20, 20), (60, 80)):
+        q = make_question('cross_table', rng, rows, cols)
+        answer = [[False] * cols for _ in range(rows)]
+        cls = cross_table_class(q)
+        results[f'cross_table_build_{rows}x{cols}'] = measure(
+            lambda: cls(q, answer, False, lambda *a: None).deleteLater(), repeat)
+
+    # 每次勾选的保存开销
+    idx = by_type.get('cross_table', [0])[0]
+    win.cur_idx = idx
+    win.update_ui()
+    q = win.questions[idx]
+    rows, cols = len(q['row_names']), len(q['col_names'][0]['items'])
+    clicks = [(r, c, v) for r in range(rows) for c in range(cols) for v in (True, False)]
+
+    def click():
+        for r, c, v in clicks:
+            win.save_check(r, c, v)
+    results['save_check_per_click'] = measure(click, repeat) / len(clicks)
+
+    answers = [win.user_answers.get(i) for i in range(len(win.questions))]
+    results['grade_exam'] = measure(lambda: grade_exam(win.questions, answers), repeat)
+    # 交卷：后台批改到结果表显示的总耗时，以及 finish_all 本身占用 GUI 线程的时间
+    gui_times = []
+
+    def finish():
+        win.show_answer = False
+        t = time.perf_counter()
+        win.finish_all()
+        gui_times.append(time.perf_counter() - t)
+        win.grade_worker.wait()
+        app.processEvents()
+    results['finish_all'] = measure(finish, repeat)
+    results['finish_all_gui'] = statistics.median(gui_times)
+    win.close()
+    bank.close()
+    shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta=0.001):
+    """返回 (变慢的项目, 基线里没有的项目)；变慢指超出基线 (1 + tolerance) 倍且绝对差超过 min_delta 秒
+    （过滤亚毫秒级的抖动）。新加的指标没有基线也算不通过，否则永远不会被对比"""
+    regressions, missing = [], []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is None:
+            missing.append(name)
+        elif value > base * (1 + tolerance) and value - base > min_delta:
+            regressions.append((name, base, value))
+    return regressions, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='加载、渲染、换题、批改热点的基准测试')
+    parser.add_argument('--size', type=int, default=2000, help='合成题库题数')
+    parser.add_argument('--mix', help='题型比例，如 cross_table=0.5,single_choice=0.5')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.5, help='允许比基线慢的比例')
+    parser.add_argument('--min-delta', type=float, default=0.001, help='忽略小于该秒数的差异')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--json', help='把结果另存为 JSON')
+    args = parser.parse_args(argv)
+
+    mix = None
+    if args.mix:
+        mix = {k: float(v) for k, v in (p.split('=') for p in args.mix.split(','))}
+    results = run(args.size, mix, args.repeat)
+    for name, value in results.items():
+        print(f'{name:32s} {value * 1000:10.3f} ms')
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'size': args.size, 'results': results}, f, indent=2)
+        print(f'基线已写入 {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print('没有基线，使用 --update-baseline 生成')
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('size') != args.size:
+        print(f'基线题数为 {baseline.get("size")}，与本次 {args.size} 不同，跳过对比')
+        return 0
+    regressions, missing = compare(results, baseline['results'], args.tolerance, args.min_delta)
+    for name, base, value in regressions:
+        print(f'变慢：{name} {base * 1000:.3f} ms -> {value * 1000:.3f} ms')
+    for name in missing:
+        print(f'基线里没有：{name}，用 --update-baseline 重新生成')
+    return 1 if regressions or missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,308 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+
+import profiling
+
+MAGIC = b'QBANK001'
+# magic, 题数, 字符串数, 列表表长度, 位图字节数
+HEADER = struct.Struct('<8sIIIQ')
+# 题型, 标志, 题干, 行表头, 列表头, 列分组, 选项起点/个数, 行名起点/个数, 列名起点/个数, 单选答案, 位图偏移, 附加字段, 内容哈希
+RECORD = struct.Struct('<BBHIIIIIIIIIIiQI16s')
+NONE = 0xFFFFFFFF
+HASH_SIZE = 16
+
+TYPE_CODES = {'cross_table': 1, 'single_choice': 2, 'multi_choice': 3, 'drag_image': 4}
+TYPE_NAMES = {v: k for k, v in TYPE_CODES.items()}
+FLAG_RAW = 1  # 结构不符合定长布局的题目，整题以 JSON 字符串保存
+
+_CROSS_KEYS = {'type', 'question', 'row_header', 'col_header', 'row_names', 'col_names', 'answer'}
+_CHOICE_KEYS = {'type', 'question', 'options', 'answer'}
+
+
+def content_hash(raw):
+    return hashlib.blake2b(raw, digest_size=HASH_SIZE).digest()
+
+
+def pack_bits(flags):
+    out = bytearray((len(flags) + 7) // 8)
+    for i, v in enumerate(flags):
+        if v:
+            out[i >> 3] |= 1 << (i & 7)
+    return out
+
+
+def unpack_bits(buf, n):
+    return [(buf[i >> 3] >> (i & 7)) & 1 for i in range(n)]
+
+
+class _Builder:
+    def __init__(self):
+        self.strings = {}
+        self.string_list = []
+        self.lists = array('I')
+        self.bits = bytearray()
+        self.records = []
+
+    def sid(self, s):
+        if s is None:
+            return NONE
+        i = self.strings.get(s)
+        if i is None:
+            i = self.strings[s] = len(self.string_list)
+            self.string_list.append(s)
+        return i
+
+    def str_list(self, items):
+        start = len(self.lists)
+        self.lists.extend(self.sid(s) for s in items)
+        return start, len(items)
+
+    def add_bits(self, flags):
+        off = len(self.bits)
+        self.bits += pack_bits(flags)
+        return off
+
+    def add(self, q, digest):
+        t = q.get('type')
+        code = TYPE_CODES.get(t, 0)
+        fields = dict(qs=NONE, rh=NONE, ch=NONE, grp=NONE, opt=(0, 0), rows=(0, 0), cols=(0, 0),
+                      single=-1, bits=0, extra=NONE, flags=0)
+        try:
+            if t == 'cross_table' and len(q['col_names']) == 1:
+                cols = q['col_names'][0]
+                if any(k not in ('group', 'items') for k in cols):
+                    raise ValueError
+                answer = q['answer']
+                n_rows, n_cols = len(q['row_names']), len(cols['items'])
+                if len(answer) != n_rows or any(len(r) != n_cols for r in answer):
+                    raise ValueError
+                fields.update(qs=self.sid(q['question']), rh=self.sid(q.get('row_header')),
+                              ch=self.sid(q.get('col_header')), grp=self.sid(cols.get('group')),
+                              rows=self.str_list(q['row_names']), cols=self.str_list(cols['items']),
+                              bits=self.add_bits([v for row in answer for v in row]))
+                extra = {k: v for k, v in q.items() if k not in _CROSS_KEYS}
+            elif t == 'single_choice':
+                fields.update(qs=self.sid(q['question']), opt=self.str_list(q['options']),
+                              single=int(q['answer']))
+                extra = {k: v for k, v in q.items() if k not in _CHOICE_KEYS}
+            elif t == 'multi_choice':
+                n = len(q['options'])
+                mask = [False] * n
+                for i in q['answer']:
+                    mask[i] = True
+                fields.update(qs=self.sid(q['question']), opt=self.str_list(q['options']),
+                              bits=self.add_bits(mask))
+                extra = {k: v for k, v in q.items() if k not in _CHOICE_KEYS}
+            else:
+                raise ValueError
+            if extra:
+                fields['extra'] = self.sid(json.dumps(extra, ensure_ascii=False))
+        except (KeyError, TypeError, ValueError, IndexError):
+            fields = dict(qs=NONE, rh=NONE, ch=NONE, grp=NONE, opt=(0, 0), rows=(0, 0), cols=(0, 0),
+                          single=-1, bits=0, flags=FLAG_RAW,
+                          extra=self.sid(json.dumps(q, ensure_ascii=False)))
+        self.records.append(RECORD.pack(
+            code, fields['flags'], 0, fields['qs'], fields['rh'], fields['ch'], fields['grp'],
+            fields['opt'][0], fields['opt'][1], fields['rows'][0], fields['rows'][1],
+            fields['cols'][0], fields['cols'][1], fields['single'], fields['bits'],
+            fields['extra'], digest))
+
+    def write(self, f):
+        encoded = [s.encode('utf-8') for s in self.string_list]
+        offsets = array('Q', [0])
+        for b in encoded:
+            offsets.append(offsets[-1] + len(b))
+        f.write(HEADER.pack(MAGIC, len(self.records), len(encoded), len(self.lists), len(self.bits)))
+        for r in self.records:
+            f.write(r)
+        f.write(offsets.tobytes())
+        f.write(self.lists.tobytes())
+        f.write(bytes(self.bits))
+        for b in encoded:
+            f.write(b)
+
+
+class CompiledBank:
+    """mmap 打开的二进制题库，按只读序列访问，题目在取用时才解码"""
+
+    @profiling.traced('CompiledBank.__init__')
+    def __init__(self, source, cache_size=256):
+        self._file = None
+        if isinstance(source, (str, os.PathLike)):
+            self.path = os.fspath(source)
+            self._file = open(self.path, 'rb')
+            self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.path = None
+            self._buf = source
+        self._mv = memoryview(self._buf)
+        magic, self.count, n_strings, n_lists, n_bits = HEADER.unpack_from(self._mv, 0)
+        if magic != MAGIC:
+            raise ValueError('not a compiled question bank')
+        pos = HEADER.size
+        # 文件被截断时下面的切片会变短，cast 抛的是 TypeError，先统一报成 ValueError
+        if pos + RECORD.size * self.count + 8 * (n_strings + 1) + 4 * n_lists + n_bits > len(self._mv):
+            raise ValueError('compiled question bank is truncated')
+        self._records = pos
+        pos += RECORD.size * self.count
+        self._str_offsets = self._mv[pos:pos + 8 * (n_strings + 1)].cast('Q')
+        pos += 8 * (n_strings + 1)
+        self._lists = self._mv[pos:pos + 4 * n_lists].cast('I')
+        pos += 4 * n_lists
+        self._bits = self._mv[pos:pos + n_bits]
+        pos += n_bits
+        self._strings = pos
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def record(self, idx):
+        return RECORD.unpack_from(self._mv, self._records + RECORD.size * idx)
+
+    def string(self, sid):
+        if sid == NONE:
+            return None
+        start = self._strings + self._str_offsets[sid]
+        end = self._strings + self._str_offsets[sid + 1]
+        return str(self._mv[start:end], 'utf-8')
+
+    def _str_list(self, start, n):
+        return [self.string(s) for s in self._lists[start:start + n]]
+
+    def type_name(self, idx):
+        return TYPE_NAMES.get(self._mv[self._records + RECORD.size * idx])
+
+    def content_hash(self, idx):
+        return self.record(idx)[-1]
+
+    def answer_bits(self, idx):
+        """答案位图（按行展开），不拷贝"""
+        rec = self.record(idx)
+        code, n = rec[0], 0
+        if code == TYPE_CODES['cross_table']:
+            n = rec[10] * rec[12]
+        elif code == TYPE_CODES['multi_choice']:
+            n = rec[8]
+        return self._bits[rec[14]:rec[14] + (n + 7) // 8], n
+
+    def _decode(self, idx):
+        (code, flags, _, qs, rh, ch, grp, opt_start, opt_n, row_start, row_n,
+         col_start, col_n, single, bits, extra, _) = self.record(idx)
+        if flags & FLAG_RAW:
+            return json.loads(self.string(extra))
+        t = TYPE_NAMES[code]
+        q = {'type': t, 'question': self.string(qs)}
+        if t == 'cross_table':
+            if rh != NONE:
+                q['row_header'] = self.string(rh)
+            if ch != NONE:
+                q['col_header'] = self.string(ch)
+            q['row_names'] = self._str_list(row_start, row_n)
+            group = {'items': self._str_list(col_start, col_n)}
+            if grp != NONE:
+                group = {'group': self.string(grp), **group}
+            q['col_names'] = [group]
+            flat = unpack_bits(self._bits[bits:bits + (row_n * col_n + 7) // 8], row_n * col_n)
+            q['answer'] = [flat[i * col_n:(i + 1) * col_n] for i in range(row_n)]
+        elif t == 'single_choice':
+            q['options'] = self._str_list(opt_start, opt_n)
+            q['answer'] = single
+        elif t == 'multi_choice':
+            q['options'] = self._str_list(opt_start, opt_n)
+            mask = unpack_bits(self._bits[bits:bits + (opt_n + 7) // 8], opt_n)
+            q['answer'] = [i for i, v in enumerate(mask) if v]
+        if extra != NONE:
+            q.update(json.loads(self.string(extra)))
+        return q
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += self.count
+        if not 0 <= idx < self.count:
+            raise IndexError('question index out of range')
+        with self._cache_lock:
+            q = self._cache.get(idx)
+            if q is not None:
+                self._cache.move_to_end(idx)
+                return q
+        q = self._decode(idx)
+        with self._cache_lock:
+            self._cache[idx] = q
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return q
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def close(self):
+        self._cache.clear()
+        self._str_offsets.release()
+        self._lists.release()
+        self._bits.release()
+        self._mv.release()
+        if self._file is not None:
+            self._buf.close()
+            self._file.close()
+
+
+def compile_bank(src, dst):
+    """把 JSON / JSONL 题库编译成二进制题库；内容哈希没变的题目直接沿用上次的编译结果。
+    返回 (题目总数, 重新解析的题数)，全部未变时不重写文件"""
+    from question_bank import QuestionBank
+    bank = QuestionBank(src, cache_size=1)
+    digests = [content_hash(bank.raw(i)) for i in range(len(bank))]
+
+    old = None
+    if os.path.exists(dst):
+        try:
+            old = CompiledBank(dst, cache_size=0)
+        except (ValueError, struct.error):
+            old = None
+    try:
+        old_index = {}
+        if old is not None:
+            old_index = {old.content_hash(i): i for i in range(len(old))}
+            if len(old) == len(digests) and all(old.content_hash(i) == d for i, d in enumerate(digests)):
+                return len(digests), 0
+
+        builder = _Builder()
+        parsed = 0
+        for i, d in enumerate(digests):
+            j = old_index.get(d)
+            if j is not None:
+                q = old._decode(j)
+            else:
+                q = json.loads(bank.raw(i))
+                parsed += 1
+            builder.add(q, d)
+    finally:
+        if old is not None:
+            old.close()
+        bank.close()
+
+    tmp = dst + '.tmp'
+    with open(tmp, 'wb') as f:
+        builder.write(f)
+    os.replace(tmp, dst)
+    return len(digests), parsed
+
+
+if __name__ == '__main__':
+    src = sys.argv[1] if len(sys.argv) > 1 else 'questions.json'
+    dst = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(src)[0] + '.qbank'
+    total, parsed = compile_bank(src, dst)
+    print(f'{dst}: 共{total}题，重新编译{parsed}题')
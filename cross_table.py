@@ -1,14 +1,31 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QCheckBox, QHBoxLayout, QHeaderView, QLabel
-from PyQt5.QtGui import QFont, QColor, QBrush, QFontMetrics
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QCheckBox, QHBoxLayout, QHeaderView, QLabel,
+    QTableView, QStyledItemDelegate, QStyle, QStyleOptionButton, QApplication
+)
+from PyQt5.QtGui import QFont, QColor, QBrush
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, QRect
 import random
 
+import profiling
+from app_style import install_style
+from text_metrics import text_widths
+
+# 单元格数超过这个值时用 model/view 版本，控件数量不随矩阵大小增长
+MODEL_VIEW_THRESHOLD = 400
+
+# 列宽在最长文字之外留的边距
+TEXT_PADDING = 28
+
 def get_text_pixel_width(text, font):
-    metrics = QFontMetrics(font)
-    return metrics.width(str(text)) + 28
+    return text_widths().width(text, font) + TEXT_PADDING
+
+def shuffled_indices(n, rng=None):
+    indices = list(range(n))
+    (rng or random).shuffle(indices)
+    return indices
 
 def create_centered_checkbox(checked=False, enabled=True, stateChangedSlot=None):
-    w = QWidget()
+    w = profiling.track_widget(QWidget())
     layout = QHBoxLayout(w)
     layout.setContentsMargins(0, 0, 0, 0)
     layout.setAlignment(Qt.AlignCenter)
@@ -18,123 +35,340 @@ def create_centered_checkbox(checked=False, enabled=True, stateChangedSlot=None)
     if stateChangedSlot:
         chk.stateChanged.connect(stateChangedSlot)
     layout.addWidget(chk)
+    w.checkbox = chk
     return w
 
+def bold_font():
+    font = QFont()
+    font.setBold(True)
+    return font
+
+def plan_cross_table(qobj, rng=None):
+    """提前算好行列乱序和统一列宽，可以在空闲时为下一题准备；rng 给定时乱序可复现。
+    文字宽度走共享缓存，行名列名在题目之间重复时不再测量"""
+    row_cnt = len(qobj['row_names'])
+    col_cnt = len(qobj['col_names'][0]['items'])
+    widths = text_widths()
+    font_bold = bold_font()
+    max_width = max(widths.width(qobj.get('row_header', ''), font_bold),
+                    widths.max_width(qobj['col_names'][0]['items'], font_bold),
+                    widths.max_width(qobj['row_names'], font_bold))
+    return {
+        'row_indices': shuffled_indices(row_cnt, rng),
+        'col_indices': shuffled_indices(col_cnt, rng),
+        'col_width': max_width + TEXT_PADDING,
+    }
+
 class CrossTableWidget(QWidget):
-    def __init__(self, qobj, answer_data, show_answer, save_callback):
+    @profiling.traced("CrossTableWidget.__init__")
+    def __init__(self, qobj, answer_data, show_answer, save_callback, plan=None):
         super().__init__()
+        profiling.track_widget(self)
+        # 表格样式在应用级设置，已装过时什么也不做
+        install_style()
+        self.save_callback = save_callback
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        # 大表头
+        self.big_header = QLabel()
+        self.big_header.setObjectName("crossTableHeader")
+        font = QFont()
+        font.setBold(True)
+        font.setPointSize(16)
+        self.big_header.setFont(font)
+        self.big_header.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.big_header)
+
+        table = QTableWidget()
+        self.table = table
+        table.setObjectName("crossTable")
+        table.setEditTriggers(table.NoEditTriggers)
+
+        # 行头加粗
+        self.font_bold = bold_font()
+        table.horizontalHeader().setFont(self.font_bold)
+        table.verticalHeader().setFont(self.font_bold)
+        # 各行高度相同：第一次绑定题目时量一行，之后固定行高，不再每次布局都逐行按内容测量
+        table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.row_height = None
+        layout.addWidget(table)
+
+        self.bind(qobj, answer_data, show_answer, plan)
+
+    @profiling.traced("CrossTableWidget.bind")
+    def bind(self, qobj, answer_data, show_answer, plan=None):
+        """换题时复用表格和已有的勾选控件，只改内容"""
         self.qobj = qobj
         self.show_answer = show_answer
-        self.save_callback = save_callback
+        if plan is None:
+            plan = plan_cross_table(qobj)
 
         # 行列乱序
-        row_cnt = len(qobj['row_names'])
-        col_cnt = len(qobj['col_names'][0]['items'])
-        self.row_indices = list(range(row_cnt))
-        self.col_indices = list(range(col_cnt))
-        random.shuffle(self.row_indices)
-        random.shuffle(self.col_indices)
+        self.row_indices = plan['row_indices']
+        self.col_indices = plan['col_indices']
+        rows, cols = len(self.row_indices), len(self.col_indices)
 
         # 乱序后的表头
         shuffled_row_names = [qobj['row_names'][i] for i in self.row_indices]
         shuffled_col_names = [qobj['col_names'][0]['items'][j] for j in self.col_indices]
 
-        # 答案矩阵也要乱序
+        # 答案矩阵也要乱序（只在显示答案时需要，连考试服务作答时题目不带答案）
         self.shuffled_answer = [
             [qobj['answer'][i][j] for j in self.col_indices]
             for i in self.row_indices
-        ]
+        ] if show_answer else None
         # 用户答案也跟着同步乱序映射
         self.answer_data = answer_data
 
-        layout = QVBoxLayout()
-        self.setLayout(layout)
+        self.big_header.setText(qobj['col_names'][0].get('group', ''))
 
-        # 大表头
-        big_header = QLabel(qobj['col_names'][0].get('group', ''))
-        font = QFont()
-        font.setBold(True)
-        font.setPointSize(16)
-        big_header.setFont(font)
-        big_header.setAlignment(Qt.AlignCenter)
-        big_header.setStyleSheet("background-color: #F2F2F2; border: 1px solid #aaa; padding: 8px;")
-        layout.addWidget(big_header)
-
-        rows, cols = row_cnt, col_cnt
-        table = QTableWidget(rows, cols+1)
-        self.table = table
-        table.setStyleSheet("""
-            QTableWidget, QTableView {
-                gridline-color: #000;
-                font-size: 15px;
-            }
-            QTableWidget::item {
-                border: 2px solid #000;
-            }
-        """)
-        table.setEditTriggers(table.NoEditTriggers)
+        table = self.table
+        table.setRowCount(rows)
+        table.setColumnCount(cols+1)
         h_headers = [qobj.get('row_header', '')] + shuffled_col_names
         table.setHorizontalHeaderLabels(h_headers)
         table.setVerticalHeaderLabels([""]*rows)
-
-        # 行头加粗
-        font_bold = QFont()
-        font_bold.setBold(True)
-        table.horizontalHeader().setFont(font_bold)
-        table.verticalHeader().setFont(font_bold)
         header_bg = QBrush(QColor(220, 230, 241))
         for c in range(table.columnCount()):
             item = table.horizontalHeaderItem(c)
             if item:
                 item.setBackground(header_bg)
 
-        table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
-
         # 设置左边行为乱序
         for i, name in enumerate(shuffled_row_names):
-            item = QTableWidgetItem(name)
-            item.setFont(font_bold)
-            item.setBackground(QColor("#f9f9f9"))
-            item.setTextAlignment(Qt.AlignVCenter | Qt.AlignLeft)
-            table.setItem(i, 0, item)
+            item = table.item(i, 0)
+            if item is None:
+                item = QTableWidgetItem()
+                item.setFont(self.font_bold)
+                item.setBackground(QColor("#f9f9f9"))
+                item.setTextAlignment(Qt.AlignVCenter | Qt.AlignLeft)
+                table.setItem(i, 0, item)
+            item.setText(name)
 
-        # 设置交叉格内容（同步乱序映射）
+        # 设置交叉格内容（同步乱序映射），已有的勾选控件直接复用
         for i in range(rows):
             for j in range(cols):
+                w = table.cellWidget(i, j+1)
+                if w is None:
+                    w = create_centered_checkbox(stateChangedSlot=self.cell_slot(i, j))
+                    table.setCellWidget(i, j+1, w)
+                chk = w.checkbox
+                chk.blockSignals(True)
                 if show_answer:
-                    widget = create_centered_checkbox(self.shuffled_answer[i][j] == 1, enabled=False)
+                    chk.setChecked(self.shuffled_answer[i][j] == 1)
                 else:
                     # 用户答案要按乱序对应
-                    orig_row = self.row_indices[i]
-                    orig_col = self.col_indices[j]
-                    widget = create_centered_checkbox(self.answer_data[orig_row][orig_col], enabled=True, stateChangedSlot=self.save_callback)
-                table.setCellWidget(i, j+1, widget)
+                    chk.setChecked(bool(self.answer_data[self.row_indices[i]][self.col_indices[j]]))
+                chk.setEnabled(not show_answer)
+                chk.blockSignals(False)
 
-        # 统一列宽
-        max_width = 0
-        for c in range(table.columnCount()):
-            h = table.horizontalHeaderItem(c)
-            if h:
-                max_width = max(max_width, get_text_pixel_width(h.text(), font_bold))
-        for r in range(table.rowCount()):
-            v = table.item(r, 0)
-            if v:
-                max_width = max(max_width, get_text_pixel_width(v.text(), font_bold))
-        for c in range(table.columnCount()):
-            table.setColumnWidth(c, max_width)
+        # 统一列宽：各列都没单独设过宽度，改默认宽度一次就全部生效
+        table.horizontalHeader().setDefaultSectionSize(plan['col_width'])
+        if self.row_height is None and rows:
+            self.row_height = table.sizeHintForRow(0)
+            table.verticalHeader().setDefaultSectionSize(self.row_height)
+
+    def cell_slot(self, row, col):
+        """界面第 row 行第 col 个勾选格变化时，按原始坐标回调 save_callback(row, col, checked)"""
+        def slot(state):
+            if not self.show_answer:
+                self.save_callback(self.row_indices[row], self.col_indices[col], state == Qt.Checked)
+        return slot
+
+
+class CrossTableModel(QAbstractTableModel):
+    """交叉表数据模型：第 0 列为行名，其余为勾选格；行列乱序只是下标映射，不复制答案矩阵"""
+
+    def __init__(self, qobj, answer_data, show_answer, save_callback, row_indices, col_indices, parent=None):
+        super().__init__(parent)
+        self.qobj = qobj
+        self.answer_data = answer_data
+        self.show_answer = show_answer
+        self.save_callback = save_callback
+        self.row_indices = row_indices
+        self.col_indices = col_indices
+        self.row_names = qobj['row_names']
+        self.col_names = qobj['col_names'][0]['items']
+        self.font_bold = bold_font()
+        self.row_bg = QColor("#f9f9f9")
+        self.header_bg = QBrush(QColor(220, 230, 241))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.row_indices)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.col_indices) + 1
+
+    def map_to_source(self, row, col):
+        """界面坐标 -> 原始答案坐标（col 不含行名列）"""
+        return self.row_indices[row], self.col_indices[col]
+
+    def is_checked(self, row, col):
+        r, c = self.map_to_source(row, col)
+        if self.show_answer:
+            return self.qobj['answer'][r][c] == 1
+        return bool(self.answer_data[r][c])
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, col = index.row(), index.column()
+        if col == 0:
+            if role == Qt.DisplayRole:
+                return self.row_names[self.row_indices[row]]
+            if role == Qt.FontRole:
+                return self.font_bold
+            if role == Qt.BackgroundRole:
+                return self.row_bg
+            if role == Qt.TextAlignmentRole:
+                return int(Qt.AlignVCenter | Qt.AlignLeft)
+            return None
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self.is_checked(row, col - 1) else Qt.Unchecked
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or self.show_answer or index.column() == 0:
+            return False
+        r, c = self.map_to_source(index.row(), index.column() - 1)
+        self.answer_data[r][c] = value == Qt.Checked
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        if self.save_callback:
+            self.save_callback(r, c, value == Qt.Checked)
+        return True
+
+    def flags(self, index):
+        if index.column() == 0:
+            return Qt.ItemIsEnabled
+        if self.show_answer:
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsUserCheckable
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal:
+            if role == Qt.DisplayRole:
+                if section == 0:
+                    return self.qobj.get('row_header', '')
+                return self.col_names[self.col_indices[section - 1]]
+            if role == Qt.FontRole:
+                return self.font_bold
+            if role == Qt.BackgroundRole:
+                return self.header_bg
+        elif role == Qt.DisplayRole:
+            return ""
+        return None
+
+
+class CenteredCheckBoxDelegate(QStyledItemDelegate):
+    """直接绘制居中的复选框并处理点击，代替每格一个 QCheckBox 控件"""
+
+    def _check_rect(self, option):
+        style = option.widget.style() if option.widget else QApplication.style()
+        opt = QStyleOptionButton()
+        size = style.subElementRect(QStyle.SE_CheckBoxIndicator, opt, option.widget).size()
+        rect = QRect(0, 0, size.width(), size.height())
+        rect.moveCenter(option.rect.center())
+        return rect
+
+    def paint(self, painter, option, index):
+        state = index.data(Qt.CheckStateRole)
+        if state is None:
+            super().paint(painter, option, index)
+            return
+        style = option.widget.style() if option.widget else QApplication.style()
+        opt = QStyleOptionButton()
+        opt.rect = self._check_rect(option)
+        opt.state = QStyle.State_On if state == Qt.Checked else QStyle.State_Off
+        if index.flags() & Qt.ItemIsUserCheckable:
+            opt.state |= QStyle.State_Enabled
+        style.drawPrimitive(QStyle.PE_IndicatorCheckBox, opt, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if not index.flags() & Qt.ItemIsUserCheckable:
+            return False
+        if event.type() == QEvent.MouseButtonRelease:
+            if event.button() != Qt.LeftButton or not self._check_rect(option).contains(event.pos()):
+                return False
+        elif event.type() == QEvent.MouseButtonDblClick:
+            return True
+        elif event.type() == QEvent.KeyPress:
+            if event.key() not in (Qt.Key_Space, Qt.Key_Select):
+                return False
+        else:
+            return False
+        state = index.data(Qt.CheckStateRole)
+        return model.setData(index, Qt.Unchecked if state == Qt.Checked else Qt.Checked, Qt.CheckStateRole)
+
+
+class CrossTableView(QWidget):
+    """与 CrossTableWidget 外观一致的 model/view 版本，用于大矩阵"""
+
+    @profiling.traced("CrossTableView.__init__")
+    def __init__(self, qobj, answer_data, show_answer, save_callback, plan=None):
+        super().__init__()
+        profiling.track_widget(self)
+        install_style()
+        self.save_callback = save_callback
+        self.model = None
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        self.big_header = QLabel()
+        self.big_header.setObjectName("crossTableHeader")
+        font = QFont()
+        font.setBold(True)
+        font.setPointSize(16)
+        self.big_header.setFont(font)
+        self.big_header.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.big_header)
+
+        table = QTableView()
+        self.table = table
+        table.setObjectName("crossTable")
+        table.setEditTriggers(table.NoEditTriggers)
+        table.setSelectionMode(table.NoSelection)
+        self.delegate = CenteredCheckBoxDelegate(table)
+        table.setItemDelegate(self.delegate)
+
+        font_bold = bold_font()
+        table.horizontalHeader().setFont(font_bold)
+        table.verticalHeader().setFont(font_bold)
+        # 大表不按内容逐行测量高度
+        table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
         layout.addWidget(table)
 
+        self.bind(qobj, answer_data, show_answer, plan)
+
+    @profiling.traced("CrossTableView.bind")
+    def bind(self, qobj, answer_data, show_answer, plan=None):
+        self.qobj = qobj
+        self.show_answer = show_answer
+        self.answer_data = answer_data
+        if plan is None:
+            plan = plan_cross_table(qobj)
+        self.row_indices = plan['row_indices']
+        self.col_indices = plan['col_indices']
+        self.big_header.setText(qobj['col_names'][0].get('group', ''))
+
+        old = self.model
+        self.model = CrossTableModel(qobj, answer_data, show_answer, self.save_callback,
+                                     self.row_indices, self.col_indices, self)
+        self.table.setModel(self.model)
+        if old is not None:
+            old.deleteLater()
+        # 统一列宽
+        self.table.horizontalHeader().setDefaultSectionSize(plan['col_width'])
+
     def get_current_answer(self):
         """恢复成原顺序的作答结果（给判分用）"""
-        # 还原成原始顺序的二维数组
-        rows = len(self.qobj['row_names'])
-        cols = len(self.qobj['col_names'][0]['items'])
-        result = [[False]*cols for _ in range(rows)]
-        for i, ri in enumerate(self.row_indices):
-            for j, cj in enumerate(self.col_indices):
-                w = self.table.cellWidget(i, j+1)
-                if w is not None:
-                    cb = w.findChild(QCheckBox)
-                    if cb:
-                        result[ri][cj] = cb.isChecked()
-        return result
+        return [list(map(bool, row)) for row in self.answer_data]
+
+
+def cross_table_class(qobj):
+    cells = len(qobj['row_names']) * len(qobj['col_names'][0]['items'])
+    if cells > MODEL_VIEW_THRESHOLD:
+        return CrossTableView
+    return CrossTableWidget
@@ -1,10 +1,251 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel
+from PyQt5.QtGui import QPainter, QColor, QPen, QDrag
+from PyQt5.QtCore import Qt, QRectF, QMimeData, QByteArray
+
+import profiling
+from app_style import install_style
+from image_loader import image_loader
+
+# 拖图题格式：
+# {"type": "drag_image", "question": "...", "background": "底图路径(可选)",
+#  "zones": [{"name": "区域名", "rect": [x, y, w, h]}, ...],      # 底图像素坐标
+#  "items": [{"name": "图片名", "image": "图片路径"}, ...],
+#  "answer": [每个图片应放的区域下标，-1 表示不应放置]}
+# 作答为每个图片所放区域的下标列表，-1 表示未放置
+
+MIME_TYPE = 'application/x-quiz-drag-item'
+ITEM_SIZE = 96
+BOARD_MAX = (1200, 700)
+
+
+def item_images(qobj):
+    return [it.get('image', '') for it in qobj.get('items', [])]
+
+
+def prefetch_drag_image(qobj, rng=None):
+    """为即将显示的拖图题提前在后台解码图片；拖图题没有乱序，rng 不用"""
+    loader = image_loader()
+    if qobj.get('background'):
+        loader.prefetch(qobj['background'], *BOARD_MAX)
+    for path in item_images(qobj):
+        loader.prefetch(path, ITEM_SIZE, ITEM_SIZE)
+
+
+def start_item_drag(source, item, pixmap):
+    drag = QDrag(source)
+    mime = QMimeData()
+    mime.setData(MIME_TYPE, QByteArray(str(item).encode()))
+    drag.setMimeData(mime)
+    if pixmap is not None:
+        drag.setPixmap(pixmap)
+    drag.exec_(Qt.MoveAction)
+
+
+def dropped_item(event):
+    if not event.mimeData().hasFormat(MIME_TYPE):
+        return None
+    return int(bytes(event.mimeData().data(MIME_TYPE)).decode())
+
+
+class DragItemLabel(QLabel):
+    def __init__(self, owner, item):
+        super().__init__()
+        self.owner = owner
+        self.item = item
+        self.setFixedSize(ITEM_SIZE + 8, ITEM_SIZE + 24)
+        self.setAlignment(Qt.AlignCenter)
+        self.setObjectName("dragItem")
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self.owner.editable:
+            start_item_drag(self, self.item, self.owner.item_pixmap(self.item))
+
+
+class ItemTray(QWidget):
+    """待放置的图片；把已放置的图片拖回这里表示取消放置"""
+
+    def __init__(self, owner):
+        super().__init__()
+        self.owner = owner
+        self.setAcceptDrops(True)
+        self.layout = QHBoxLayout(self)
+        self.layout.setAlignment(Qt.AlignLeft)
+        self.labels = []
+
+    def dragEnterEvent(self, event):
+        if self.owner.editable and dropped_item(event) is not None:
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        item = dropped_item(event)
+        if item is not None:
+            self.owner.place(item, -1)
+            event.acceptProposedAction()
+
+
+class DropBoard(QWidget):
+    """底图和放置区域，图片拖进区域即放置"""
+
+    def __init__(self, owner):
+        super().__init__()
+        self.owner = owner
+        self.setAcceptDrops(True)
+        self.setMinimumHeight(300)
+
+    def canvas_size(self):
+        q = self.owner.qobj
+        size = image_loader().sizes.get(q.get('background'))
+        if size is not None:
+            return size.width(), size.height()
+        w = h = 1
+        for z in q.get('zones', []):
+            x, y, zw, zh = z['rect']
+            w, h = max(w, x + zw), max(h, y + zh)
+        return w, h
+
+    def transform(self):
+        cw, ch = self.canvas_size()
+        scale = min(self.width() / cw, self.height() / ch)
+        ox = (self.width() - cw * scale) / 2
+        oy = (self.height() - ch * scale) / 2
+        return scale, ox, oy
+
+    def zone_rects(self):
+        scale, ox, oy = self.transform()
+        return [QRectF(ox + x * scale, oy + y * scale, w * scale, h * scale)
+                for x, y, w, h in (z['rect'] for z in self.owner.qobj.get('zones', []))]
+
+    def zone_at(self, pos):
+        for i, rect in enumerate(self.zone_rects()):
+            if rect.contains(pos.x(), pos.y()):
+                return i
+        return -1
+
+    def item_rects(self):
+        """已放置图片在画面上的位置：同一区域内横向排开"""
+        rects = {}
+        zones = self.zone_rects()
+        counts = {}
+        for item, zone in enumerate(self.owner.placements):
+            if 0 <= zone < len(zones):
+                k = counts.get(zone, 0)
+                counts[zone] = k + 1
+                z = zones[zone]
+                side = min(z.height() - 4, ITEM_SIZE)
+                rects[item] = QRectF(z.x() + 2 + k * (side + 2), z.y() + 2, side, side)
+        return rects
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        q = self.owner.qobj
+        scale, ox, oy = self.transform()
+        if q.get('background'):
+            pix = image_loader().get(q['background'], *BOARD_MAX)
+            if pix is not None:
+                cw, ch = self.canvas_size()
+                painter.drawPixmap(QRectF(ox, oy, cw * scale, ch * scale).toRect(), pix)
+        correct = q.get('answer', [])
+        for i, rect in enumerate(self.zone_rects()):
+            painter.setPen(QPen(QColor("#3a6ea5"), 2, Qt.DashLine))
+            painter.drawRect(rect)
+            painter.drawText(rect.adjusted(4, 0, 0, -4), Qt.AlignLeft | Qt.AlignBottom,
+                             q['zones'][i].get('name', ''))
+        for item, rect in self.item_rects().items():
+            pix = self.owner.item_pixmap(item)
+            if pix is not None:
+                painter.drawPixmap(rect.toRect(), pix)
+            else:
+                painter.drawText(rect, Qt.AlignCenter, q['items'][item].get('name', ''))
+            if self.owner.show_answer and item < len(correct):
+                ok = self.owner.user_placements[item] == correct[item]
+                painter.setPen(QPen(QColor("green" if ok else "red"), 3))
+                painter.drawRect(rect)
+
+    def mousePressEvent(self, event):
+        if event.button() != Qt.LeftButton or not self.owner.editable:
+            return
+        for item, rect in self.item_rects().items():
+            if rect.contains(event.pos().x(), event.pos().y()):
+                start_item_drag(self, item, self.owner.item_pixmap(item))
+                return
+
+    def dragEnterEvent(self, event):
+        if self.owner.editable and dropped_item(event) is not None:
+            event.acceptProposedAction()
+
+    def dragMoveEvent(self, event):
+        if self.zone_at(event.pos()) >= 0:
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def dropEvent(self, event):
+        item = dropped_item(event)
+        zone = self.zone_at(event.pos())
+        if item is not None and zone >= 0:
+            self.owner.place(item, zone)
+            event.acceptProposedAction()
+
 
 class DragImageWidget(QWidget):
-    def __init__(self, qobj, answer_data, show_answer, save_callback):
+    @profiling.traced("DragImageWidget.__init__")
+    def __init__(self, qobj, answer_data, show_answer, save_callback, plan=None):
         super().__init__()
+        profiling.track_widget(self)
+        install_style()
+        self.save_callback = save_callback
         layout = QVBoxLayout()
         self.setLayout(layout)
-        label = QLabel(f"【拖图题】{qobj.get('question', '')}\n(后续实现图片和拖放功能)")
-        label.setStyleSheet("color:blue;font-size:18px;")
-        layout.addWidget(label)
+        self.board = DropBoard(self)
+        self.tray = ItemTray(self)
+        layout.addWidget(self.board, 1)
+        layout.addWidget(self.tray)
+        image_loader().loaded.connect(self.on_image_loaded)
+        self.bind(qobj, answer_data, show_answer, plan)
+
+    @profiling.traced("DragImageWidget.bind")
+    def bind(self, qobj, answer_data, show_answer, plan=None):
+        self.qobj = qobj
+        self.show_answer = show_answer
+        self.editable = not show_answer
+        n = len(qobj.get('items', []))
+        self.user_placements = list(answer_data) if answer_data is not None else [-1] * n
+        # 显示答案时按标准答案摆放，边框标出作答对错
+        self.placements = list(qobj.get('answer', [])) if show_answer else self.user_placements
+        self.paths = set(item_images(qobj))
+        self.paths.add(qobj.get('background'))
+        for idx in range(len(self.tray.labels), n):
+            label = profiling.track_widget(DragItemLabel(self, idx))
+            self.tray.labels.append(label)
+            self.tray.layout.addWidget(label)
+        self.refresh()
+
+    def item_pixmap(self, item):
+        path = self.qobj['items'][item].get('image')
+        return image_loader().get(path, ITEM_SIZE, ITEM_SIZE) if path else None
+
+    def place(self, item, zone):
+        if not self.editable or self.placements[item] == zone:
+            return
+        self.placements[item] = zone
+        self.refresh()
+        self.save_callback(item, zone)
+
+    def refresh(self):
+        items = self.qobj.get('items', [])
+        for idx, label in enumerate(self.tray.labels):
+            if idx < len(items) and self.placements[idx] < 0:
+                pix = self.item_pixmap(idx)
+                if pix is not None:
+                    label.setPixmap(pix)
+                else:
+                    label.setText(items[idx].get('name', ''))
+                label.show()
+            else:
+                label.hide()
+        self.board.update()
+
+    def on_image_loaded(self, key):
+        if key[0] in self.paths and self.isVisible():
+            self.refresh()
@@ -0,0 +1,237 @@
+import json
+import threading
+import http.client
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from grading import ExamScores
+from session_journal import RECORDS, R_BIT, R_SINGLE, R_CUR, R_REGION, R_DWELL
+
+# exam_server 的客户端，QuizMain 以瘦客户端方式运行时使用；不依赖 PyQt5
+# 题目按需取回并缓存最近几题，作答改动编码成会话日志记录，由后台线程成批上传
+
+
+class ExamServerError(OSError):
+    def __init__(self, status, message):
+        super().__init__(f'{status} {message}')
+        self.status = status
+
+
+class ExamClient:
+    """一条 keep-alive 连接，多线程共用时按请求加锁；连接断开自动重连一次"""
+
+    def __init__(self, base_url, timeout=10):
+        url = urlsplit(base_url)
+        self.host = url.hostname or '127.0.0.1'
+        self.port = url.port or 80
+        self.prefix = url.path.rstrip('/')
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def request(self, method, path, body=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+        with self._lock:
+            for attempt in (0, 1):
+                if self._conn is None:
+                    self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                try:
+                    self._conn.request(method, self.prefix + path, body=body or b'')
+                    resp = self._conn.getresponse()
+                    data = resp.read()
+                    break
+                except (OSError, http.client.HTTPException):
+                    # 服务端关掉了空闲连接等情况：重连再试一次（作答记录重发是幂等的）
+                    self._conn.close()
+                    self._conn = None
+                    if attempt:
+                        raise
+        payload = json.loads(data) if data else {}
+        if resp.status != 200:
+            raise ExamServerError(resp.status, payload.get('error', ''))
+        return payload
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class RemoteQuestions:
+    """服务端会话里的题目（已按会话乱序），接口与题库相同"""
+
+    def __init__(self, client, session, count, cache_size=64):
+        self.client = client
+        self.session = session
+        self.count = count
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += self.count
+        if not 0 <= idx < self.count:
+            raise IndexError('question index out of range')
+        with self._cache_lock:
+            q = self._cache.get(idx)
+            if q is not None:
+                self._cache.move_to_end(idx)
+                return q
+        q = self.client.request('GET', f'/sessions/{self.session}/questions/{idx}')
+        self._put(idx, q)
+        return q
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _put(self, idx, q):
+        with self._cache_lock:
+            self._cache[idx] = q
+            self._cache.move_to_end(idx)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def forget(self):
+        """交卷后题目会带上答案，丢掉缓存重新取"""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def close(self):
+        pass
+
+
+class RemoteSync:
+    """作为 AnswerStore.observer 使用，接口与 SessionJournal 相同；上传失败时记录留在缓冲里下次重试"""
+
+    def __init__(self, client, session, store, flush_interval=0.3):
+        self.client = client
+        self.session = session
+        self.store = store
+        self.flush_interval = flush_interval
+        self.finished = False
+        self._buf = bytearray()
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        store.observer = self
+        self._thread = threading.Thread(target=self._run, name='remote-sync', daemon=True)
+        self._thread.start()
+
+    def _append(self, data):
+        with self._lock:
+            self._buf += data
+
+    def bit_changed(self, idx, bit, value):
+        self._append(RECORDS[R_BIT].pack(R_BIT, idx, bit, 1 if value else 0))
+
+    def single_changed(self, idx, option):
+        self._append(RECORDS[R_SINGLE].pack(R_SINGLE, idx, -1 if option is None else option))
+
+    def region_changed(self, idx, data):
+        self._append(RECORDS[R_REGION].pack(R_REGION, idx, len(data)) + bytes(data))
+
+    def set_cur(self, idx):
+        self._append(RECORDS[R_CUR].pack(R_CUR, idx))
+
+    def set_dwell(self, idx, ms):
+        self._append(RECORDS[R_DWELL].pack(R_DWELL, idx, ms))
+
+    def finish(self):
+        self.finished = True
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def flush(self):
+        """把缓冲的改动发给服务端；失败时抛出异常，记录保留"""
+        with self._io_lock:
+            with self._lock:
+                data = bytes(self._buf)
+                self._buf.clear()
+            if not data or self.finished:
+                return
+            try:
+                self._send(data)
+            except OSError as e:
+                if isinstance(e, ExamServerError) and e.status != 503:
+                    raise  # 服务端拒收（如已交卷），重试也没有用
+                with self._lock:
+                    self._buf[:0] = data
+                raise
+
+    def _send(self, data):
+        self.client.request('POST', f'/sessions/{self.session}/answers', data)
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        try:
+            self.flush()
+        except OSError:
+            pass
+        if self.store.observer is self:
+            self.store.observer = None
+
+
+class RemoteExam:
+    """连到考试服务上的一场考试：新建或按会话号续考"""
+
+    def __init__(self, base_url, session=None, seed=None, timeout=10):
+        self.client = ExamClient(base_url, timeout)
+        if session is None:
+            session = self.client.request('POST', '/sessions', {'seed': seed})['session']
+        self.session = session
+        self.state = self.client.request('GET', f'/sessions/{session}')
+        self.questions = RemoteQuestions(self.client, session, self.state['count'])
+        self.sync = None
+
+    def attach(self, store):
+        """把服务端已有的作答写进本地 AnswerStore 并开始同步，返回续考的题号；
+        各题宽度随会话状态一起给出，不用逐题下载题目"""
+        widths = self.state.get('widths', {})
+        for idx, data in self.state['answers'].items():
+            store.load(int(idx), bytes.fromhex(data), widths.get(idx))
+        self.sync = RemoteSync(self.client, self.session, store)
+        return self.state['cur']
+
+    def commit(self, idx):
+        """提交单题，服务端公开答案后题目缓存换成带答案的版本"""
+        self.sync.flush()
+        res = self.client.request('POST', f'/sessions/{self.session}/questions/{idx}/commit')
+        q = dict(self.questions[idx])
+        q['answer'] = res['answer']
+        self.questions._put(idx, q)
+        return res
+
+    def finish(self):
+        self.sync.flush()
+        res = self.client.request('POST', f'/sessions/{self.session}/finish')
+        self.sync.finish()
+        self.questions.forget()
+        return ExamScores(res['types'], np.asarray(res['correct'], dtype=np.int64),
+                          np.asarray(res['total'], dtype=np.int64), np.asarray(res['missed'], dtype=np.int64),
+                          np.asarray(res['over'], dtype=np.int64), np.asarray(res['graded'], dtype=bool))
+
+    def close(self):
+        if self.sync is not None:
+            self.sync.close()
+        self.client.close()
@@ -0,0 +1,135 @@
+import time
+from array import array
+
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+# 考试计时：整场限时、每题限时和每题停留时间
+# 时间一律由 time.monotonic() 的时间戳相减得到，定时器只管刷新倒计时和到点提醒，界面忙时定时器来晚了也不会少算；
+# 整个窗口只有一个单次定时器，每次按最近一个要变的时刻（倒计时跳秒、到点、定期记录）重新排
+# 停留时间按题存成毫秒数的 array('I')，离开一题时记给那一题，长时间停在同一题上也定期记一次
+
+CHECKPOINT_MS = 15000
+MAX_DWELL = 0xFFFFFFFF
+
+
+def format_span(ms):
+    """倒计时按秒向上取整，显示 00:00 时正好到点"""
+    s = max(0, (ms + 999) // 1000)
+    h, s = divmod(s, 3600)
+    m, s = divmod(s, 60)
+    return f'{h}:{m:02d}:{s:02d}' if h else f'{m:02d}:{s:02d}'
+
+
+def _next_change(remaining):
+    """倒计时显示的秒数还有多少毫秒变"""
+    return (remaining - 1) % 1000 + 1
+
+
+def _now():
+    return int(time.monotonic() * 1000)
+
+
+class ExamClock(QObject):
+    """整场已用时间为各题停留时间之和，续考时从会话日志里的停留时间接着算；limit 为整场限时（毫秒），None 为不限"""
+
+    tick = pyqtSignal()                   # 倒计时显示的秒数变了
+    expired = pyqtSignal()                # 整场时间到
+    question_expired = pyqtSignal(int)    # 停在这一题上时本题时间到
+    dwell_changed = pyqtSignal(int, int)  # 题号, 累计停留毫秒数
+
+    def __init__(self, count, dwell=None, limit=None, parent=None):
+        super().__init__(parent)
+        self.dwell = array('I', dwell) if dwell is not None and len(dwell) == count else array('I', [0]) * count
+        self.elapsed = sum(self.dwell)
+        self.limit = limit
+        self.cur = None
+        self.question_limit = None
+        self.running = True
+        self._mark = 0        # 上次记账的时刻
+        self._saved = 0       # 上次发 dwell_changed 的时刻
+        self._question_over = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        # 粗精度定时器可能提前几十毫秒到，倒计时还没跳秒就得再排一次
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._on_timer)
+
+    def _charge(self, now):
+        if self.cur is not None:
+            spent = now - self._mark
+            self.dwell[self.cur] = min(MAX_DWELL, self.dwell[self.cur] + spent)
+            self.elapsed += spent
+        self._mark = now
+
+    def _save(self, now):
+        if self.cur is not None:
+            self.dwell_changed.emit(self.cur, self.dwell[self.cur])
+        self._saved = now
+
+    def enter(self, idx, question_limit=None):
+        """切到第 idx 题（同一题重新显示也调用），question_limit 为本题限时（毫秒）"""
+        if not self.running:
+            return
+        now = _now()
+        self._charge(now)
+        if idx != self.cur:
+            self._save(now)
+            self.cur = idx
+            self._question_over = False
+        self.question_limit = question_limit
+        # 进来时本题已经超时（之前就用完了时间）不再提醒，只是 question_over() 为真
+        self._question_over = self._question_over or self.question_over()
+        self._schedule(now)
+
+    def remaining(self):
+        return None if self.limit is None else self.limit - self.elapsed
+
+    def question_remaining(self):
+        if self.question_limit is None or self.cur is None:
+            return None
+        return self.question_limit - self.dwell[self.cur]
+
+    def question_over(self):
+        rem = self.question_remaining()
+        return rem is not None and rem <= 0
+
+    def time_over(self):
+        rem = self.remaining()
+        return rem is not None and rem <= 0
+
+    def stop(self):
+        """交卷或关窗口：把当前这一题的时间记上，之后不再计时"""
+        if not self.running:
+            return
+        now = _now()
+        self._charge(now)
+        self._save(now)
+        self.running = False
+        self._timer.stop()
+
+    def _on_timer(self):
+        now = _now()
+        self._charge(now)
+        if self.time_over():
+            self.stop()
+            self.tick.emit()
+            self.expired.emit()
+            return
+        if not self._question_over and self.question_over():
+            self._question_over = True
+            self.question_expired.emit(self.cur)
+        if now - self._saved >= CHECKPOINT_MS:
+            self._save(now)
+        self.tick.emit()
+        if self.running:
+            self._schedule(now)
+
+    def _schedule(self, now):
+        waits = [CHECKPOINT_MS - (now - self._saved)]
+        rem = self.remaining()
+        if rem is not None:
+            waits.append(_next_change(rem) if rem > 0 else 0)
+        rem = self.question_remaining()
+        if rem is not None and rem > 0:
+            waits.append(_next_change(rem))
+        self._timer.start(max(0, min(waits)))
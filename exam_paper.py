@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import random
+import struct
+import argparse
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from collections.abc import Sequence
+
+# 组卷：从 N 题的题库里抽 k 题，只用 O(k) 的时间和内存，不复制题库
+# 整张卷子由一个种子决定：题目顺序和每题的行列乱序都能原样重新生成，方便复查
+# 按题型 / 标签配额抽题时需要各分类的题号表，第一次建好后缓存在 <题库>.strata 里
+
+PAPER_MAGIC = b'QPAPER1\n'
+PAPER_HEADER = struct.Struct('<QI')   # 种子, 题数
+STRATA_SUFFIX = '.strata'
+STRATA_MAGIC = b'QSTRATA1\n'
+TAG_PREFIX = 'tag:'
+SEED_LIMIT = 1 << 63   # 种子在卷子文件和会话快照里按无符号 64 位存，new_seed 只取 63 位
+
+
+class ExamPaper:
+    """一张卷子：indices 为按出题顺序排列的题库下标，layout_seeds 为每题行列乱序用的种子"""
+
+    def __init__(self, seed, indices):
+        self.seed = seed
+        self.indices = array('I', indices)
+        # 乱序种子只由总种子和题目位置决定，瘦客户端拿到总种子就能算出同样的布局
+        rng = random.Random(f'{seed}/layout')
+        self.layout_seeds = array('Q', (rng.getrandbits(64) for _ in range(len(self.indices))))
+
+    def __len__(self):
+        return len(self.indices)
+
+    def layout(self, pos):
+        """第 pos 题的行列乱序随机源，每次调用都从头开始，结果相同"""
+        return random.Random(self.layout_seeds[pos])
+
+    def to_bytes(self):
+        return PAPER_MAGIC + PAPER_HEADER.pack(self.seed, len(self.indices)) + self.indices.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        if not data.startswith(PAPER_MAGIC):
+            raise ValueError('not an exam paper file')
+        seed, k = PAPER_HEADER.unpack_from(data, len(PAPER_MAGIC))
+        indices = array('I')
+        pos = len(PAPER_MAGIC) + PAPER_HEADER.size
+        indices.frombytes(data[pos:pos + 4 * k])
+        return cls(seed, indices)
+
+
+def new_seed():
+    return random.SystemRandom().getrandbits(63)
+
+
+class _Concat(Sequence):
+    """几个题号表首尾相接当成一个序列用，不复制"""
+
+    def __init__(self, parts):
+        self.parts = [p for p in parts if len(p)]
+        self.ends = list(accumulate(len(p) for p in self.parts))
+
+    def __len__(self):
+        return self.ends[-1] if self.ends else 0
+
+    def __getitem__(self, i):
+        k = bisect_right(self.ends, i)
+        return self.parts[k][i - (self.ends[k - 1] if k else 0)]
+
+
+def _draw(rng, pool, count, chosen, label, skip=None):
+    """从 pool 里抽 count 个不在 chosen 里（且 skip 不为真）的下标；pool 远大于 count 时拒绝采样，期望 O(count)"""
+    picks = []
+    n = len(pool)
+    if count * 2 < n:
+        attempts = count * 8
+        while len(picks) < count and attempts:
+            attempts -= 1
+            i = pool[rng.randrange(n)]
+            if i not in chosen and not (skip and skip(i)):
+                chosen.add(i)
+                picks.append(i)
+        if len(picks) == count:
+            return picks
+    # 剩余可选的题不多：整体打乱后顺序挑
+    for i in rng.sample(pool, n):
+        if len(picks) == count:
+            break
+        if i not in chosen and not (skip and skip(i)):
+            chosen.add(i)
+            picks.append(i)
+    if len(picks) < count:
+        raise ValueError(f'{label}只有 {len(picks)} 道可选，不够 {count} 道')
+    return picks
+
+
+def question_type(bank, idx):
+    t = bank.type_name(idx) if hasattr(bank, 'type_name') else None
+    return t if t is not None else bank[idx].get('type')
+
+
+def assemble(bank, k=None, seed=None, quotas=None, strata=None):
+    """抽题组卷。quotas 为 {分类: 题数}，分类是题型名或 'tag:标签'；k 大于配额总数时其余从全库补齐。
+    按标签抽和补题时都跳过配额里出现的题型，所以题型配额是确切题数，标签配额是至少题数。
+    strata 为 {分类: 题库下标序列}，省略时按需用 load_strata 建立"""
+    n = len(bank)
+    quotas = quotas or {}
+    k = sum(quotas.values()) if k is None and quotas else (n if k is None else k)
+    if k > n:
+        raise ValueError(f'题库只有 {n} 道题，不够 {k} 道')
+    if sum(quotas.values()) > k:
+        raise ValueError('各分类配额之和超过总题数')
+    seed = new_seed() if seed is None else seed
+    if isinstance(seed, bool) or not isinstance(seed, int) or not 0 <= seed < SEED_LIMIT:
+        raise ValueError(f'种子应为 0 到 2**63-1 之间的整数：{seed!r}')
+    rng = random.Random(seed)
+    if not quotas:
+        # random.sample 对 range 在 k 远小于 n 时用集合去重抽样，不展开整个 range
+        return ExamPaper(seed, rng.sample(range(n), k))
+    if strata is None:
+        strata = load_strata(bank, {key_kind(key) for key in quotas})
+    chosen = set()
+    picks = []
+    fixed = {key for key in quotas if key_kind(key) == 'type'}
+    # 标签表里混着各种题型，有题型配额时抽到的题要看一眼题型；只看抽中的，期望 O(配额)
+    skip = (lambda i: question_type(bank, i) in fixed) if fixed else None
+    for key in sorted(quotas):
+        picks += _draw(rng, strata.get(key, ()), quotas[key], chosen, key, skip if key_kind(key) == 'tag' else None)
+    if k > len(picks):
+        # 补题只从没有配额的题型里抽：直接拼这些题型的题号表，不用逐题判断题型
+        pool = range(n)
+        if fixed:
+            pool = _Concat([strata[key] for key in sorted(strata) if key_kind(key) == 'type' and key not in fixed])
+        picks += _draw(rng, pool, k - len(picks), chosen, '其他题型')
+    rng.shuffle(picks)
+    return ExamPaper(seed, picks)
+
+
+def key_kind(key):
+    return 'tag' if key.startswith(TAG_PREFIX) else 'type'
+
+
+def question_keys(q, kinds):
+    if 'type' in kinds:
+        yield q.get('type')
+    if 'tag' in kinds:
+        for tag in q.get('tags') or ():
+            yield TAG_PREFIX + tag
+
+
+def build_strata(bank, kinds=('type',)):
+    """扫一遍题库得到 {分类: array('I') 题库下标}；编译后的题库按题型分类时不用解码题目"""
+    kinds = set(kinds)
+    strata = {}
+    fast_type = kinds == {'type'} and hasattr(bank, 'type_name')
+    for idx in range(len(bank)):
+        if fast_type:
+            t = bank.type_name(idx)
+            keys = (t,) if t is not None else question_keys(bank[idx], kinds)
+        else:
+            keys = question_keys(bank[idx], kinds)
+        for key in keys:
+            if key is not None:
+                strata.setdefault(key, array('I')).append(idx)
+    return strata
+
+
+def _strata_key(path, kinds):
+    st = os.stat(path)
+    return f'{st.st_size}:{st.st_mtime_ns}:{",".join(sorted(kinds))}'.encode()
+
+
+def load_strata(bank, kinds=('type',)):
+    """从 <题库>.strata 读分类表，题库改过或没有缓存时重建；内存里的题目列表不缓存"""
+    path = getattr(bank, 'path', None)
+    if not path:
+        return build_strata(bank, kinds)
+    cache_path = path + STRATA_SUFFIX
+    key = _strata_key(path, kinds)
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            data = f.read()
+        if data.startswith(STRATA_MAGIC):
+            saved_key, _, rest = data[len(STRATA_MAGIC):].partition(b'\n')
+            head, _, body = rest.partition(b'\n')
+            if saved_key == key:
+                strata, pos = {}, 0
+                for name, count in json.loads(head):
+                    strata[name] = arr = array('I')
+                    arr.frombytes(body[pos:pos + 4 * count])
+                    pos += 4 * count
+                return strata
+    strata = build_strata(bank, kinds)
+    head = json.dumps([[name, len(arr)] for name, arr in strata.items()], ensure_ascii=False).encode()
+    try:
+        with open(cache_path, 'wb') as f:
+            f.write(STRATA_MAGIC + key + b'\n' + head + b'\n')
+            for arr in strata.values():
+                f.write(arr.tobytes())
+    except OSError:
+        pass
+    return strata
+
+
+def parse_quotas(specs):
+    """['single_choice=10', 'tag:几何=5'] -> {'single_choice': 10, 'tag:几何': 5}"""
+    quotas = {}
+    for spec in specs or ():
+        key, _, count = spec.rpartition('=')
+        if not key:
+            raise ValueError(f'配额格式应为 分类=题数：{spec}')
+        quotas[key] = int(count)
+    return quotas
+
+
+def main(argv=None):
+    from question_bank import open_bank
+
+    parser = argparse.ArgumentParser(description='按种子抽题组卷，同一种子总能生成同一张卷子')
+    parser.add_argument('bank')
+    parser.add_argument('-k', '--count', type=int, help='总题数，默认为配额之和（无配额时为整库）')
+    parser.add_argument('--seed', type=int, help='种子，省略时随机生成并打印出来')
+    parser.add_argument('--quota', action='append', help='分类配额，如 single_choice=10 或 tag:几何=5，可重复')
+    parser.add_argument('-o', '--output', help='把卷子写成二进制文件')
+    args = parser.parse_args(argv)
+
+    bank = open_bank(args.bank)
+    try:
+        paper = assemble(bank, args.count, args.seed, parse_quotas(args.quota))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        bank.close()
+    print(f'种子 {paper.seed}，共 {len(paper)} 题', file=sys.stderr)
+    if args.output:
+        with open(args.output, 'wb') as f:
+            f.write(paper.to_bytes())
+    else:
+        print(' '.join(map(str, paper.indices)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,318 @@
+import sys
+import json
+import time
+import asyncio
+import secrets
+import argparse
+from array import array
+from urllib.parse import urlsplit
+
+import question_types
+from grading import grade_exam
+from question_bank import ShuffledView, open_bank
+from answer_state import AnswerStore
+from session_journal import RevealedError, SessionState, check_records
+from exam_paper import assemble, load_strata, key_kind, parse_quotas
+
+# 局域网考试服务：题库只加载一次，每个考生一个乱序会话，作答增量上传，服务端统一批改；不依赖 PyQt5
+# 作答增量沿用会话日志的二进制记录格式（session_journal.RECORDS），POST 原始字节即可
+#
+# POST   /sessions                       新建会话，按服务端的题数和配额组卷，返回 {"session", "count"}；
+#                                        服务以 --client-seed 启动时可带 {"seed": 非负整数} 指定种子
+# GET    /sessions/<id>                  会话状态、已作答题目的原始数据和宽度、已公开答案的题和各题停留时间，用于断线重连
+# GET    /sessions/<id>/questions/<i>    第 i 题；未交卷且未提交该题时不含答案
+# POST   /sessions/<id>/answers          作答增量（日志记录字节串）；越界 400，改到已提交的题 409，整批不生效
+# POST   /sessions/<id>/questions/<i>/commit  提交单题：返回本题批改结果和答案
+# POST   /sessions/<id>/finish           交卷，返回整卷批改结果
+# DELETE /sessions/<id>                  删除会话
+
+MAX_BODY = 1 << 20
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def scores_payload(scores):
+    return {
+        'total_score': scores.total_score, 'total_count': scores.total_count, 'types': scores.types,
+        'correct': scores.correct.tolist(), 'total': scores.total.tolist(),
+        'missed': scores.missed.tolist(), 'over': scores.over.tolist(), 'graded': scores.graded.tolist(),
+    }
+
+
+class ExamSession:
+    """一个考生：题目顺序、按位压缩的作答和已公开答案的题目，内存只与题数有关"""
+
+    __slots__ = ('id', 'seed', 'questions', 'answers', 'revealed', 'dwell', 'cur_idx', 'finished', 'last_seen', 'busy')
+
+    def __init__(self, sid, bank, paper):
+        self.id = sid
+        self.seed = paper.seed
+        self.questions = ShuffledView(bank, paper.indices)
+        self.answers = AnswerStore(self.questions)
+        self.revealed = bytearray(len(paper))
+        self.dwell = array('I', [0]) * len(paper)
+        self.cur_idx = 0
+        self.finished = False
+        self.last_seen = time.monotonic()
+        self.busy = False
+
+    def state(self):
+        regions, widths = {}, {}
+        for i in range(len(self.answers)):
+            data = self.answers.bits(i)
+            if data is not None:
+                regions[str(i)] = data.hex()
+                widths[str(i)] = self.answers.width(i)
+        return {'session': self.id, 'seed': self.seed, 'count': len(self.questions), 'cur': self.cur_idx,
+                'finished': self.finished, 'answers': regions, 'widths': widths,
+                'revealed': [i for i, r in enumerate(self.revealed) if r], 'dwell': self.dwell.tobytes().hex()}
+
+
+class ExamServer:
+    def __init__(self, bank, max_sessions=5000, session_ttl=4 * 3600, idle_timeout=120, count=None, quotas=None,
+                 client_seed=False):
+        self.bank = bank
+        # 单题提交会公开答案，考生能自选种子就能先开个会话把答案试出来，再用同一种子开正式会话；默认不接受
+        self.client_seed = client_seed
+        # 每个会话按 count / quotas 抽一张卷子，分类表只在启动时建一次
+        self.count = count
+        self.quotas = quotas or {}
+        self.strata = load_strata(bank, {key_kind(k) for k in self.quotas}) if self.quotas else None
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self.server = None
+        self._reaper = None
+        self.routes = [
+            ('POST', ('sessions',), self.create_session),
+            ('GET', ('sessions', None), self.get_session),
+            ('DELETE', ('sessions', None), self.delete_session),
+            ('GET', ('sessions', None, 'questions', None), self.get_question),
+            ('POST', ('sessions', None, 'answers'), self.post_answers),
+            ('POST', ('sessions', None, 'questions', None, 'commit'), self.commit_question),
+            ('POST', ('sessions', None, 'finish'), self.finish),
+        ]
+
+    async def start(self, host='127.0.0.1', port=8765):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        self._reaper = asyncio.ensure_future(self._reap())
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(min(60, self.session_ttl))
+            self.expire()
+
+    def expire(self):
+        """清掉长时间没有请求的会话"""
+        deadline = time.monotonic() - self.session_ttl
+        for sid in [s.id for s in self.sessions.values() if s.last_seen < deadline and not s.busy]:
+            del self.sessions[sid]
+
+    # HTTP：每个连接一个协程，支持 keep-alive
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not line.strip():
+                    break
+                method, target = line.decode('latin-1').split()[:2]
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b'\r\n', b'\n', b''):
+                        break
+                    k, _, v = h.decode('latin-1').partition(':')
+                    headers[k.strip().lower()] = v.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {'error': 'body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                keep = headers.get('connection', '').lower() != 'close'
+                status, payload = await self.dispatch(method, urlsplit(target).path, body)
+                await self._respond(writer, status, payload, keep)
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep):
+        data = json.dumps(payload, ensure_ascii=False).encode()
+        head = (f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+                f'Content-Type: application/json; charset=utf-8\r\n'
+                f'Content-Length: {len(data)}\r\n'
+                f'Connection: {"keep-alive" if keep else "close"}\r\n\r\n')
+        writer.write(head.encode() + data)
+        await writer.drain()
+
+    async def dispatch(self, method, path, body):
+        parts = tuple(p for p in path.split('/') if p)
+        allowed = False
+        for m, pattern, handler in self.routes:
+            if len(pattern) != len(parts) or any(p is not None and p != x for p, x in zip(pattern, parts)):
+                continue
+            allowed = True
+            if m != method:
+                continue
+            args = [x for p, x in zip(pattern, parts) if p is None]
+            try:
+                return 200, await handler(body, *args)
+            except HTTPError as e:
+                return e.status, {'error': str(e)}
+            except Exception as e:
+                return 500, {'error': f'{type(e).__name__}: {e}'}
+        return (405, {'error': 'method not allowed'}) if allowed else (404, {'error': 'not found'})
+
+    def session(self, sid):
+        s = self.sessions.get(sid)
+        if s is None:
+            raise HTTPError(404, 'no such session')
+        s.last_seen = time.monotonic()
+        return s
+
+    def question_index(self, s, i):
+        try:
+            idx = int(i)
+        except ValueError:
+            raise HTTPError(400, 'bad question index')
+        if not 0 <= idx < len(s.questions):
+            raise HTTPError(404, 'question index out of range')
+        return idx
+
+    # 接口
+    async def create_session(self, body):
+        try:
+            req = json.loads(body) if body else {}
+        except ValueError as e:
+            raise HTTPError(400, f'bad JSON body: {e}')
+        if not isinstance(req, dict):
+            raise HTTPError(400, 'body must be a JSON object')
+        if len(self.sessions) >= self.max_sessions:
+            self.expire()
+            if len(self.sessions) >= self.max_sessions:
+                raise HTTPError(503, 'too many sessions')
+        seed = req.get('seed')
+        if seed is not None and not self.client_seed:
+            raise HTTPError(400, 'this server does not accept client seeds')
+        try:
+            paper = assemble(self.bank, self.count, seed, self.quotas, self.strata)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        sid = secrets.token_urlsafe(12)
+        self.sessions[sid] = ExamSession(sid, self.bank, paper)
+        return {'session': sid, 'count': len(paper)}
+
+    async def get_session(self, body, sid):
+        return self.session(sid).state()
+
+    async def delete_session(self, body, sid):
+        self.sessions.pop(sid, None)
+        return {}
+
+    async def get_question(self, body, sid, i):
+        s = self.session(sid)
+        idx = self.question_index(s, i)
+        q = s.questions[idx]
+        if not (s.finished or s.revealed[idx]):
+            q = {k: v for k, v in q.items() if k != 'answer'}
+        return q
+
+    async def post_answers(self, body, sid):
+        s = self.session(sid)
+        if s.finished:
+            raise HTTPError(409, 'session already finished')
+        # 整批先检查再回放：有一条越界或改到已公开答案的题就整批拒收，会话不受影响
+        try:
+            check_records(s.answers, body, s.revealed)
+        except RevealedError as e:
+            raise HTTPError(409, str(e))
+        except (IndexError, ValueError) as e:
+            raise HTTPError(400, f'bad answer record: {e}')
+        state = SessionState(None, s.cur_idx, dwell=s.dwell)
+        state.records = body
+        try:
+            applied = state.apply(s.answers)
+        except (IndexError, ValueError, OverflowError) as e:
+            raise HTTPError(400, f'bad answer record: {e}')
+        s.cur_idx = min(state.cur_idx, len(s.questions) - 1)
+        return {'applied': applied}
+
+    async def commit_question(self, body, sid, i):
+        s = self.session(sid)
+        idx = self.question_index(s, i)
+        q = s.questions[idx]
+        qtype = question_types.of(q)
+        if qtype is None:
+            raise HTTPError(400, 'question type is not graded')
+        score, total, missed, over = qtype.grade(q, s.answers.get(idx))
+        s.revealed[idx] = 1
+        return {'score': score, 'total': total, 'missed': missed, 'over': over, 'answer': q['answer']}
+
+    async def finish(self, body, sid):
+        s = self.session(sid)
+        if s.busy:
+            raise HTTPError(409, 'grading in progress')
+        s.busy = True
+        try:
+            # 批改放到线程池，事件循环继续处理其他考生的请求
+            answers = s.answers.copy()
+            scores = await asyncio.get_running_loop().run_in_executor(None, grade_exam, s.questions, answers)
+        finally:
+            s.busy = False
+        s.finished = True
+        return scores_payload(scores)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='局域网考试服务')
+    parser.add_argument('bank', help='题库（.json / .jsonl / .qbank）')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-sessions', type=int, default=5000)
+    parser.add_argument('--ttl', type=float, default=4 * 3600, help='会话无请求多少秒后清除')
+    parser.add_argument('-k', '--count', type=int, help='每个考生抽的题数，默认整库')
+    parser.add_argument('--quota', action='append', help='分类配额，如 single_choice=10 或 tag:几何=5，可重复')
+    parser.add_argument('--client-seed', action='store_true',
+                        help='允许新建会话时指定组卷种子（复查用；考生可借此重开同一张卷子，正式考试不要打开）')
+    args = parser.parse_args(argv)
+
+    bank = open_bank(args.bank)
+    server = ExamServer(bank, args.max_sessions, args.ttl, count=args.count, quotas=parse_quotas(args.quota),
+                        client_seed=args.client_seed)
+
+    async def serve():
+        host, port = await server.start(args.host, args.port)
+        print(f'考试服务 http://{host}:{port}/ ，题库 {len(bank)} 题', file=sys.stderr)
+        await server.server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bank.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+from itertools import chain
+
+import numpy as np
+
+import profiling
+
+# 不依赖 PyQt5，命令行批改和服务端也用这里的判分规则
+
+
+def _counts(a, u):
+    """a 为标准答案、u 为作答（同形状布尔数组），返回 (得分, 总分, 漏选, 多选)"""
+    correct = int(np.count_nonzero(a & u))
+    total = int(np.count_nonzero(a))
+    over = int(np.count_nonzero(u & ~a))
+    return correct, total, total - correct, over
+
+
+def grade_cross_table(ans, user):
+    a = np.asarray(ans, dtype=bool)
+    if user is None:
+        u = np.zeros_like(a)
+    else:
+        u = np.asarray(user, dtype=bool)
+    return _counts(a, u)
+
+
+def choice_mask(indices, n):
+    mask = np.zeros(n, dtype=bool)
+    mask[list(indices)] = True
+    return mask
+
+
+def grade_multi_choice(ans, user, n_options=None):
+    n = len(user) if user is not None else n_options
+    a = choice_mask(ans, n)
+    u = np.zeros(n, dtype=bool) if user is None else np.asarray(user, dtype=bool)
+    return _counts(a, u)
+
+
+def grade_single_choice(ans, user):
+    score = 1 if user == ans else 0
+    return score, 1, 0, 0
+
+
+def grade_drag_image(ans, user):
+    """ans / user 为每个图片所放区域下标，-1 表示不放置；放错区域同时计一次漏选和一次多选"""
+    a = np.asarray(ans, dtype=np.int64)
+    u = np.full(len(a), -1, dtype=np.int64) if user is None else np.asarray(user, dtype=np.int64)
+    placed = a >= 0
+    correct = int(np.count_nonzero(placed & (u == a)))
+    total = int(np.count_nonzero(placed))
+    over = int(np.count_nonzero((u >= 0) & (u != a)))
+    return correct, total, total - correct, over
+
+
+def _sized(user, n):
+    try:
+        return len(user) == n
+    except TypeError:
+        return False
+
+
+def check_answer(q, user):
+    """作答形状与题目对不上时抛 ValueError（None 为未作答）；整卷批改把作答拼成一条向量，长度错一题会错位到后面所有题"""
+    if user is None:
+        return
+    t = q['type']
+    if t == 'cross_table':
+        rows = len(q['row_names'])
+        cols = len(q['col_names'][0]['items'])
+        if not _sized(user, rows) or not all(_sized(row, cols) for row in user):
+            raise ValueError(f'交叉表作答应为 {rows}×{cols} 的布尔表')
+    elif t == 'multi_choice':
+        if not _sized(user, len(q['options'])):
+            raise ValueError(f"多选作答应为 {len(q['options'])} 个布尔值")
+    elif t == 'single_choice':
+        if isinstance(user, bool) or not isinstance(user, int) or not -1 <= user < len(q['options']):
+            raise ValueError(f'单选作答应为选项下标：{user!r}')
+    elif t == 'drag_image':
+        if not _sized(user, len(q['answer'])):
+            raise ValueError(f"拖图题作答应为 {len(q['answer'])} 个区域下标")
+
+
+class ExamScores:
+    """整卷批改结果，每道题一项；graded 为 False 的题型暂不计分"""
+
+    def __init__(self, types, correct, total, missed, over, graded):
+        self.types = types
+        self.correct = correct
+        self.total = total
+        self.missed = missed
+        self.over = over
+        self.graded = graded
+
+    def __len__(self):
+        return len(self.types)
+
+    @property
+    def total_score(self):
+        return int(self.correct[self.graded].sum())
+
+    @property
+    def total_count(self):
+        return int(self.total[self.graded].sum())
+
+    def row(self, idx):
+        return int(self.correct[idx]), int(self.total[idx]), int(self.missed[idx]), int(self.over[idx])
+
+    def subtotals(self):
+        """按题型汇总：{题型: (题数, 得分, 总分)}，只含计分的题型"""
+        out = {}
+        types = np.asarray(self.types, dtype=object)
+        for t in dict.fromkeys(self.types):
+            mask = (types == t) & self.graded
+            if mask.any():
+                out[t] = (int(mask.sum()), int(self.correct[mask].sum()), int(self.total[mask].sum()))
+        return out
+
+    @classmethod
+    def concat(cls, parts):
+        """把分段批改的结果按顺序拼成整卷"""
+        return cls(list(chain.from_iterable(p.types for p in parts)),
+                   *(np.concatenate([getattr(p, k) for p in parts])
+                     for k in ('correct', 'total', 'missed', 'over', 'graded')))
+
+
+@profiling.traced()
+def grade_exam(questions, answers, start=0, stop=None):
+    """一次批改整卷（或其中 [start, stop) 一段）：交叉表和多选展开成一条布尔向量，按题号分段计数"""
+    stop = len(questions) if stop is None else stop
+    n = stop - start
+    types = []
+    correct = np.zeros(n, dtype=np.int64)
+    total = np.zeros(n, dtype=np.int64)
+    over = np.zeros(n, dtype=np.int64)
+    graded = np.zeros(n, dtype=bool)
+
+    flat_ans, flat_user, seg_ids, seg_lens = [], [], [], []
+    single_idx, single_ans, single_user = [], [], []
+    drag_ans, drag_user, drag_ids, drag_lens = [], [], [], []
+    for idx in range(n):
+        q = questions[start + idx]
+        user = answers[start + idx]
+        t = q['type']
+        types.append(t)
+        try:
+            check_answer(q, user)
+        except ValueError as e:
+            raise ValueError(f'第{start + idx + 1}题：{e}') from None
+        if t == 'cross_table':
+            rows = len(q['row_names'])
+            cols = len(q['col_names'][0]['items'])
+            flat_ans.append(chain.from_iterable(q['answer']))
+            flat_user.append(chain.from_iterable(user) if user is not None else [False] * (rows * cols))
+            seg_ids.append(idx)
+            seg_lens.append(rows * cols)
+            graded[idx] = True
+        elif t == 'multi_choice':
+            cnt = len(q['options'])
+            mask = [False] * cnt
+            for i in q['answer']:
+                mask[i] = True
+            flat_ans.append(mask)
+            flat_user.append(user if user is not None else [False] * cnt)
+            seg_ids.append(idx)
+            seg_lens.append(cnt)
+            graded[idx] = True
+        elif t == 'single_choice':
+            single_idx.append(idx)
+            single_ans.append(q['answer'])
+            single_user.append(-1 if user is None else user)
+            graded[idx] = True
+        elif t == 'drag_image':
+            cnt = len(q['answer'])
+            drag_ans.append(q['answer'])
+            drag_user.append(user if user is not None else [-1] * cnt)
+            drag_ids.append(idx)
+            drag_lens.append(cnt)
+            graded[idx] = True
+
+    if seg_ids:
+        size = sum(seg_lens)
+        a = np.fromiter(chain.from_iterable(flat_ans), dtype=bool, count=size)
+        u = np.fromiter(chain.from_iterable(flat_user), dtype=bool, count=size)
+        seg = np.repeat(np.asarray(seg_ids, dtype=np.int64), seg_lens)
+        correct += np.bincount(seg, weights=a & u, minlength=n).astype(np.int64)
+        total += np.bincount(seg, weights=a, minlength=n).astype(np.int64)
+        over += np.bincount(seg, weights=u & ~a, minlength=n).astype(np.int64)
+    if drag_ids:
+        size = sum(drag_lens)
+        a = np.fromiter(chain.from_iterable(drag_ans), dtype=np.int64, count=size)
+        u = np.fromiter(chain.from_iterable(drag_user), dtype=np.int64, count=size)
+        seg = np.repeat(np.asarray(drag_ids, dtype=np.int64), drag_lens)
+        placed = a >= 0
+        correct += np.bincount(seg, weights=placed & (u == a), minlength=n).astype(np.int64)
+        total += np.bincount(seg, weights=placed, minlength=n).astype(np.int64)
+        over += np.bincount(seg, weights=(u >= 0) & (u != a), minlength=n).astype(np.int64)
+    if single_idx:
+        si = np.asarray(single_idx, dtype=np.int64)
+        correct[si] = np.asarray(single_ans) == np.asarray(single_user)
+        total[si] = 1
+    missed = total - correct
+    if single_idx:
+        # 单选题没有漏选/多选的说法，保持为 0
+        missed[si] = 0
+    return ExamScores(types, correct, total, missed, over, graded)
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QPixmap
+
+# 图片在线程池里解码并缩放（QImage 可以跨线程），回到 GUI 线程后才转成 QPixmap 放进缓存
+
+
+class _Signals(QObject):
+    done = pyqtSignal(object, QImage, QSize)
+
+
+class _DecodeTask(QRunnable):
+    def __init__(self, key, signals):
+        super().__init__()
+        self.key = key
+        self.signals = signals
+
+    def run(self):
+        path, max_w, max_h = self.key
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        orig = reader.size()
+        if orig.isValid() and max_w and max_h:
+            # 解码时直接按目标尺寸缩放，不先解出整张大图
+            scaled = orig.scaled(QSize(max_w, max_h), Qt.KeepAspectRatio)
+            if scaled.width() < orig.width():
+                reader.setScaledSize(scaled)
+        image = reader.read()
+        self.signals.done.emit(self.key, image, orig)
+
+
+class ImageLoader(QObject):
+    """按 (路径, 最大宽, 最大高) 缓存 QPixmap，总字节数超过上限时淘汰最久未用的"""
+
+    loaded = pyqtSignal(object)
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, threads=None, parent=None):
+        super().__init__(parent)
+        self.max_bytes = max_bytes
+        self.cache = OrderedDict()
+        self.sizes = {}  # 原图尺寸，拖图题的放置区域按原图坐标换算
+        self.nbytes = 0
+        self.pending = set()
+        self.failed = set()  # 解码失败的不再重试，否则每次重绘都会再提交一次
+        self.pool = QThreadPool(self)
+        if threads:
+            self.pool.setMaxThreadCount(threads)
+        self._signals = _Signals(self)
+        self._signals.done.connect(self._on_done)
+
+    def get(self, path, max_w=0, max_h=0):
+        """已缓存则直接返回 QPixmap，否则放进后台解码队列并返回 None，解码完成后发 loaded(key)"""
+        key = (path, max_w, max_h)
+        pix = self.cache.get(key)
+        if pix is not None:
+            self.cache.move_to_end(key)
+            return pix
+        self._submit(key)
+        return None
+
+    def prefetch(self, path, max_w=0, max_h=0):
+        key = (path, max_w, max_h)
+        if key not in self.cache:
+            self._submit(key)
+
+    def _submit(self, key):
+        if key in self.pending or key in self.failed or not key[0]:
+            return
+        self.pending.add(key)
+        self.pool.start(_DecodeTask(key, self._signals))
+
+    def _on_done(self, key, image, orig):
+        self.pending.discard(key)
+        if image.isNull():
+            self.failed.add(key)
+            return
+        if orig.isValid():
+            self.sizes[key[0]] = orig
+        pix = QPixmap.fromImage(image)
+        old = self.cache.pop(key, None)
+        if old is not None:
+            self.nbytes -= self._cost(old)
+        self.cache[key] = pix
+        self.nbytes += self._cost(pix)
+        while self.nbytes > self.max_bytes and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.nbytes -= self._cost(evicted)
+        self.loaded.emit(key)
+
+    @staticmethod
+    def _cost(pix):
+        return pix.width() * pix.height() * max(pix.depth(), 8) // 8
+
+
+_loader = None
+
+
+def image_loader():
+    global _loader
+    if _loader is None:
+        _loader = ImageLoader()
+    return _loader
@@ -0,0 +1,315 @@
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+from answer_state import AnswerStore, encode_answer
+from grading import check_answer
+from question_bank import ShuffledView, open_bank
+from session_journal import load_session
+
+# 题目分析：难度（得分率 p 值）、区分度（题目得分与卷面得分率的点二列相关）、
+# 单选/多选各选项的选择次数、交叉表每格的漏选/多选率（拖图题按图片统计）
+# 只保存可累加的和（次数、Σx、Σx²、ΣT、ΣT²、ΣxT 等），新的考试记录可以随时并进来，不用重扫历史
+# 输入是 AnswerStore 的原始字节（按位压缩），同一道题的所有作答拼成矩阵后一次性用 NumPy 计算
+# 判分规则与 grading.py 相同：漏选 = 应选未选，多选 = 不应选而选；单选不计漏选/多选
+
+SUMS = ('sx', 'sxx', 'st', 'stt', 'sxt')
+COUNTS = ('count', 'correct', 'total', 'missed', 'over')
+DETAILS = ('cell_missed', 'cell_over', 'option')
+
+
+def _answer_mask(q):
+    t = q['type']
+    if t == 'cross_table':
+        return np.asarray(q['answer'], dtype=bool).ravel()
+    mask = np.zeros(len(q['options']), dtype=bool)
+    mask[list(q['answer'])] = True
+    return mask
+
+
+def _stack(regions, width):
+    """同一题的作答原始字节拼成 (人数, width) 的 uint8 矩阵，未作答补 0"""
+    zero = bytes(width)
+    buf = b''.join(zero if r is None else bytes(r[:width]).ljust(width, b'\0') for r in regions)
+    return np.frombuffer(buf, dtype=np.uint8).reshape(len(regions), width)
+
+
+def grade_block(q, regions):
+    """一道题的一批作答：返回 (得分, 总分, 漏选, 多选) 四个数组和按格/按选项的计数"""
+    t = q['type']
+    m = len(regions)
+    detail = {}
+    if t in ('cross_table', 'multi_choice'):
+        a = _answer_mask(q)
+        u = np.unpackbits(_stack(regions, (len(a) + 7) // 8), axis=1, count=len(a), bitorder='little').astype(bool)
+        hit = u & a
+        extra = u & ~a
+        correct = hit.sum(1)
+        total = np.full(m, a.sum())
+        over = extra.sum(1)
+        missed = total - correct
+        if t == 'cross_table':
+            detail['cell_missed'] = (a & ~u).sum(0)
+            detail['cell_over'] = extra.sum(0)
+        else:
+            detail['option'] = u.sum(0)
+    elif t == 'single_choice':
+        raw = _stack(regions, 2).view('<u2').ravel().astype(np.int64)
+        n = len(q['options'])
+        # option[0] 为未作答，option[i + 1] 为选第 i 项
+        detail['option'] = np.bincount(np.minimum(raw, n + 1), minlength=n + 2)[:n + 1]
+        correct = (raw == q['answer'] + 1).astype(np.int64)
+        total = np.ones(m, dtype=np.int64)
+        missed = over = np.zeros(m, dtype=np.int64)
+    elif t == 'drag_image':
+        a = np.asarray(q['answer'], dtype=np.int64)
+        u = _stack(regions, len(a)).astype(np.int64) - 1
+        placed = a >= 0
+        wrong_place = (u >= 0) & (u != a)
+        correct = (placed & (u == a)).sum(1)
+        total = np.full(m, placed.sum())
+        over = wrong_place.sum(1)
+        missed = total - correct
+        detail['cell_missed'] = (placed & (u != a)).sum(0)
+        detail['cell_over'] = wrong_place.sum(0)
+    else:
+        zeros = np.zeros(m, dtype=np.int64)
+        return zeros, zeros, zeros, zeros, detail
+    return correct, total, missed, over, detail
+
+
+class ItemStats:
+    """按题库下标累计的题目统计；add_batch 并入一批考试记录，merge 合并另一份统计"""
+
+    def __init__(self, n_questions):
+        self.n = n_questions
+        self.sessions = 0
+        for name in SUMS:
+            setattr(self, name, np.zeros(n_questions))
+        for name in COUNTS:
+            setattr(self, name, np.zeros(n_questions, dtype=np.int64))
+        self.detail = {}  # 题库下标 -> {名称: 计数数组}，只为出现过的题分配
+
+    def add_batch(self, bank, sessions):
+        """sessions 为 [(题库下标序列, 每题原始作答字节或 None), ...]"""
+        sids, qids, regions = [], [], []
+        for s, (indices, regs) in enumerate(sessions):
+            sids.extend([s] * len(indices))
+            qids.extend(indices)
+            regions.extend(regs)
+        if not qids:
+            return
+        sids = np.asarray(sids, dtype=np.int64)
+        qids = np.asarray(qids, dtype=np.int64)
+        correct = np.zeros(len(qids), dtype=np.int64)
+        total = np.zeros(len(qids), dtype=np.int64)
+        missed = np.zeros(len(qids), dtype=np.int64)
+        over = np.zeros(len(qids), dtype=np.int64)
+
+        # 按题分组，每题一次向量化计算
+        order = np.argsort(qids, kind='stable')
+        uniq, starts = np.unique(qids[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for q_idx, start, end in zip(uniq.tolist(), starts, ends):
+            rows = order[start:end]
+            c, t, m, o, detail = grade_block(bank[q_idx], [regions[r] for r in rows])
+            correct[rows], total[rows], missed[rows], over[rows] = c, t, m, o
+            acc = self.detail.get(q_idx)
+            if acc is None:
+                self.detail[q_idx] = {k: np.asarray(v, dtype=np.int64) for k, v in detail.items()}
+            else:
+                for k, v in detail.items():
+                    acc[k] += v
+
+        # 每份考试的卷面得分率 T，题目得分率 x
+        graded = total > 0
+        n_sessions = len(sessions)
+        sess_total = np.bincount(sids, weights=total, minlength=n_sessions)
+        sess_score = np.bincount(sids, weights=correct, minlength=n_sessions)
+        T = np.divide(sess_score, sess_total, out=np.zeros(n_sessions), where=sess_total > 0)[sids]
+        x = np.divide(correct, total, out=np.zeros(len(total)), where=graded)
+        g = qids[graded]
+        for name, w in (('sx', x), ('sxx', x * x), ('st', T), ('stt', T * T), ('sxt', x * T)):
+            getattr(self, name)[:] += np.bincount(g, weights=w[graded], minlength=self.n)
+        self.count += np.bincount(g, minlength=self.n)
+        for name, v in (('correct', correct), ('total', total), ('missed', missed), ('over', over)):
+            getattr(self, name)[:] += np.bincount(qids, weights=v, minlength=self.n).astype(np.int64)
+        self.sessions += n_sessions
+
+    def merge(self, other):
+        for name in SUMS + COUNTS:
+            getattr(self, name)[:] += getattr(other, name)
+        for q_idx, detail in other.detail.items():
+            acc = self.detail.get(q_idx)
+            if acc is None:
+                self.detail[q_idx] = {k: v.copy() for k, v in detail.items()}
+            else:
+                for k, v in detail.items():
+                    acc[k] += v
+        self.sessions += other.sessions
+
+    def p_values(self, sel=slice(None)):
+        """难度：平均得分率，没有作答的题为 nan"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sx[sel] / self.count[sel]
+
+    def discrimination(self, sel=slice(None)):
+        """区分度：题目得分率与卷面得分率的点二列（Pearson）相关系数；题目得分或卷面得分没有差异时为 nan"""
+        n = self.count[sel].astype(float)
+        sx, st = self.sx[sel], self.st[sel]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = self.sxt[sel] / n - (sx / n) * (st / n)
+            var_x = self.sxx[sel] / n - (sx / n) ** 2
+            var_t = self.stt[sel] / n - (st / n) ** 2
+            return cov / np.sqrt(var_x * var_t)
+
+    def report(self, q_idx, q=None):
+        """单题的统计结果（JSON 可序列化）"""
+        n = int(self.count[q_idx])
+        out = {
+            'index': q_idx, 'count': n,
+            'p_value': float(self.p_values(q_idx)) if n else None,
+            'discrimination': None,
+            'missed_rate': float(self.missed[q_idx] / n) if n else None,
+            'over_rate': float(self.over[q_idx] / n) if n else None,
+        }
+        d = float(self.discrimination(q_idx)) if n else float('nan')
+        if not np.isnan(d):
+            out['discrimination'] = round(d, 6)
+        if q is not None:
+            out['type'] = q.get('type')
+        detail = self.detail.get(q_idx, {})
+        if 'option' in detail:
+            out['option_counts'] = detail['option'].tolist()
+        if 'cell_missed' in detail and n:
+            shape = (len(q['row_names']), -1) if q is not None and q.get('type') == 'cross_table' else (-1,)
+            out['cell_missed_rate'] = (detail['cell_missed'] / n).reshape(shape).round(4).tolist()
+            out['cell_over_rate'] = (detail['cell_over'] / n).reshape(shape).round(4).tolist()
+        return out
+
+    def save(self, path):
+        arrays = {name: getattr(self, name) for name in SUMS + COUNTS}
+        arrays['meta'] = np.asarray([self.n, self.sessions], dtype=np.int64)
+        # 各题的明细数组拼成一条，另存题号和偏移
+        for name in DETAILS:
+            items = [(q, d[name]) for q, d in self.detail.items() if name in d]
+            arrays[name + '_q'] = np.asarray([q for q, _ in items], dtype=np.int64)
+            arrays[name + '_off'] = np.cumsum([0] + [len(v) for _, v in items]).astype(np.int64)
+            arrays[name] = np.concatenate([v for _, v in items]) if items else np.zeros(0, dtype=np.int64)
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            n, sessions = data['meta'].tolist()
+            stats = cls(n)
+            stats.sessions = sessions
+            for name in SUMS + COUNTS:
+                getattr(stats, name)[:] = data[name]
+            for name in DETAILS:
+                qs, off, flat = data[name + '_q'], data[name + '_off'], data[name]
+                for k, q_idx in enumerate(qs.tolist()):
+                    stats.detail.setdefault(q_idx, {})[name] = flat[off[k]:off[k + 1]].copy()
+        return stats
+
+
+# 考试记录来源
+def session_from_store(store, order):
+    """QuizMain / 考试服务里的 AnswerStore；order 为题目对应的题库下标"""
+    return list(order), [store.bits(i) for i in range(len(store))]
+
+
+def session_from_journal(bank, path):
+    state = load_session(path)
+    if state is None:
+        return None
+    store = AnswerStore(ShuffledView(bank, state.order))
+    state.apply(store)
+    return session_from_store(store, state.order)
+
+
+def session_from_sheet(bank, sheet):
+    """batch_grade 的答题卡格式；作答形状与题目不符时抛 ValueError"""
+    qidx = sheet.get('questions')
+    if qidx is None:
+        qidx = range(len(bank))
+    answers = sheet.get('answers') or {}
+    if isinstance(answers, dict):
+        user = [answers.get(str(i)) for i in qidx]
+    else:
+        user = list(answers) + [None] * (len(qidx) - len(answers))
+    questions = [bank[i] for i in qidx]
+    for i, q, u in zip(qidx, questions, user):
+        try:
+            check_answer(q, u)
+        except ValueError as e:
+            raise ValueError(f'题库下标 {i}：{e}') from None
+    return list(qidx), [encode_answer(q, u) for q, u in zip(questions, user)]
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        if item is not None:
+            batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='题目分析：难度、区分度、选项分布、交叉表逐格漏选/多选率')
+    parser.add_argument('bank')
+    parser.add_argument('sheets', nargs='*', help='答题卡 JSONL（batch_grade 格式）')
+    parser.add_argument('--journal', action='append', default=[], help='会话日志路径，可重复')
+    parser.add_argument('--state', help='累计统计文件（.npz）：存在则先读入，处理完写回')
+    parser.add_argument('--batch-size', type=int, default=4096)
+    parser.add_argument('-o', '--output', default='-', help='逐题统计 JSONL，默认标准输出')
+    args = parser.parse_args(argv)
+
+    bank = open_bank(args.bank)
+    try:
+        stats = ItemStats.load(args.state) if args.state and os.path.exists(args.state) else ItemStats(len(bank))
+        if stats.n != len(bank):
+            print(f'统计文件对应 {stats.n} 题的题库，与当前题库 {len(bank)} 题不符', file=sys.stderr)
+            return 1
+
+        def sources():
+            for path in args.sheets:
+                with open(path, encoding='utf-8') as f:
+                    for lineno, line in enumerate(f, 1):
+                        if not line.strip():
+                            continue
+                        # 和 batch_grade 一样，坏的答题卡只跳过这一张，不计入统计
+                        try:
+                            yield session_from_sheet(bank, json.loads(line))
+                        except (ValueError, KeyError, IndexError, TypeError) as e:
+                            print(f'{path}:{lineno}: 跳过答题卡（{type(e).__name__}: {e}）', file=sys.stderr)
+            for path in args.journal:
+                yield session_from_journal(bank, path)
+
+        for batch in _batches(sources(), args.batch_size):
+            stats.add_batch(bank, batch)
+        if args.state:
+            stats.save(args.state)
+        fout = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+        try:
+            for q_idx in np.flatnonzero(stats.count).tolist():
+                fout.write(json.dumps(stats.report(q_idx, bank[q_idx]), ensure_ascii=False) + '\n')
+        finally:
+            if fout is not sys.stdout:
+                fout.close()
+        print(f'累计 {stats.sessions} 份考试记录', file=sys.stderr)
+    finally:
+        bank.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
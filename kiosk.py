@@ -0,0 +1,359 @@
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+import subprocess
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import question_types
+from answer_state import AnswerStore
+from compiled_bank import CompiledBank, compile_bank
+from exam_client import RemoteSync
+from exam_paper import ExamPaper, assemble, load_strata, key_kind, new_seed, parse_quotas
+from grading import grade_exam
+from question_bank import ShuffledView
+from session_journal import SessionJournal, SessionState, check_records, load_session
+
+# 考场多窗口模式：一台机器上一个协调进程带 N 个考试窗口进程
+# 协调进程把题库编译成二进制题库（内容没变的题沿用上次结果），各窗口进程只读 mmap 同一个文件，
+# 题库页在进程间共享，不再各自解析一份 JSON；每多一个考生只多一份卷子顺序和按位压缩的作答
+# 窗口进程的作答改动编码成会话日志记录，经本机 multiprocessing.connection 发给协调进程，
+# 由协调进程统一写各座位的会话日志（窗口崩溃或被关掉后重开接着考）、批改并写成绩库
+#
+# 窗口 -> 协调：('hello', 座位号) -> ('paper', 题库路径, 种子, 题号字节, 当前题, {题号: 作答原始数据}, 停留时间字节,
+#                                    每题一字节的已公开答案标记)
+#               ('answers', 日志记录字节)，不回复；越界或改到已公开答案的题整批不收
+#               ('commit', 题号) -> ('ok', (得分, 总分, 漏选, 多选))
+#               ('finish',) -> ('ok', ExamScores)
+# 出错时回复 ('error', 说明)
+
+KEY_ENV = 'QUIZ_KIOSK_KEY'
+RESPAWN_DELAY = 2.0
+
+
+def compiled_path(bank_path):
+    return bank_path if bank_path.endswith('.qbank') else os.path.splitext(bank_path)[0] + '.qbank'
+
+
+class Seat:
+    """一个座位：当前考生的卷子、作答（协调进程这边的副本）和会话日志"""
+
+    def __init__(self, slot, session_path):
+        self.slot = slot
+        self.session_path = session_path
+        self.paper = None
+        self.questions = None
+        self.answers = None
+        self.journal = None
+        self.revealed = None  # 单题提交过、答案已公开的题，与会话日志里的同一个 bytearray
+        self.cur_idx = 0
+        self.finished = False
+        self.proc = None
+        self.lock = threading.Lock()
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+
+class KioskCoordinator:
+    def __init__(self, bank_path, seats, state_dir=None, count=None, quotas=None, results_path=None,
+                 time_limit=None, question_time=None):
+        self.bank_path = compiled_path(bank_path)
+        if self.bank_path != bank_path:
+            total, parsed = compile_bank(bank_path, self.bank_path)
+            print(f'{self.bank_path}: 共{total}题，重新编译{parsed}题', file=sys.stderr)
+        self.bank = CompiledBank(self.bank_path)
+        self.count = count
+        self.quotas = quotas or {}
+        self.strata = load_strata(self.bank, {key_kind(k) for k in self.quotas}) if self.quotas else None
+        self.results_path = results_path
+        # 限时由各窗口自己计，停留时间随作答记录发回来写进座位的会话日志
+        self.time_limit = time_limit
+        self.question_time = question_time
+        self._results_lock = threading.Lock()
+        self.state_dir = state_dir or bank_path + '.kiosk'
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.seats = [Seat(i, os.path.join(self.state_dir, f'seat{i}.session')) for i in range(seats)]
+        self.authkey = os.urandom(16)
+        self.listener = Listener(authkey=self.authkey)
+        self._closed = False
+        self._accept_thread = threading.Thread(target=self._accept, name='kiosk-accept', daemon=True)
+
+    # 座位上的考试
+    def open_seat(self, seat):
+        """续上没交卷的会话，没有就按题数和配额组一张新卷子"""
+        state = load_session(seat.session_path)
+        if state is not None and (not state.order or max(state.order) >= len(self.bank)):
+            state = None
+        if state is not None:
+            paper = ExamPaper(new_seed() if state.seed is None else state.seed, state.order)
+            answers = AnswerStore(ShuffledView(self.bank, paper.indices))
+            # 交卷记录在日志里，回放后才知道是否已交卷
+            state.apply(answers)
+            if state.finished:
+                state = None
+        if state is None:
+            paper = assemble(self.bank, self.count, None, self.quotas, self.strata)
+            answers = AnswerStore(ShuffledView(self.bank, paper.indices))
+        seat.paper = paper
+        seat.questions = answers.questions
+        seat.answers = answers
+        seat.cur_idx = min(state.cur_idx, len(paper) - 1) if state is not None else 0
+        seat.finished = False
+        seat.journal = SessionJournal(seat.session_path, answers, paper.indices, seat.cur_idx,
+                                      state.gen if state is not None else 0, seed=paper.seed,
+                                      dwell=state.dwell if state is not None else None,
+                                      revealed=state.revealed if state is not None else None)
+        seat.revealed = seat.journal.revealed
+
+    def handshake(self, seat):
+        with seat.lock:
+            if seat.journal is None or seat.finished:
+                seat.close_journal()
+                self.open_seat(seat)
+            regions = {}
+            for i in range(len(seat.answers)):
+                data = seat.answers.bits(i)
+                if data is not None:
+                    regions[i] = bytes(data)
+            return ('paper', self.bank_path, seat.paper.seed, seat.paper.indices.tobytes(), seat.cur_idx, regions,
+                    seat.journal.dwell.tobytes(), bytes(seat.revealed))
+
+    def apply_answers(self, seat, data):
+        with seat.lock:
+            if seat.finished:
+                return
+            # 和考试服务一样先整批检查：窗口进程重开后不能再改已公开答案的题
+            check_records(seat.answers, data, seat.revealed)
+            state = SessionState(None, seat.cur_idx)
+            state.records = data
+            # 改动照常通知会话日志，日志里记下的就是窗口进程发来的记录
+            state.apply(seat.answers, notify=True)
+            if state.cur_idx != seat.cur_idx:
+                seat.cur_idx = min(state.cur_idx, len(seat.answers) - 1)
+                seat.journal.set_cur(seat.cur_idx)
+
+    def commit(self, seat, idx):
+        if not 0 <= idx < len(seat.questions):
+            raise IndexError(f'question {idx} out of range')
+        q = seat.questions[idx]
+        qtype = question_types.of(q)
+        if qtype is None:
+            raise ValueError('question type is not graded')
+        with seat.lock:
+            user = seat.answers.get(idx)
+            seat.journal.reveal(idx)
+        return qtype.grade(q, user)
+
+    def finish(self, seat):
+        with seat.lock:
+            answers = seat.answers.copy()
+        scores = grade_exam(seat.questions, answers)
+        with seat.lock:
+            seat.finished = True
+            seat.journal.finish()
+        if self.results_path:
+            from results_store import ResultsStore
+            # 成绩库被别的进程占着时照样把成绩回给窗口，只是这一场不入库
+            try:
+                with self._results_lock, ResultsStore(self.results_path) as store:
+                    store.append_scores(scores, seat.paper.indices, student=f'座位{seat.slot + 1}',
+                                        seed=seat.paper.seed)
+            except OSError as e:
+                print(f'座位{seat.slot + 1} 成绩未保存：{e}', file=sys.stderr)
+        return scores
+
+    # IPC
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._closed:
+                    return
+                continue  # 认证失败或握手时断开，丢掉这个连接
+            threading.Thread(target=self._serve, args=(conn,), name='kiosk-seat', daemon=True).start()
+
+    def _serve(self, conn):
+        seat = None
+        try:
+            while True:
+                msg = conn.recv()
+                kind = msg[0]
+                try:
+                    if kind == 'answers':
+                        if seat is not None:
+                            self.apply_answers(seat, msg[1])
+                        continue
+                    if kind == 'hello':
+                        seat = self.seats[msg[1]]
+                        reply = self.handshake(seat)
+                    elif seat is None:
+                        raise ValueError('hello first')
+                    elif kind == 'commit':
+                        reply = ('ok', self.commit(seat, msg[1]))
+                    elif kind == 'finish':
+                        reply = ('ok', self.finish(seat))
+                    else:
+                        raise ValueError(f'unknown message {kind!r}')
+                except (ValueError, IndexError, KeyError, TypeError) as e:
+                    if kind == 'answers':
+                        # 作答记录不回复，拒收只记一笔，不能让这个座位的连接断掉
+                        print(f'座位{seat.slot + 1} 作答记录被拒收：{e}', file=sys.stderr)
+                        continue
+                    reply = ('error', f'{type(e).__name__}: {e}')
+                conn.send(reply)
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    # 窗口进程
+    def window_command(self, slot):
+        if getattr(sys, 'frozen', False):
+            cmd = [sys.executable]
+        else:
+            cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')]
+        cmd += ['--kiosk', self.listener.address, '--seat', str(slot)]
+        if self.time_limit:
+            cmd += ['--time-limit', str(self.time_limit)]
+        if self.question_time:
+            cmd += ['--question-time', str(self.question_time)]
+        return cmd
+
+    def spawn(self, seat):
+        env = dict(os.environ, **{KEY_ENV: self.authkey.hex()})
+        seat.proc = subprocess.Popen(self.window_command(seat.slot), env=env)
+
+    def run(self):
+        """开出全部窗口；窗口退出（交卷后关掉或崩溃）就重开一个，交过卷的座位换新卷子"""
+        self._accept_thread.start()
+        for seat in self.seats:
+            self.spawn(seat)
+        print(f'考场：{len(self.seats)} 个座位，题库 {len(self.bank)} 题', file=sys.stderr)
+        try:
+            while True:
+                time.sleep(RESPAWN_DELAY)
+                for seat in self.seats:
+                    if seat.proc.poll() is not None:
+                        self.spawn(seat)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self._closed = True
+        for seat in self.seats:
+            if seat.proc is not None and seat.proc.poll() is None:
+                seat.proc.terminate()
+        for seat in self.seats:
+            if seat.proc is not None:
+                try:
+                    seat.proc.wait(5)
+                except subprocess.TimeoutExpired:
+                    seat.proc.kill()
+            with seat.lock:
+                seat.close_journal()
+        self.listener.close()
+        self.bank.close()
+
+
+class KioskError(ConnectionError):
+    pass
+
+
+class KioskSync(RemoteSync):
+    """作答改动成批发给协调进程；连接断了记录留在缓冲里"""
+
+    def _send(self, data):
+        self.client.send(('answers', data))
+
+
+class KioskExam:
+    """考试窗口进程这一端，接口与 exam_client.RemoteExam 相同，QuizMain 按瘦客户端方式使用；
+    题库直接 mmap 协调进程编译好的文件，题目和批改都在本地"""
+
+    def __init__(self, address, slot, authkey=None):
+        authkey = authkey or bytes.fromhex(os.environ[KEY_ENV])
+        self.conn = Client(address, authkey=authkey)
+        self._send_lock = threading.Lock()
+        self._request_lock = threading.Lock()
+        self.session = f'seat{slot}'
+        _, bank_path, seed, indices, cur, self.regions, dwell, revealed = self.request(('hello', slot))
+        self.bank = CompiledBank(bank_path)
+        paper = ExamPaper(seed, memoryview(indices).cast('I'))
+        self.questions = ShuffledView(self.bank, paper.indices)
+        self.state = {'seed': seed, 'cur': cur, 'dwell': dwell.hex(),
+                      'revealed': [i for i, r in enumerate(revealed) if r]}
+        self.sync = None
+
+    def send(self, msg):
+        with self._send_lock:
+            try:
+                self.conn.send(msg)
+            except (EOFError, OSError) as e:
+                raise KioskError(f'协调进程已断开：{e}')
+
+    def request(self, msg):
+        with self._request_lock:
+            self.send(msg)
+            try:
+                reply = self.conn.recv()
+            except (EOFError, OSError) as e:
+                raise KioskError(f'协调进程已断开：{e}')
+        if reply[0] == 'error':
+            raise KioskError(reply[1])
+        return reply if reply[0] == 'paper' else reply[1]
+
+    def attach(self, store):
+        for idx, data in self.regions.items():
+            store.load(idx, data)
+        self.regions = None
+        self.sync = KioskSync(self, self.session, store)
+        return self.state['cur']
+
+    def commit(self, idx):
+        self.sync.flush()
+        return self.request(('commit', idx))
+
+    def finish(self):
+        self.sync.flush()
+        scores = self.request(('finish',))
+        self.sync.finish()
+        return scores
+
+    def close(self):
+        if self.sync is not None:
+            self.sync.close()
+        self.conn.close()
+        self.bank.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='考场多窗口模式')
+    parser.add_argument('bank', help='题库（.json / .jsonl / .qbank）')
+    parser.add_argument('-n', '--seats', type=int, default=4, help='考试窗口数')
+    parser.add_argument('--state-dir', help='各座位会话日志的目录，默认为 <题库>.kiosk')
+    parser.add_argument('--results', help='成绩库目录，默认为 <题库>.results')
+    parser.add_argument('-k', '--count', type=int, help='每个考生抽的题数，默认整库')
+    parser.add_argument('--quota', action='append', help='分类配额，如 single_choice=10 或 tag:几何=5，可重复')
+    parser.add_argument('--time-limit', type=float, help='整场限时（分钟），到点自动交卷')
+    parser.add_argument('--question-time', type=float, help='每题限时（秒），题目自带 time_limit 时以题目为准')
+    args = parser.parse_args(argv)
+
+    coordinator = KioskCoordinator(args.bank, args.seats, args.state_dir, args.count, parse_quotas(args.quota),
+                                   args.results or args.bank + '.results', args.time_limit, args.question_time)
+    # 服务管理器用 SIGTERM 停考场时同样关掉各窗口并写完会话日志
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    coordinator.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,47 +1,138 @@
 import sys
-import json
-import random
+import argparse
+from array import array
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QMessageBox, QCheckBox
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QMessageBox, QProgressDialog
 )
 
-from cross_table import CrossTableWidget
-from single_choice import SingleChoiceWidget
-from multi_choice import MultiChoiceWidget
-from drag_image import DragImageWidget   # 拖图题
+from PyQt5.QtCore import Qt, QTimer
+
+from widget_pool import WidgetPool, PlanCache, widget_class
+from question_bank import ShuffledView, open_bank
+from exam_paper import ExamPaper, assemble, new_seed, parse_quotas
+from answer_state import AnswerStore
+from session_journal import SessionJournal, load_session
+import profiling
+import question_types
+from app_style import install_style
+from navigator import QuestionNavigator, UNANSWERED, ANSWERED, COMMITTED
+from review_scheduler import ReviewScheduler
+from rich_text import RichTextView, is_rich, rich_cache
+from exam_clock import ExamClock, format_span
+
+# 复习模式下每提交这么多题写一次复习记录，关窗口时再写一次
+REVIEW_SAVE_EVERY = 20
+
 
 class QuizMain(QWidget):
-    def __init__(self, questions):
+    def __init__(self, questions, session_path=None, remote=None, paper=None, review_path=None,
+                 results_path=None, student='', group='', time_limit=None, question_time=None):
         super().__init__()
         self.setWindowTitle("多题型练习考试系统")
         self.resize(1600, 900)
-        self.questions = random.sample(questions, len(questions))
-        self.user_answers = []
-        for q in self.questions:
-            if q["type"] == "cross_table":
-                ans = []
-                for i in range(len(q['row_names'])):
-                    ans.append([False]*len(q['col_names'][0]['items']))
-                self.user_answers.append(ans)
-            elif q["type"] == "single_choice":
-                self.user_answers.append(None)
-            elif q["type"] == "multi_choice":
-                self.user_answers.append([False] * len(q["options"]))
-            elif q["type"] == "drag_image":
-                self.user_answers.append(None)  # 或 []，实际交互后续细化
+        # 连考试服务时题目、作答和批改都以服务端为准，questions 为 remote.questions（服务端已乱序）
+        self.remote = remote
+        # 有未交卷的会话日志就按原来的题目顺序和作答恢复
+        state = load_session(session_path) if session_path and remote is None else None
+        if state is not None and (state.finished or not state.order or max(state.order) >= len(questions)
+                                  or (paper is not None and state.order != paper.indices)):
+            state = None
+        if remote is not None:
+            # 服务端已按卷子顺序排好题，本地只用同一个种子算出各题的行列乱序
+            paper = ExamPaper(remote.state['seed'], range(len(questions)))
+        elif state is not None:
+            paper = ExamPaper(new_seed() if state.seed is None else state.seed, state.order)
+        elif paper is None:
+            # 没有指定卷子时整库出题；题目本身按需从题库读取
+            paper = assemble(questions)
+        self.paper = paper
+        self.questions = ShuffledView(questions, paper.indices)
+        # 作答按位压缩保存，勾选时只改对应的一位
+        self.user_answers = AnswerStore(self.questions)
         self.cur_idx = 0
+        if state is not None:
+            state.apply(self.user_answers)
+            self.cur_idx = min(state.cur_idx, len(self.questions) - 1)
+        self.journal = None
+        if remote is not None:
+            # 作答改动由 RemoteSync 成批上传，接口与会话日志相同
+            self.cur_idx = min(remote.attach(self.user_answers), len(self.questions) - 1)
+            self.journal = remote.sync
+        elif session_path:
+            self.journal = SessionJournal(session_path, self.user_answers, paper.indices, self.cur_idx,
+                                          state.gen if state is not None else 0, seed=paper.seed,
+                                          dwell=state.dwell if state is not None else None)
+        # 计时：整场限时（分钟）、每题限时（秒，题目自带 time_limit 优先）；各题停留时间随作答写进会话日志，续考接着算
+        dwell = state.dwell if state is not None else None
+        if remote is not None and remote.state.get('dwell'):
+            dwell = array('I')
+            dwell.frombytes(bytes.fromhex(remote.state['dwell']))
+        self.question_time = question_time
+        self.time_over = False
+        self.clock = ExamClock(len(self.questions), dwell, round(time_limit * 60000) if time_limit else None, self)
+        self.clock.tick.connect(self.update_clock)
+        self.clock.expired.connect(self.time_up)
+        self.clock.question_expired.connect(self.question_time_up)
+        self.clock.dwell_changed.connect(self.save_dwell)
         self.show_answer = False
+        self.finished = False
+        self.committed = bytearray(len(self.questions))
+        if remote is not None:
+            # 考试服务上已提交的题答案已公开，不能再改
+            for idx in remote.state.get('revealed', ()):
+                self.committed[idx] = 1
+        self.grade_worker = None
+        self.grade_progress = None
+        self.results_dialog = None
+        # 交卷成绩追加到本地成绩库；连考试服务时成绩记在服务端
+        self.results_path = results_path if remote is None else None
+        self.student = student
+        self.group = group
+        # 复习模式：下一题由复习排程决定，排程按题库下标记录，换一张卷子也接着用
+        self.review_path = review_path
+        self.review = None
+        if review_path and remote is None:
+            self.review = ReviewScheduler.load(review_path, len(questions), paper.indices)
+            self.review_pos = array('i', [-1]) * len(questions)
+            for pos, idx in enumerate(paper.indices):
+                self.review_pos[idx] = pos
+            self.review_history = []
+            self.review_unsaved = 0
+            self.cur_idx = self.review_pos[self.review.next()]
 
+        # 左侧题目导航，右侧为题目区；搜索索引在第一题显示后才在后台线程里建（连考试服务时不建，避免逐题下载）
+        outer = QHBoxLayout()
+        self.setLayout(outer)
+        self.search_index = None
+        self.navigator = QuestionNavigator(self.question_status)
+        self.navigator.jump_requested.connect(self.goto_q)
+        outer.addWidget(self.navigator)
         self.layout = QVBoxLayout()
-        self.setLayout(self.layout)
+        outer.addLayout(self.layout, 1)
 
+        top = QHBoxLayout()
         self.header = QLabel()
         self.header.setWordWrap(True)
-        self.layout.addWidget(self.header)
+        top.addWidget(self.header, 1)
+        # 倒计时定宽定高，每秒改字只重绘这个标签，不会让整个窗口重新布局
+        self.clock_label = QLabel()
+        self.clock_label.setAlignment(Qt.AlignRight | Qt.AlignTop)
+        metrics = self.clock_label.fontMetrics()
+        self.clock_label.setFixedSize(metrics.horizontalAdvance("剩余 00:00:00  本题 00:00:00"), metrics.height())
+        self.clock_label.hide()
+        top.addWidget(self.clock_label, 0, Qt.AlignTop)
+        self.layout.addLayout(top)
+        # markdown 题的题干：排好版的文档在 rich_text 的缓存里，换题只换引用
+        self.stem_view = RichTextView()
+        self.stem_view.hide()
+        self.layout.addWidget(self.stem_view)
 
         self.widget_area = QVBoxLayout()
         self.layout.addLayout(self.widget_area)
         self.cur_widget = None
+        # 题型控件复用，下一题/上一题的布局在空闲时提前准备
+        self.pool = WidgetPool(self.save_check)
+        self.plans = PlanCache(self.questions, paper=paper)
 
         # 按钮
         self.btns = QHBoxLayout()
@@ -59,146 +150,355 @@ class QuizMain(QWidget):
         self.next_btn.clicked.connect(self.next_q)
         self.commit_btn.clicked.connect(self.commit_q)
         self.finish_btn.clicked.connect(self.finish_all)
+        self.navigator.set_count(len(self.questions))
+        if remote is None:
+            QTimer.singleShot(0, self.start_search_index)
         self.update_ui()
 
+    def start_search_index(self):
+        # 检索用 numpy，放到第一题显示之后再导入；窗口已经关掉就不建了
+        if not self.isVisible():
+            return
+        from search_index import SearchIndex
+        self.search_index = SearchIndex(self.questions)
+        self.search_index.start()
+        self.navigator.set_index(self.search_index)
+
+    @profiling.traced("QuizMain.clear_widget_area")
     def clear_widget_area(self):
-        while self.widget_area.count():
-            child = self.widget_area.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+        """只移除不在复用池里的控件（如未知题型的提示）"""
+        pooled = set(map(id, self.pool.widgets.values()))
+        for i in reversed(range(self.widget_area.count())):
+            w = self.widget_area.itemAt(i).widget()
+            if w is not None and id(w) not in pooled:
+                self.widget_area.takeAt(i)
+                w.deleteLater()
 
+    def get_answer(self, idx):
+        return self.user_answers.get(idx)
+
+    def question_status(self, idx):
+        if self.committed[idx]:
+            return COMMITTED
+        return ANSWERED if self.user_answers.answered(idx) else UNANSWERED
+
+    @profiling.traced("QuizMain.update_ui")
     def update_ui(self):
         q = self.questions[self.cur_idx]
-        self.header.setText(f"第{self.cur_idx+1}题 / 共{len(self.questions)}题\n{q['question']}")
+        self.clock.enter(self.cur_idx, self.question_limit(q))
+        counter = f"第{self.cur_idx+1}题 / 共{len(self.questions)}题"
+        if is_rich(q):
+            self.header.setText(counter)
+            self.stem_view.set_text(q['question'])
+            self.stem_view.show()
+        else:
+            self.header.setText(f"{counter}\n{q['question']}")
+            self.stem_view.hide()
 
-        self.clear_widget_area()
         # 题型调度
-        if q["type"] == "cross_table":
-            widget = CrossTableWidget(q, self.user_answers[self.cur_idx], self.show_answer, self.save_check)
-        elif q["type"] == "single_choice":
-            widget = SingleChoiceWidget(q, self.user_answers[self.cur_idx], self.show_answer, self.save_check)
-        elif q["type"] == "multi_choice":
-            widget = MultiChoiceWidget(q, self.user_answers[self.cur_idx], self.show_answer, self.save_check)
-        elif q["type"] == "drag_image":
-            widget = DragImageWidget(q, self.user_answers[self.cur_idx], self.show_answer, self.save_check)
-        else:
+        cls = widget_class(q)
+        if self.cur_widget is not None:
+            self.cur_widget.hide()
+        self.clear_widget_area()
+        if cls is None:
             widget = QLabel("未知题型")
+            self.widget_area.addWidget(widget)
+        else:
+            widget, created = self.pool.acquire(cls, q, self.get_answer(self.cur_idx), self.show_answer,
+                                                self.plans.get(self.cur_idx))
+            if created:
+                self.widget_area.addWidget(widget)
+            widget.show()
+        # 时间到的题、连考试服务时已提交的题只能看不能改；控件是复用的，每次都要重新设
+        locked = not self.finished and (self.clock.question_over()
+                                        or (self.remote is not None and self.committed[self.cur_idx]))
+        widget.setEnabled(not (self.time_over or locked))
         self.cur_widget = widget
-        self.widget_area.addWidget(widget)
+        self.update_clock()
 
-        self.prev_btn.setEnabled(self.cur_idx > 0)
-        self.next_btn.setEnabled(self.cur_idx < len(self.questions)-1)
+        if self.review is not None:
+            self.prev_btn.setEnabled(bool(self.review_history))
+            self.next_btn.setEnabled(True)
+        else:
+            self.prev_btn.setEnabled(self.cur_idx > 0)
+            self.next_btn.setEnabled(self.cur_idx < len(self.questions)-1)
         self.commit_btn.setEnabled(not self.show_answer)
         self.finish_btn.setEnabled(not self.show_answer)
+        self.navigator.set_current(self.cur_idx)
+        if profiling.ENABLED:
+            profiling.counter("widgets", created=profiling.widgets_created, destroyed=profiling.widgets_destroyed)
+        QTimer.singleShot(0, self.prefetch)
 
-    def save_check(self):
-        q = self.questions[self.cur_idx]
-        if q["type"] == "cross_table":
-            widget = self.cur_widget.table
-            rows, cols = widget.rowCount(), widget.columnCount()-1
-            for i in range(rows):
-                for j in range(cols):
-                    w = widget.cellWidget(i, j+1)
-                    if w is not None:
-                        cb = w.findChild(QCheckBox)
-                        self.user_answers[self.cur_idx][i][j] = cb.isChecked()
-        elif q["type"] == "single_choice":
-            widget = self.cur_widget
-            selected = widget.bg.checkedId()
-            self.user_answers[self.cur_idx] = selected
-        elif q["type"] == "multi_choice":
-            widget = self.cur_widget
-            self.user_answers[self.cur_idx] = [cb.isChecked() for cb in widget.checkboxes]
-        elif q["type"] == "drag_image":
-            # 拖图题保存交互，后续实现，现在不处理
-            pass
+    def question_limit(self, q):
+        seconds = q.get('time_limit', self.question_time)
+        return round(seconds * 1000) if seconds else None
+
+    def update_clock(self):
+        parts = []
+        rem = self.clock.remaining()
+        if rem is not None:
+            parts.append(f"剩余 {format_span(rem)}")
+        rem = self.clock.question_remaining()
+        if rem is not None and not self.finished:
+            parts.append(f"本题 {format_span(rem)}")
+        self.clock_label.setText("  ".join(parts))
+        self.clock_label.setVisible(bool(parts))
+
+    def save_dwell(self, idx, ms):
+        if self.journal:
+            self.journal.set_dwell(idx, ms)
+
+    def time_up(self):
+        """整场时间到：不能再作答，自动交卷且不能取消"""
+        self.time_over = True
+        if self.cur_widget is not None:
+            self.cur_widget.setEnabled(False)
+        self.finish_all()
+        if self.grade_progress is not None:
+            self.grade_progress.setCancelButton(None)
+
+    def question_time_up(self, idx):
+        """本题时间到：锁住本题，跳到下一题"""
+        if idx != self.cur_idx or self.finished:
+            return
+        self.cur_widget.setEnabled(False)
+        if self.review is None and self.cur_idx < len(self.questions) - 1:
+            self.next_q()
+
+    def prefetch(self):
+        self.plans.prefetch(self.cur_idx + 1, self.cur_idx - 1)
+        self.warm_rich(self.cur_idx + 1, self.cur_idx - 1)
+
+    def warm_rich(self, *indices):
+        """前后几题的富文本题干和选项在后台排版；选项比题干窄，显示时只需按实际宽度重排"""
+        texts = []
+        for idx in indices:
+            if 0 <= idx < len(self.questions):
+                q = self.questions[idx]
+                if is_rich(q):
+                    texts.append(q['question'])
+                    texts += q.get('options') or []
+        if texts:
+            rich_cache().warm(texts, self.stem_view.font(), max(self.header.width(), 200))
+
+    @profiling.traced("QuizMain.save_check")
+    def save_check(self, *change):
+        """题目控件的改动回调：交叉表 (原始行, 原始列, 是否勾选)，单选 (选项,)，多选 (选项, 是否勾选)，
+        拖图题 (图片, 区域)"""
+        if not change:
+            return
+        qtype = question_types.of(self.questions[self.cur_idx])
+        if qtype is not None:
+            getattr(self.user_answers, qtype.setter)(self.cur_idx, *change)
+        self.navigator.refresh(self.cur_idx)
 
     def prev_q(self):
-        self.save_check()
+        if self.review is not None:
+            if self.review_history:
+                self.goto_q(self.review_history.pop())
+            return
         self.cur_idx = max(0, self.cur_idx - 1)
         self.show_answer = False
+        if self.journal:
+            self.journal.set_cur(self.cur_idx)
         self.update_ui()
 
     def next_q(self):
-        self.save_check()
+        if self.review is not None:
+            self.next_review()
+            return
         self.cur_idx = min(len(self.questions) - 1, self.cur_idx + 1)
         self.show_answer = False
+        if self.journal:
+            self.journal.set_cur(self.cur_idx)
         self.update_ui()
 
+    @profiling.traced("QuizMain.commit_q")
     def commit_q(self):
+        if self.remote is not None:
+            # 服务端记下本题已提交并返回答案，本地按同样的规则显示批改结果
+            try:
+                self.remote.commit(self.cur_idx)
+            except OSError as e:
+                QMessageBox.warning(self, "提交失败", f"连不上考试服务：{e}")
+                return
         q = self.questions[self.cur_idx]
-        user = self.user_answers[self.cur_idx]
-        if q["type"] == "cross_table":
-            score, total, missed, over = self.grade(q['answer'], user)
-            QMessageBox.information(self, "本题批改", f"本题得分：{score}/{total}\n漏选：{missed}，多选：{over}")
-        elif q["type"] == "single_choice":
-            score = 1 if user == q["answer"] else 0
-            QMessageBox.information(self, "本题批改", f"本题得分：{score}/1")
-        elif q["type"] == "multi_choice":
-            ans_set = set(q["answer"])
-            user_set = set(idx for idx, checked in enumerate(user) if checked)
-            correct = len(ans_set & user_set)
-            missed = len(ans_set - user_set)
-            over = len(user_set - ans_set)
-            total = len(ans_set)
-            QMessageBox.information(self, "本题批改", f"本题得分：{correct}/{total}\n漏选：{missed}，多选：{over}")
-        elif q["type"] == "drag_image":
-            QMessageBox.information(self, "本题批改", f"拖图题批改功能开发中~")
+        qtype = question_types.of(q)
+        result = None
+        if qtype is not None:
+            result = self.grade(qtype, q, self.get_answer(self.cur_idx))
+            QMessageBox.information(self, "本题批改", qtype.result_text.format(*result))
+        if self.review is not None and result is not None:
+            self.review.record(self.paper.indices[self.cur_idx], *result)
+            self.review_unsaved += 1
+            if self.review_unsaved >= REVIEW_SAVE_EVERY:
+                self.save_review()
+        self.committed[self.cur_idx] = 1
         self.show_answer = True
         self.update_ui()
 
+    @profiling.traced("QuizMain.finish_all")
     def finish_all(self):
-        res = []
-        total_score, total_count = 0, 0
-        for idx, q in enumerate(self.questions):
-            user = self.user_answers[idx]
-            if q["type"] == "cross_table":
-                score, total, missed, over = self.grade(q['answer'], user)
-                res.append(f"第{idx+1}题：得分{score}/{total}（漏{missed}，多{over}）")
-                total_score += score
-                total_count += total
-            elif q["type"] == "single_choice":
-                score = 1 if user == q["answer"] else 0
-                res.append(f"第{idx+1}题：得分{score}/1")
-                total_score += score
-                total_count += 1
-            elif q["type"] == "multi_choice":
-                ans_set = set(q["answer"])
-                user_set = set(idx for idx, checked in enumerate(user) if checked)
-                correct = len(ans_set & user_set)
-                total = len(ans_set)
-                res.append(f"第{idx+1}题：得分{correct}/{total}（漏{len(ans_set-user_set)}，多{len(user_set-ans_set)}）")
-                total_score += correct
-                total_count += total
-            elif q["type"] == "drag_image":
-                res.append(f"第{idx+1}题：拖图题批改暂未实现")
-        QMessageBox.information(self, "交卷结果", f"总分：{total_score}/{total_count}\n\n" + "\n".join(res))
+        """在后台线程批改冻结的作答副本，界面不卡；批改中途可以取消"""
+        if self.grade_worker is not None and self.grade_worker.isRunning():
+            return
+        from results_view import GradeWorker, RemoteGradeWorker
+        self.finish_btn.setEnabled(False)
+        n = len(self.questions)
+        self.grade_progress = QProgressDialog("正在批改…", "取消", 0, n, self)
+        self.grade_progress.setWindowTitle("交卷")
+        self.grade_progress.setWindowModality(Qt.WindowModal)
+        self.grade_progress.setMinimumDuration(300)
+        if self.remote is not None:
+            self.grade_worker = RemoteGradeWorker(self.remote, parent=self)
+        else:
+            self.grade_worker = GradeWorker(self.questions, self.user_answers.copy(), parent=self)
+        self.grade_worker.progress.connect(lambda done, _: self.grade_progress.setValue(done))
+        self.grade_worker.graded.connect(self.show_results)
+        self.grade_worker.failed.connect(lambda msg: QMessageBox.warning(self, "交卷失败", msg))
+        self.grade_worker.finished.connect(self.grading_finished)
+        self.grade_progress.canceled.connect(self.grade_worker.requestInterruption)
+        self.grade_worker.start()
+
+    def grading_finished(self):
+        self.grade_progress.reset()
+        if not self.show_answer:
+            # 取消了批改，可以继续作答后重新交卷
+            self.finish_btn.setEnabled(True)
+
+    @profiling.traced("QuizMain.show_results")
+    def show_results(self, scores):
+        if self.grade_worker.isInterruptionRequested():
+            return
+        # 最后一题的停留时间要在交卷记录之前写进日志
+        self.clock.stop()
+        if self.journal:
+            self.journal.finish()
+        if self.results_path:
+            self.save_results(scores)
+        self.finished = True
         self.show_answer = True
         self.update_ui()
+        from results_view import ResultsDialog
+        if self.results_dialog is not None:
+            self.results_dialog.close()
+            self.results_dialog.deleteLater()
+        self.results_dialog = ResultsDialog(scores, self)
+        self.results_dialog.jump_requested.connect(self.jump_to)
+        self.results_dialog.show()
+
+    def save_results(self, scores):
+        from results_store import ResultsStore
+        try:
+            with ResultsStore(self.results_path) as store:
+                store.append_scores(scores, self.paper.indices, student=self.student, group=self.group,
+                                    seed=self.paper.seed)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "成绩未保存", str(e))
+
+    def jump_to(self, idx):
+        self.cur_idx = max(0, min(len(self.questions) - 1, idx))
+        if self.journal:
+            self.journal.set_cur(self.cur_idx)
+        self.update_ui()
+
+    def goto_q(self, idx):
+        """侧边导航跳题：和上一题/下一题一样回到作答状态，交卷后则继续显示答案"""
+        if not self.finished:
+            self.show_answer = False
+        self.jump_to(idx)
+
+    def next_review(self):
+        """复习模式的下一题：没提交就跳过的题由排程推后；再次出到做过的题时清掉上次的作答重做"""
+        if not self.committed[self.cur_idx]:
+            self.review.skip(self.paper.indices[self.cur_idx])
+        pos = self.review_pos[self.review.next()]
+        self.review_history.append(self.cur_idx)
+        if self.committed[pos]:
+            self.committed[pos] = 0
+            self.user_answers.clear(pos)
+        self.goto_q(pos)
+
+    def save_review(self):
+        try:
+            self.review.save(self.review_path)
+        except OSError as e:
+            QMessageBox.warning(self, "保存失败", f"复习记录写不进去：{e}")
+            return
+        self.review_unsaved = 0
+
+    def closeEvent(self, event):
+        if self.review is not None and self.review_unsaved:
+            self.save_review()
+        if self.search_index is not None:
+            self.search_index.stop()
+        if self.grade_worker is not None:
+            self.grade_worker.requestInterruption()
+            self.grade_worker.wait()
+        self.clock.stop()
+        if self.journal:
+            self.journal.close()
+        if self.remote is not None:
+            self.remote.close()
+        super().closeEvent(event)
 
     @staticmethod
-    def grade(ans, user):
-        total = 0
-        correct = 0
-        missed = 0
-        over = 0
-        for i in range(len(ans)):
-            for j in range(len(ans[0])):
-                if ans[i][j]:
-                    total += 1
-                    if user[i][j]:
-                        correct += 1
-                    else:
-                        missed += 1
-                else:
-                    if user[i][j]:
-                        over += 1
-        return correct, total, missed, over
+    @profiling.traced("QuizMain.grade")
+    def grade(qtype, q, user):
+        return qtype.grade(q, user)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
-    with open('questions.json', encoding='utf-8') as f:
-        questions = json.load(f)
-    win = QuizMain(questions)
+    # 在建任何控件之前装好全局样式，之后不会再整体重新 polish
+    install_style(app)
+    parser = argparse.ArgumentParser()
+    # 支持 questions.json（数组）、.jsonl 和编译后的 .qbank 题库
+    parser.add_argument('bank', nargs='?', default='questions.json')
+    parser.add_argument('--session', help='会话日志路径，默认为 <题库>.session')
+    parser.add_argument('--no-session', action='store_true', help='不记录会话日志')
+    parser.add_argument('--server', help='连考试服务作答，如 http://192.168.1.10:8765（此时不读本地题库）')
+    parser.add_argument('--exam-session', help='考试服务上的会话号，断线后续考用')
+    parser.add_argument('-k', '--count', type=int, help='抽题数，默认整库')
+    parser.add_argument('--seed', type=int, help='组卷种子，同一种子得到同一张卷子（含行列乱序）')
+    parser.add_argument('--quota', action='append', help='分类配额，如 single_choice=10 或 tag:几何=5，可重复')
+    parser.add_argument('--review', nargs='?', const='', help='复习模式：按错题间隔重复出题，记录默认存到 <题库>.review')
+    parser.add_argument('--results', help='成绩库目录，默认为 <题库>.results')
+    parser.add_argument('--no-results', action='store_true', help='交卷后不写成绩库')
+    parser.add_argument('--student', default='', help='写进成绩库的考生名')
+    parser.add_argument('--group', default='', help='写进成绩库的班级名')
+    parser.add_argument('--time-limit', type=float, help='整场限时（分钟），到点自动交卷')
+    parser.add_argument('--question-time', type=float, help='每题限时（秒），题目自带 time_limit 时以题目为准')
+    # 考场模式下由 kiosk.py 的协调进程带参数启动
+    parser.add_argument('--kiosk', help=argparse.SUPPRESS)
+    parser.add_argument('--seat', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args(app.arguments()[1:])
+    if args.kiosk:
+        from kiosk import KioskExam
+        remote = KioskExam(args.kiosk, args.seat)
+        win = QuizMain(remote.questions, remote=remote, time_limit=args.time_limit, question_time=args.question_time)
+    elif args.server:
+        from exam_client import RemoteExam
+        remote = RemoteExam(args.server, args.exam_session)
+        print(f'考试会话：{remote.session}', file=sys.stderr)
+        win = QuizMain(remote.questions, remote=remote, time_limit=args.time_limit, question_time=args.question_time)
+    else:
+        questions = open_bank(args.bank)
+        session = None if args.no_session else (args.session or args.bank + '.session')
+        review = None
+        if args.review is not None:
+            # 复习是练习，不记会话日志
+            review, session = args.review or args.bank + '.review', None
+        paper = None
+        try:
+            if args.count or args.seed is not None or args.quota:
+                paper = assemble(questions, args.count, args.seed, parse_quotas(args.quota))
+                print(f'组卷种子：{paper.seed}', file=sys.stderr)
+            results = None if args.no_results else (args.results or args.bank + '.results')
+            win = QuizMain(questions, session, paper=paper, review_path=review, results_path=results,
+                           student=args.student, group=args.group, time_limit=args.time_limit,
+                           question_time=args.question_time)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
     win.show()
     sys.exit(app.exec_())
@@ -1,21 +1,55 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QCheckBox
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QCheckBox
+
+import profiling
+from app_style import install_style, set_flag
+from rich_text import RichTextView, is_rich
 
 class MultiChoiceWidget(QWidget):
-    def __init__(self, qobj, answer_data, show_answer, save_callback):
+    @profiling.traced("MultiChoiceWidget.__init__")
+    def __init__(self, qobj, answer_data, show_answer, save_callback, plan=None):
         super().__init__()
-        self.qobj = qobj
+        profiling.track_widget(self)
+        install_style()
         self.save_callback = save_callback
-        layout = QVBoxLayout()
-        self.setLayout(layout)
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
         self.checkboxes = []
-        for idx, opt in enumerate(qobj["options"]):
-            cb = QCheckBox(opt)
-            cb.setChecked(answer_data[idx])
-            cb.setEnabled(not show_answer)
-            cb.stateChanged.connect(save_callback)
-            self.checkboxes.append(cb)
-            layout.addWidget(cb)
+        self.option_views = []   # 富文本选项的文字，复选框本身不带字
+        self.bind(qobj, answer_data, show_answer, plan)
+
+    @profiling.traced("MultiChoiceWidget.bind")
+    def bind(self, qobj, answer_data, show_answer, plan=None):
+        """换题时复用已有的复选框，不够再补，多余的隐藏"""
+        self.qobj = qobj
         # 显示正确答案提示（答题后）
-        if show_answer:
-            for idx in qobj["answer"]:
-                self.checkboxes[idx].setStyleSheet("color: green; font-weight: bold;")
+        correct = set(qobj["answer"]) if show_answer else ()
+        rich = is_rich(qobj)
+        for idx in range(len(self.checkboxes), len(qobj["options"])):
+            cb = profiling.track_widget(QCheckBox())
+            cb.stateChanged.connect(lambda state, i=idx: self.save_callback(i, bool(state)))
+            view = RichTextView()
+            view.setObjectName("richOption")
+            view.clicked.connect(cb.click)
+            view.hide()
+            row = QHBoxLayout()
+            row.addWidget(cb)
+            row.addWidget(view, 1)
+            self.checkboxes.append(cb)
+            self.option_views.append(view)
+            self.layout.addLayout(row)
+        for idx, (cb, view) in enumerate(zip(self.checkboxes, self.option_views)):
+            cb.blockSignals(True)
+            if idx < len(qobj["options"]):
+                cb.setText("" if rich else qobj["options"][idx])
+                cb.setChecked(answer_data[idx])
+                cb.setEnabled(not show_answer)
+                set_flag(cb, "correct", idx in correct)
+                cb.show()
+                if rich:
+                    view.set_text(qobj["options"][idx])
+                    set_flag(view, "correct", idx in correct)
+                view.setVisible(rich)
+            else:
+                cb.hide()
+                view.hide()
+            cb.blockSignals(False)
@@ -0,0 +1,165 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QLabel, QTableView, QHeaderView, QAbstractItemView
+from PyQt5.QtGui import QColor, QFont
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer, pyqtSignal
+
+import profiling
+
+# 侧边题目导航：列表只绘制可见行，每行只显示题号和作答状态，不读题目内容
+# 搜索框输入停顿后查询 SearchIndex，列表切换成命中的题目
+
+UNANSWERED, ANSWERED, COMMITTED = range(3)
+STATUS_TEXT = ('未答', '已答', '已提交')
+STATUS_COLOR = ('#888888', '#1f5fa8', '#2e8b57')
+
+
+class QuestionListModel(QAbstractListModel):
+    """rows 为 None 时显示全部题目，否则只显示 rows 里的题号"""
+
+    def __init__(self, status, parent=None):
+        super().__init__(parent)
+        self.status = status  # 可调用：题号 -> 状态
+        self.count = 0
+        self.rows = None
+        self.current = -1
+        self.colors = [QColor(c) for c in STATUS_COLOR]
+        self.current_font = QFont()
+        self.current_font.setBold(True)
+
+    def set_count(self, n):
+        self.beginResetModel()
+        self.count = n
+        self.endResetModel()
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.count if self.rows is None else len(self.rows)
+
+    def question_at(self, row):
+        return row if self.rows is None else int(self.rows[row])
+
+    def row_of(self, idx):
+        if self.rows is None:
+            return idx if 0 <= idx < self.count else -1
+        pos = int(self.rows.searchsorted(idx))
+        return pos if pos < len(self.rows) and self.rows[pos] == idx else -1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        idx = self.question_at(index.row())
+        if role == Qt.DisplayRole:
+            return f"第{idx + 1}题  {STATUS_TEXT[self.status(idx)]}"
+        if role == Qt.ForegroundRole:
+            return self.colors[self.status(idx)]
+        if role == Qt.FontRole and idx == self.current:
+            return self.current_font
+        return None
+
+    def refresh(self, idx):
+        row = self.row_of(idx)
+        if row >= 0:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def set_current(self, idx):
+        old, self.current = self.current, idx
+        self.refresh(old)
+        self.refresh(idx)
+
+
+class QuestionNavigator(QWidget):
+    jump_requested = pyqtSignal(int)
+
+    def __init__(self, status, index=None, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.setMaximumWidth(240)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.search_box = QLineEdit()
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.setPlaceholderText("搜索题干、选项、行列名")
+        self.search_box.setEnabled(index is not None)
+        layout.addWidget(self.search_box)
+        self.info = QLabel()
+        layout.addWidget(self.info)
+
+        self.model = QuestionListModel(status, self)
+        # 用单列 QTableView 而不是 QListView：QListView 每次 dataChanged 都重排全部行，
+        # 表格固定行高时只重绘改动的那一格，作答时刷新状态不随题数变慢
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.setShowGrid(False)
+        self.view.horizontalHeader().hide()
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.view.verticalHeader().hide()
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(22)
+        self.view.clicked.connect(lambda i: self.jump_requested.emit(self.model.question_at(i.row())))
+        self.view.activated.connect(lambda i: self.jump_requested.emit(self.model.question_at(i.row())))
+        layout.addWidget(self.view, 1)
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(150)
+        self._debounce.timeout.connect(self.run_search)
+        self.search_box.textChanged.connect(self._debounce.start)
+        # 索引还在后台建时，定时刷新进度并重跑当前查询
+        self._progress = QTimer(self)
+        self._progress.setInterval(500)
+        self._progress.timeout.connect(self.poll_index)
+
+    def set_count(self, n):
+        self.model.set_count(n)
+        self.set_index(self.index)
+
+    def set_index(self, index):
+        """挂上（或换掉）搜索索引；索引可以还在建"""
+        self.index = index
+        self.search_box.setEnabled(index is not None)
+        if index is not None and not index.complete:
+            self._progress.start()
+        self.poll_index()
+
+    def poll_index(self):
+        if self.index is None:
+            return
+        if self.index.complete:
+            self._progress.stop()
+        if self.search_box.text().strip():
+            self.run_search()
+        else:
+            self.show_info(None)
+
+    @profiling.traced("QuestionNavigator.run_search")
+    def run_search(self):
+        if self.index is None:
+            return
+        hits = self.index.search(self.search_box.text())
+        self.model.set_rows(hits)
+        self.show_info(hits)
+
+    def show_info(self, hits):
+        building = "" if self.index.complete else f"正在建立搜索索引 {self.index.built}/{len(self.index)}"
+        if hits is None:
+            self.info.setText(building)
+        else:
+            self.info.setText(f"命中 {len(hits)} 题" + (f"（{building}）" if building else ""))
+
+    def set_current(self, idx):
+        self.model.set_current(idx)
+        row = self.model.row_of(idx)
+        if row >= 0:
+            self.view.scrollTo(self.model.index(row))
+
+    def refresh(self, idx):
+        self.model.refresh(idx)
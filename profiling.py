@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from array import array
+from functools import wraps
+
+# 热点计时：设置环境变量 QUIZ_PROFILE=trace.json 后启动才生效（需在导入各模块之前设置）
+# 关闭时 traced 直接返回原函数、span 返回空上下文，没有额外开销
+# 退出时写出 Chrome trace-event JSON（chrome://tracing / Perfetto 可打开）和各计时点的 p50/p95/p99
+
+TRACE_PATH = os.environ.get('QUIZ_PROFILE', '')
+ENABLED = bool(TRACE_PATH)
+CAPACITY = int(os.environ.get('QUIZ_PROFILE_CAPACITY', 1 << 16))
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class SpanBuffer:
+    """定长环形缓冲：写满后覆盖最旧的记录；GUI 线程和后台批改线程都会写，写入加锁"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.names = []
+        self.name_ids = {}
+        self.name_of = array('I', [0]) * capacity
+        self.start = array('q', [0]) * capacity
+        self.dur = array('q', [0]) * capacity
+        self.tid = array('Q', [0]) * capacity
+        self.pos = 0
+        self.total = 0
+        # 计数器事件 (时间, 名称, 参数) 也放定长环里，长时间考试不会越积越多
+        self.counters = [None] * capacity
+        self.counter_pos = 0
+        self.counter_total = 0
+        self.lock = threading.Lock()
+
+    def name_id(self, name):
+        with self.lock:
+            i = self.name_ids.get(name)
+            if i is None:
+                i = self.name_ids[name] = len(self.names)
+                self.names.append(name)
+            return i
+
+    def add(self, name_id, start, dur):
+        tid = threading.get_ident()
+        with self.lock:
+            p = self.pos
+            self.name_of[p] = name_id
+            self.start[p] = start
+            self.dur[p] = dur
+            self.tid[p] = tid
+            self.pos = (p + 1) % self.capacity
+            self.total += 1
+
+    def add_counter(self, ts, name, values):
+        with self.lock:
+            self.counters[self.counter_pos] = (ts, name, values)
+            self.counter_pos = (self.counter_pos + 1) % self.capacity
+            self.counter_total += 1
+
+    def counter_records(self):
+        with self.lock:
+            n = min(self.counter_total, self.capacity)
+            first = (self.counter_pos - n) % self.capacity
+            return [self.counters[(first + k) % self.capacity] for k in range(n)]
+
+    def records(self):
+        with self.lock:
+            n = min(self.total, self.capacity)
+            first = (self.pos - n) % self.capacity
+        for k in range(n):
+            p = (first + k) % self.capacity
+            yield self.names[self.name_of[p]], self.start[p], self.dur[p], self.tid[p]
+
+
+_buffer = SpanBuffer(CAPACITY) if ENABLED else None
+_t0 = time.perf_counter_ns()
+widgets_created = 0
+widgets_destroyed = 0
+
+
+class _Span:
+    __slots__ = ('name_id', 't')
+
+    def __init__(self, name_id):
+        self.name_id = name_id
+
+    def __enter__(self):
+        self.t = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        t = self.t
+        _buffer.add(self.name_id, t - _t0, time.perf_counter_ns() - t)
+        return False
+
+
+def span(name):
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(_buffer.name_id(name))
+
+
+def traced(name=None):
+    """给函数加计时；未开启时原样返回函数"""
+    def deco(fn):
+        if not ENABLED:
+            return fn
+        name_id = _buffer.name_id(name or fn.__qualname__)
+        perf = time.perf_counter_ns
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            t = perf()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _buffer.add(name_id, t - _t0, perf() - t)
+        return wrapper
+    return deco
+
+
+def _on_destroyed(*_):
+    global widgets_destroyed
+    widgets_destroyed += 1
+
+
+def track_widget(widget):
+    """统计控件的创建和销毁次数"""
+    global widgets_created
+    if ENABLED:
+        widgets_created += 1
+        widget.destroyed.connect(_on_destroyed)
+    return widget
+
+
+def counter(name, **values):
+    if ENABLED:
+        _buffer.add_counter(time.perf_counter_ns() - _t0, name, values)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def summary():
+    """各计时点的次数和 p50/p95/p99（毫秒）"""
+    by_name = {}
+    for name, _, dur, _ in _buffer.records():
+        by_name.setdefault(name, []).append(dur)
+    out = {}
+    for name, durs in by_name.items():
+        durs.sort()
+        out[name] = {
+            'count': len(durs),
+            'p50': percentile(durs, 50) / 1e6,
+            'p95': percentile(durs, 95) / 1e6,
+            'p99': percentile(durs, 99) / 1e6,
+            'max': durs[-1] / 1e6,
+        }
+    return out
+
+
+def export_chrome_trace(path):
+    pid = os.getpid()
+    events = [{'name': name, 'ph': 'X', 'ts': start / 1000, 'dur': dur / 1000, 'pid': pid, 'tid': tid}
+              for name, start, dur, tid in _buffer.records()]
+    events += [{'name': name, 'ph': 'C', 'ts': ts / 1000, 'pid': pid, 'args': args}
+               for ts, name, args in _buffer.counter_records()]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def format_summary(stats):
+    lines = [f'{"span":36s} {"count":>7s} {"p50":>9s} {"p95":>9s} {"p99":>9s} {"max":>9s}  (ms)']
+    for name, s in sorted(stats.items(), key=lambda kv: -kv[1]['p95']):
+        lines.append(f'{name:36s} {s["count"]:7d} {s["p50"]:9.3f} {s["p95"]:9.3f} {s["p99"]:9.3f} {s["max"]:9.3f}')
+    lines.append(f'widgets created {widgets_created}, destroyed {widgets_destroyed}')
+    return '\n'.join(lines)
+
+
+def _dump():
+    export_chrome_trace(TRACE_PATH)
+    stats = summary()
+    with open(TRACE_PATH + '.summary.json', 'w', encoding='utf-8') as f:
+        json.dump({'spans': stats, 'widgets_created': widgets_created,
+                   'widgets_destroyed': widgets_destroyed}, f, indent=2)
+    print(format_summary(stats), file=sys.stderr)
+
+
+if ENABLED:
+    atexit.register(_dump)
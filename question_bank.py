@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import mmap
+import threading
+from array import array
+from collections import OrderedDict
+
+import profiling
+
+# 字符串整体匹配，避免把字符串里的括号算进嵌套层级
+_TOKEN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]', re.S)
+
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'QIDX1\n'
+
+
+def scan_json_array(buf):
+    """扫描 JSON 数组文件，返回每个顶层元素的 (起始偏移, 结束偏移)"""
+    starts, ends = array('Q'), array('Q')
+    depth = 0
+    for m in _TOKEN_RE.finditer(buf):
+        tok = m.group()
+        if tok[0] == 0x22:  # 字符串
+            continue
+        if tok in (b'{', b'['):
+            depth += 1
+            if depth == 2:
+                starts.append(m.start())
+        else:
+            if depth == 2:
+                ends.append(m.end())
+            depth -= 1
+    return starts, ends
+
+
+def scan_jsonl(buf):
+    """按行建立偏移，跳过空行"""
+    starts, ends = array('Q'), array('Q')
+    pos, size = 0, len(buf)
+    while pos < size:
+        nl = buf.find(b'\n', pos)
+        if nl < 0:
+            nl = size
+        if buf[pos:nl].strip():
+            starts.append(pos)
+            ends.append(nl)
+        pos = nl + 1
+    return starts, ends
+
+
+class QuestionBank:
+    """按需解析的题库：启动时只建字节偏移索引，题目在访问时才 json 解析，最近用过的放在 LRU 里"""
+
+    @profiling.traced('QuestionBank.__init__')
+    def __init__(self, path, cache_size=256, use_index_file=True):
+        self.path = path
+        self.cache_size = cache_size
+        self.jsonl = path.endswith('.jsonl')
+        self._cache = OrderedDict()
+        # 后台批改线程也会读题，LRU 的增删需要加锁
+        self._cache_lock = threading.Lock()
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.starts, self.ends = self._load_index(use_index_file)
+
+    def _index_key(self):
+        st = os.stat(self.path)
+        return f'{st.st_size}:{st.st_mtime_ns}'.encode()
+
+    def _load_index(self, use_index_file):
+        idx_path = self.path + INDEX_SUFFIX
+        key = self._index_key()
+        if use_index_file and os.path.exists(idx_path):
+            with open(idx_path, 'rb') as f:
+                data = f.read()
+            head, _, rest = data.partition(b'\n')
+            if head + b'\n' == INDEX_MAGIC:
+                saved_key, _, body = rest.partition(b'\n')
+                if saved_key == key:
+                    offsets = array('Q')
+                    offsets.frombytes(body)
+                    n = len(offsets) // 2
+                    return offsets[:n], offsets[n:]
+        if self.jsonl:
+            starts, ends = scan_jsonl(self._buf)
+        else:
+            starts, ends = scan_json_array(self._buf)
+        if use_index_file:
+            try:
+                with open(idx_path, 'wb') as f:
+                    f.write(INDEX_MAGIC + key + b'\n')
+                    f.write(starts.tobytes())
+                    f.write(ends.tobytes())
+            except OSError:
+                pass  # 题库目录只读时不缓存索引
+        return starts, ends
+
+    def __len__(self):
+        return len(self.starts)
+
+    def raw(self, idx):
+        """未解析的原始字节"""
+        return self._buf[self.starts[idx]:self.ends[idx]]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('question index out of range')
+        with self._cache_lock:
+            q = self._cache.get(idx)
+            if q is not None:
+                self._cache.move_to_end(idx)
+                return q
+        q = json.loads(self.raw(idx))
+        with self._cache_lock:
+            self._cache[idx] = q
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return q
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._file.close()
+
+
+class ShuffledView:
+    """按给定顺序访问题库，不复制题目"""
+
+    def __init__(self, bank, order):
+        self.bank = bank
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        return self.bank[self.order[idx]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+@profiling.traced()
+def open_bank(path, cache_size=256):
+    if path.endswith('.qbank'):
+        from compiled_bank import CompiledBank
+        return CompiledBank(path, cache_size=cache_size)
+    return QuestionBank(path, cache_size=cache_size)
@@ -0,0 +1,94 @@
+import importlib
+
+# 题型注册表：每种题型的显示名、题目控件、换题前的布局准备、作答写入方法和单题批改函数
+# 控件、布局和批改都写成 '模块:名字'，第一次出现该题型的题目时才导入对应模块，
+# 启动时不加载用不到的题型控件，也不加载 numpy；新增题型只需在这里 register 一次
+
+
+def _resolve(spec):
+    module, _, name = spec.partition(':')
+    return getattr(importlib.import_module(module), name)
+
+
+class QuestionType:
+    """widget 为控件类，或按题目返回控件类的函数（交叉表按列组数选类）；
+    setter 为 AnswerStore 上写入作答的方法名，参数即题目控件 save_callback 的参数；
+    grade 的参数为 (标准答案, 作答, *grade_args(q))，返回 (得分, 满分, 漏选, 多选)，result_text 为提交单题时的提示；
+    validate 检查题目结构，返回问题描述列表（见 bank_lint）"""
+
+    def __init__(self, name, label, widget, setter, grade, prepare=None, grade_args=None,
+                 result_text="本题得分：{0}/{1}\n漏选：{2}，多选：{3}", validate=None):
+        self.name = name
+        self.label = label
+        self.setter = setter
+        self.result_text = result_text
+        self.specs = {'widget': widget, 'grade': grade, 'prepare': prepare, 'validate': validate}
+        self.grade_args = grade_args
+        self._loaded = {}
+
+    def _load(self, key):
+        obj = self._loaded.get(key)
+        if obj is None:
+            obj = self._loaded[key] = _resolve(self.specs[key])
+        return obj
+
+    def widget_class(self, q):
+        obj = self._load('widget')
+        return obj if isinstance(obj, type) else obj(q)
+
+    def prepare(self, q, rng=None):
+        if self.specs['prepare'] is None:
+            return None
+        return self._load('prepare')(q, rng)
+
+    def grade(self, q, user):
+        extra = self.grade_args(q) if self.grade_args is not None else ()
+        return self._load('grade')(q['answer'], user, *extra)
+
+    def validate(self, q):
+        if self.specs['validate'] is None:
+            return []
+        return self._load('validate')(q)
+
+
+TYPES = {}
+
+
+def register(qtype):
+    TYPES[qtype.name] = qtype
+    return qtype
+
+
+def get(name):
+    """未知题型返回 None"""
+    return TYPES.get(name)
+
+
+def of(q):
+    return TYPES.get(q.get('type'))
+
+
+def modules():
+    """注册表里按名字导入的模块，打包时要列进 hiddenimports；validate 只在命令行检查题库时用到，不算在内"""
+    return sorted({spec.partition(':')[0] for qtype in TYPES.values()
+                   for key, spec in qtype.specs.items() if spec and key != 'validate'})
+
+
+def label(name):
+    qtype = TYPES.get(name)
+    return qtype.label if qtype is not None else name
+
+
+register(QuestionType('cross_table', '交叉表', 'cross_table:cross_table_class', 'set_cell',
+                      'grading:grade_cross_table', prepare='cross_table:plan_cross_table',
+                      validate='bank_lint:check_cross_table'))
+register(QuestionType('single_choice', '单选', 'single_choice:SingleChoiceWidget', 'set_single',
+                      'grading:grade_single_choice', result_text="本题得分：{0}/{1}",
+                      validate='bank_lint:check_single_choice'))
+register(QuestionType('multi_choice', '多选', 'multi_choice:MultiChoiceWidget', 'set_choice',
+                      'grading:grade_multi_choice', grade_args=lambda q: (len(q['options']),),
+                      validate='bank_lint:check_multi_choice'))
+register(QuestionType('drag_image', '拖图', 'drag_image:DragImageWidget', 'set_placement',
+                      'grading:grade_drag_image', prepare='drag_image:prefetch_drag_image',
+                      result_text="本题得分：{0}/{1}\n漏放：{2}，错放：{3}",
+                      validate='bank_lint:check_drag_image'))
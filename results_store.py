@@ -0,0 +1,333 @@
+import os
+import sys
+import csv
+import json
+import time
+import zipfile
+import argparse
+
+import numpy as np
+
+from compiled_bank import TYPE_CODES, TYPE_NAMES
+
+# 成绩库：每次交卷一条场次记录，场次里每道计分题一条题目记录，按列存成定长数组文件，不依赖 PyQt5
+# 目录结构：meta.json（已提交的行数）、labels.txt（学生/班级名，列里只存编号）、<表>.<列>.bin、
+# lock（写入方打开时加的排他锁，进程退出时系统自动释放）
+# 追加时先把各列写到文件末尾，最后替换 meta.json 才算提交；中途断电多出的半截数据在下次打开时截掉
+# 查询和导出按 CHUNK_ROWS 行一块地读内存映射，只碰用到的列，几十万场考试也不用整表读进内存
+
+STORE_VERSION = 1
+CHUNK_ROWS = 1 << 20
+LOCK_NAME = 'lock'
+FLUSH_ROWS = 1 << 16
+
+TABLES = {
+    'sessions': (('student', '<u4'), ('group', '<u4'), ('seed', '<i8'), ('finished', '<f8'),
+                 ('count', '<u4'), ('score', '<u4'), ('total', '<u4')),
+    'questions': (('session', '<u4'), ('qindex', '<u4'), ('type', 'u1'),
+                  ('correct', '<u2'), ('total', '<u2'), ('missed', '<u2'), ('over', '<u2')),
+}
+LABEL_COLUMNS = {'student', 'group'}
+_U2_MAX = np.iinfo(np.uint16).max
+
+
+def _u2(a):
+    # 单题计数按 uint16 存，超过上限的截断（交叉表最多几千格）
+    return np.minimum(np.asarray(a), _U2_MAX)
+
+
+class StoreLockedError(OSError):
+    pass
+
+
+def _lock(path):
+    """对锁文件加排他锁并返回文件描述符，已被别人锁住时抛 StoreLockedError，不等待"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        raise StoreLockedError(f'{os.path.dirname(path)}: 成绩库正被另一个进程写入') from None
+    return fd
+
+
+def _unlock(fd):
+    if os.name == 'nt':
+        import msvcrt
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    os.close(fd)
+
+
+class ResultsStore:
+    """同一时间只允许一个写入方：可写打开时加排他锁，锁已被占用就抛 StoreLockedError；
+    读可以与写同时进行，只看得到已提交的行"""
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._lock_fd = None
+        if not readonly:
+            # 先加锁再读 meta.json，否则读到的行数可能是别的写入方提交前的
+            os.makedirs(path, exist_ok=True)
+            self._lock_fd = _lock(os.path.join(path, LOCK_NAME))
+        try:
+            self._open()
+        except BaseException:
+            self._release()
+            raise
+
+    def _open(self):
+        path = self.path
+        readonly = self.readonly
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != STORE_VERSION:
+                raise ValueError(f'{path}: 成绩库版本 {meta.get("version")} 不受支持')
+        elif readonly:
+            raise FileNotFoundError(meta_path)
+        else:
+            meta = {'version': STORE_VERSION, 'rows': {t: 0 for t in TABLES}, 'labels': 0}
+        self.rows = dict(meta['rows'])
+        labels_path = os.path.join(path, 'labels.txt')
+        self.labels = []
+        if os.path.exists(labels_path):
+            with open(labels_path, encoding='utf-8') as f:
+                self.labels = f.read().split('\n')[:meta['labels']]
+        self.label_codes = {s: i for i, s in enumerate(self.labels)}
+        self._pending = {t: [] for t in TABLES}
+        self._pending_rows = 0
+        self._new_labels = []
+        if not readonly:
+            self._truncate()
+            if not self.labels:
+                self.label('')
+
+    def _file(self, table, col):
+        return os.path.join(self.path, f'{table}.{col}.bin')
+
+    def _truncate(self):
+        """丢掉上次没提交完的尾巴"""
+        for table, cols in TABLES.items():
+            for col, dtype in cols:
+                fn = self._file(table, col)
+                size = self.rows[table] * np.dtype(dtype).itemsize
+                if not os.path.exists(fn):
+                    open(fn, 'wb').close()
+                elif os.path.getsize(fn) != size:
+                    with open(fn, 'r+b') as f:
+                        f.truncate(size)
+        with open(os.path.join(self.path, 'labels.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.labels) + ('\n' if self.labels else ''))
+
+    def label(self, text):
+        """学生名、班级名等字符串的编号，没见过的追加一条"""
+        text = ' '.join(str(text or '').split())
+        code = self.label_codes.get(text)
+        if code is None:
+            code = self.label_codes[text] = len(self.labels)
+            self.labels.append(text)
+            self._new_labels.append(text)
+        return code
+
+    def __len__(self):
+        return self.rows['sessions'] + len(self._pending['sessions'])
+
+    def append(self, qindex, types, correct, total, missed, over, student='', group='', seed=-1, finished=None):
+        """追加一场考试，参数为各计分题的题库下标、题型名和四项计数；返回场次号"""
+        session = len(self)
+        n = len(qindex)
+        correct = np.asarray(correct)
+        total = np.asarray(total)
+        self._pending['sessions'].append((
+            self.label(student), self.label(group), -1 if seed is None else seed,
+            time.time() if finished is None else finished, n, int(correct.sum()), int(total.sum())))
+        self._pending['questions'].append({
+            'session': np.full(n, session), 'qindex': np.asarray(qindex),
+            'type': np.fromiter((TYPE_CODES.get(t, 0) for t in types), dtype=np.uint8, count=n),
+            'correct': _u2(correct), 'total': _u2(total), 'missed': _u2(missed), 'over': _u2(over),
+        })
+        self._pending_rows += n + 1
+        if self._pending_rows >= FLUSH_ROWS:
+            self.flush()
+        return session
+
+    def append_scores(self, scores, qindex, **kw):
+        """追加 grading.ExamScores；qindex 为卷面各题的题库下标，不计分的题不记"""
+        g = np.asarray(scores.graded, dtype=bool)
+        types = [t for t, ok in zip(scores.types, g) if ok]
+        return self.append(np.asarray(qindex)[g], types, scores.correct[g], scores.total[g],
+                           scores.missed[g], scores.over[g], **kw)
+
+    def flush(self):
+        """把缓冲的行写进列文件并提交"""
+        if self.readonly or not self._pending_rows and not self._new_labels:
+            return
+        added = {}
+        sessions = self._pending['sessions']
+        if sessions:
+            for k, (col, dtype) in enumerate(TABLES['sessions']):
+                with open(self._file('sessions', col), 'ab') as f:
+                    f.write(np.array([row[k] for row in sessions], dtype=dtype).tobytes())
+            added['sessions'] = len(sessions)
+        parts = self._pending['questions']
+        if parts:
+            for col, dtype in TABLES['questions']:
+                with open(self._file('questions', col), 'ab') as f:
+                    f.write(np.concatenate([part[col] for part in parts]).astype(dtype).tobytes())
+            added['questions'] = sum(len(p['qindex']) for p in parts)
+        if self._new_labels:
+            with open(os.path.join(self.path, 'labels.txt'), 'a', encoding='utf-8') as f:
+                f.write(''.join(s + '\n' for s in self._new_labels))
+        rows = {t: self.rows[t] + added.get(t, 0) for t in TABLES}
+        meta_path = os.path.join(self.path, 'meta.json')
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'version': STORE_VERSION, 'rows': rows, 'labels': len(self.labels)}, f)
+        os.replace(meta_path + '.tmp', meta_path)
+        self.rows = rows
+        self._pending = {t: [] for t in TABLES}
+        self._pending_rows = 0
+        self._new_labels = []
+
+    def _release(self):
+        if self._lock_fd is not None:
+            _unlock(self._lock_fd)
+            self._lock_fd = None
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def column(self, table, col):
+        """已提交部分的只读内存映射"""
+        dtype = dict(TABLES[table])[col]
+        n = self.rows[table]
+        if not n:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self._file(table, col), dtype=dtype, mode='r', shape=(n,))
+
+    def scan(self, table, cols=None, chunk=CHUNK_ROWS):
+        """按块产出 {列名: 数组}，只映射要用的列"""
+        cols = cols or [c for c, _ in TABLES[table]]
+        maps = {c: self.column(table, c) for c in cols}
+        for start in range(0, self.rows[table], chunk):
+            yield {c: np.asarray(m[start:start + chunk]) for c, m in maps.items()}
+
+    def group_averages(self):
+        """按班级汇总：{班级: (场次数, 平均得分率)}"""
+        n = len(self.labels)
+        count = np.zeros(n, dtype=np.int64)
+        rate = np.zeros(n)
+        for block in self.scan('sessions', ['group', 'score', 'total']):
+            ok = block['total'] > 0
+            g = block['group'][ok]
+            count += np.bincount(g, minlength=n)
+            rate += np.bincount(g, block['score'][ok] / block['total'][ok], minlength=n)
+        return {self.labels[i]: (int(count[i]), float(rate[i] / count[i])) for i in np.flatnonzero(count)}
+
+    def question_stats(self):
+        """按题库下标汇总：(作答次数, 未拿满分次数, 平均得分率) 三个数组"""
+        attempts = np.zeros(0, dtype=np.int64)
+        failed = np.zeros(0, dtype=np.int64)
+        rate = np.zeros(0)
+        for block in self.scan('questions', ['qindex', 'correct', 'total']):
+            q = block['qindex']
+            if not len(q):
+                continue
+            n = max(len(attempts), int(q.max()) + 1)
+            attempts = np.pad(attempts, (0, n - len(attempts)))
+            failed = np.pad(failed, (0, n - len(failed)))
+            rate = np.pad(rate, (0, n - len(rate)))
+            total = block['total'].astype(np.int64)
+            attempts += np.bincount(q, minlength=n)
+            failed += np.bincount(q, (block['correct'] < total).astype(np.float64), minlength=n).astype(np.int64)
+            rate += np.bincount(q, np.divide(block['correct'], total, out=np.ones(len(q)), where=total > 0),
+                                minlength=n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return attempts, failed, rate / attempts
+
+    def export_csv(self, table, f, cols=None):
+        """逐块写 CSV，学生/班级写名字，题型写题型名"""
+        cols = cols or [c for c, _ in TABLES[table]]
+        writer = csv.writer(f)
+        writer.writerow(cols)
+        labels = np.array(self.labels, dtype=object)
+        types = np.array([TYPE_NAMES.get(i, '') for i in range(256)], dtype=object)
+        for block in self.scan(table, cols):
+            out = []
+            for c in cols:
+                a = block[c]
+                if c in LABEL_COLUMNS:
+                    a = labels[a]
+                elif c == 'type':
+                    a = types[a]
+                out.append(a.tolist())
+            writer.writerows(zip(*out))
+
+    def export_npz(self, table, path, cols=None):
+        """逐块写 .npz（不压缩），np.load 读出的每个数组即一列"""
+        cols = cols or [c for c, _ in TABLES[table]]
+        n = self.rows[table]
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for c in cols:
+                m = self.column(table, c)
+                with zf.open(c + '.npy', 'w', force_zip64=True) as out:
+                    np.lib.format.write_array_header_1_0(
+                        out, {'descr': np.lib.format.dtype_to_descr(m.dtype), 'fortran_order': False, 'shape': (n,)})
+                    for start in range(0, n, CHUNK_ROWS):
+                        out.write(np.asarray(m[start:start + CHUNK_ROWS]).tobytes())
+        if cols and any(c in LABEL_COLUMNS for c in cols):
+            # 编号对应的名字另存一份，和 npz 同名加 .labels.json
+            with open(path + '.labels.json', 'w', encoding='utf-8') as f:
+                json.dump(self.labels, f, ensure_ascii=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='成绩库查询与导出')
+    parser.add_argument('store', help='成绩库目录，如 questions.json.results')
+    parser.add_argument('--table', choices=sorted(TABLES), default='sessions')
+    parser.add_argument('--columns', help='只导出这些列，逗号分隔')
+    parser.add_argument('--csv', help='导出 CSV，- 表示标准输出')
+    parser.add_argument('--npz', help='导出 NumPy .npz')
+    parser.add_argument('--groups', action='store_true', help='按班级列出平均得分率')
+    parser.add_argument('--hardest', type=int, metavar='N', help='列出得分率最低的 N 道题')
+    args = parser.parse_args(argv)
+
+    store = ResultsStore(args.store, readonly=True)
+    cols = args.columns.split(',') if args.columns else None
+    if args.csv:
+        if args.csv == '-':
+            store.export_csv(args.table, sys.stdout, cols)
+        else:
+            with open(args.csv, 'w', encoding='utf-8', newline='') as f:
+                store.export_csv(args.table, f, cols)
+    if args.npz:
+        store.export_npz(args.table, args.npz, cols)
+    if args.groups:
+        for name, (count, rate) in sorted(store.group_averages().items()):
+            print(f'{name or "（未填）"}\t{count} 场\t平均得分率 {rate:.1%}')
+    if args.hardest:
+        attempts, failed, rate = store.question_stats()
+        seen = np.flatnonzero(attempts)
+        for i in seen[np.argsort(rate[seen], kind='stable')][:args.hardest].tolist():
+            print(f'第 {i + 1} 题\t作答 {attempts[i]} 次\t未拿满分 {failed[i]} 次\t平均得分率 {rate[i]:.1%}')
+    print(f'共 {store.rows["sessions"]} 场考试，{store.rows["questions"]} 条题目成绩', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
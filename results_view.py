@@ -0,0 +1,162 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableView, QHeaderView, QAbstractItemView
+)
+from PyQt5.QtGui import QColor
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QThread, pyqtSignal
+
+import profiling
+import question_types
+from grading import grade_exam, ExamScores
+
+# 交卷批改放到后台线程分段进行，结果用 model/view 表格显示，只绘制可见行
+
+GRADE_CHUNK = 500
+
+
+class GradeWorker(QThread):
+    """分段批改整卷，每段结束发进度；requestInterruption 后在段与段之间停下"""
+
+    progress = pyqtSignal(int, int)
+    graded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, questions, answers, chunk=GRADE_CHUNK, parent=None):
+        super().__init__(parent)
+        self.questions = questions
+        self.answers = answers
+        self.chunk = chunk
+
+    @profiling.traced("GradeWorker.run")
+    def run(self):
+        n = len(self.questions)
+        parts = []
+        try:
+            for start in range(0, n, self.chunk):
+                if self.isInterruptionRequested():
+                    return
+                stop = min(n, start + self.chunk)
+                parts.append(grade_exam(self.questions, self.answers, start, stop))
+                self.progress.emit(stop, n)
+            scores = ExamScores.concat(parts) if parts else grade_exam(self.questions, self.answers)
+        except (ValueError, IndexError, TypeError, KeyError) as e:
+            # 异常漏出 QThread.run 会让 PyQt 直接终止程序；题库或作答数据坏了就报交卷失败
+            self.failed.emit(str(e))
+            return
+        if not self.isInterruptionRequested():
+            self.graded.emit(scores)
+
+
+class RemoteGradeWorker(GradeWorker):
+    """瘦客户端交卷：由考试服务批改，这里只等结果"""
+
+    def __init__(self, remote, parent=None):
+        super().__init__(remote.questions, None, parent=parent)
+        self.remote = remote
+
+    def run(self):
+        try:
+            scores = self.remote.finish()
+        except OSError as e:
+            self.failed.emit(str(e))
+            return
+        if not self.isInterruptionRequested():
+            self.progress.emit(len(scores), len(scores))
+            self.graded.emit(scores)
+
+
+class ResultsModel(QAbstractTableModel):
+    """每题一行，数据直接取自 ExamScores 的数组，不为每行生成字符串"""
+
+    HEADERS = ('题号', '题型', '得分', '满分', '漏选', '多选')
+
+    def __init__(self, scores, parent=None):
+        super().__init__(parent)
+        self.scores = scores
+        self.wrong_fg = QColor('#c0392b')
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.scores)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, col = index.row(), index.column()
+        s = self.scores
+        if role == Qt.DisplayRole:
+            if col == 0:
+                return row + 1
+            if col == 1:
+                return question_types.label(s.types[row])
+            if not s.graded[row]:
+                return '—'
+            if s.types[row] == 'single_choice' and col > 3:
+                return ''
+            return int((s.correct, s.total, s.missed, s.over)[col - 2][row])
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignCenter)
+        if role == Qt.ForegroundRole and s.graded[row] and s.correct[row] < s.total[row]:
+            return self.wrong_fg
+        return None
+
+
+class ResultsDialog(QDialog):
+    """交卷结果：总分、各题型小计和逐题表格，双击或点按钮跳到对应题目"""
+
+    jump_requested = pyqtSignal(int)
+
+    def __init__(self, scores, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("交卷结果")
+        self.resize(640, 720)
+        layout = QVBoxLayout(self)
+
+        self.total_label = QLabel(f"总分：{scores.total_score}/{scores.total_count}")
+        font = self.total_label.font()
+        font.setBold(True)
+        font.setPointSize(font.pointSize() + 2)
+        self.total_label.setFont(font)
+        layout.addWidget(self.total_label)
+        self.subtotal_label = QLabel("   ".join(
+            f"{question_types.label(t)}：{cnt}题 {score}/{total}" for t, (cnt, score, total) in scores.subtotals().items()))
+        self.subtotal_label.setWordWrap(True)
+        layout.addWidget(self.subtotal_label)
+
+        self.model = ResultsModel(scores, self)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.verticalHeader().hide()
+        # 固定行高，滚动时不需要逐行测量
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(24)
+        self.view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.view.doubleClicked.connect(lambda index: self.jump(index.row()))
+        layout.addWidget(self.view, 1)
+
+        btns = QHBoxLayout()
+        self.jump_btn = QPushButton("跳到该题")
+        self.close_btn = QPushButton("关闭")
+        btns.addStretch(1)
+        btns.addWidget(self.jump_btn)
+        btns.addWidget(self.close_btn)
+        layout.addLayout(btns)
+        self.jump_btn.clicked.connect(self.jump_selected)
+        self.close_btn.clicked.connect(self.accept)
+
+    def jump_selected(self):
+        rows = self.view.selectionModel().selectedRows()
+        if rows:
+            self.jump(rows[0].row())
+
+    def jump(self, row):
+        self.jump_requested.emit(row)
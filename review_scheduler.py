@@ -0,0 +1,190 @@
+import os
+import time
+import heapq
+import struct
+from array import array
+
+# 错题复习排程：每题记下间隔、熟练度和错次，下次出题时间放进最小堆，取下一题 O(log n)
+# 间隔按 SM-2 的做法随答对次数拉长，答错就回到几分钟后重练；交叉表/多选的漏选、多选数计入得分率
+# 只有做过的题占堆和存档，没做过的题按出题顺序依次引入；不依赖 PyQt5，题号为题库下标
+
+REVIEW_MAGIC = b'QREVIEW1\n'
+REVIEW_HEADER = struct.Struct('<II')   # 题库题数, 记录条数
+# 每条记录按列存放，读写都是整列 tobytes/frombytes
+COLUMNS = (('idx', 'I'), ('due', 'd'), ('interval', 'f'), ('ease', 'f'),
+           ('reps', 'H'), ('lapses', 'H'), ('missed', 'I'), ('over', 'I'))
+
+MINUTE = 60.0
+DAY = 86400.0
+RETRY_INTERVAL = 10 * MINUTE
+FIRST_INTERVALS = (1 * DAY, 6 * DAY)
+START_EASE = 2.5
+MIN_EASE = 1.3
+PASS_RATE = 0.6
+
+
+def answer_quality(score, total, over=0):
+    """得分率，多勾的格子再扣一次（grade_* 的 score 不扣多选），落在 0..1"""
+    if not total:
+        return 1.0
+    return max(0.0, min(1.0, (score - over) / total))
+
+
+class ReviewScheduler:
+    """order 为新题的引入顺序（题库下标序列），只有 order 里的题会被排到"""
+
+    def __init__(self, n, order=None):
+        self.n = n
+        self.order = range(n) if order is None else order
+        self.seen = bytearray(n)
+        self.active = bytearray(n) if order is not None else bytearray(b'\x01') * n
+        if order is not None:
+            for idx in order:
+                self.active[idx] = 1
+        self.due = array('d', [0.0]) * n
+        self.interval = array('f', [0.0]) * n
+        self.ease = array('f', [START_EASE]) * n
+        self.reps = array('H', [0]) * n
+        self.lapses = array('H', [0]) * n
+        self.missed = array('I', [0]) * n
+        self.over = array('I', [0]) * n
+        self.heap = []      # (到期时间, 题号)；重排后旧条目留在堆里，到期时间对不上就丢掉
+        self.seen_list = array('I')   # 做过的题，按第一次作答的先后
+        self.new_left = len(self.order)   # order 里还没做过的题数
+        self._new_pos = 0
+
+    def __len__(self):
+        return len(self.seen_list)
+
+    def _next_new(self):
+        """出题顺序里下一道没做过的题；走到末尾还有跳过的新题时从头再找一遍"""
+        order = self.order
+        for _ in range(2):
+            while self._new_pos < len(order) and self.seen[order[self._new_pos]]:
+                self._new_pos += 1
+            if self._new_pos < len(order):
+                return order[self._new_pos]
+            if not self.new_left:
+                return None
+            self._new_pos = 0
+        return None
+
+    def _top(self):
+        heap = self.heap
+        while heap and heap[0][0] != self.due[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def next(self, now=None):
+        """下一道该做的题：先出已到期的复习题，其次新题，都没有时出最早到期的"""
+        now = time.time() if now is None else now
+        top = self._top()
+        if top is not None and top[0] <= now:
+            return top[1]
+        new = self._next_new()
+        if new is not None:
+            return new
+        return top[1] if top is not None else None
+
+    def skip(self, idx, now=None):
+        """不作答跳过：新题排到其余新题之后，复习题推迟 RETRY_INTERVAL，间隔和熟练度不变"""
+        if not self.seen[idx]:
+            if self._new_pos < len(self.order) and self.order[self._new_pos] == idx:
+                self._new_pos += 1
+            return
+        now = time.time() if now is None else now
+        self._push(idx, now + RETRY_INTERVAL)
+
+    def due_count(self, now=None):
+        now = time.time() if now is None else now
+        return sum(1 for d, idx in self.heap if d <= now and d == self.due[idx])
+
+    def record(self, idx, score, total, missed=0, over=0, now=None):
+        """记一次作答结果，返回下次到期时间"""
+        now = time.time() if now is None else now
+        quality = answer_quality(score, total, over)
+        if not self.seen[idx]:
+            self.seen[idx] = 1
+            self.seen_list.append(idx)
+            self.new_left -= self.active[idx]
+        self.missed[idx] += missed
+        self.over[idx] += over
+        # SM-2：熟练度按 0..5 分调整，答对时间隔依次为 1 天、6 天、上次间隔 × 熟练度
+        grade = quality * 5
+        self.ease[idx] = max(MIN_EASE, self.ease[idx] + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+        if quality >= PASS_RATE:
+            reps = self.reps[idx]
+            if reps < len(FIRST_INTERVALS):
+                interval = FIRST_INTERVALS[reps]
+            else:
+                interval = self.interval[idx] * self.ease[idx]
+            self.reps[idx] = min(reps + 1, 0xFFFF)
+        else:
+            interval = RETRY_INTERVAL
+            self.reps[idx] = 0
+            self.lapses[idx] = min(self.lapses[idx] + 1, 0xFFFF)
+        self.interval[idx] = interval
+        return self._push(idx, now + interval)
+
+    def _push(self, idx, due):
+        self.due[idx] = due
+        if self.active[idx]:
+            heapq.heappush(self.heap, (due, idx))
+            # 过期条目太多时按现有到期时间重建一次，堆大小保持在做过题数的常数倍
+            if len(self.heap) > 2 * len(self.seen_list) + 64:
+                self._rebuild()
+        return due
+
+    def _rebuild(self):
+        self.heap = [(self.due[idx], idx) for idx in self.seen_list if self.active[idx]]
+        heapq.heapify(self.heap)
+
+    def to_bytes(self):
+        seen = self.seen_list
+        parts = [REVIEW_MAGIC, REVIEW_HEADER.pack(self.n, len(seen))]
+        for name, code in COLUMNS:
+            if name == 'idx':
+                parts.append(seen.tobytes())
+            else:
+                col = getattr(self, name)
+                parts.append(array(code, (col[idx] for idx in seen)).tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data, n, order=None):
+        if not data.startswith(REVIEW_MAGIC):
+            raise ValueError('not a review state file')
+        saved_n, count = REVIEW_HEADER.unpack_from(data, len(REVIEW_MAGIC))
+        if saved_n != n:
+            raise ValueError(f'复习记录对应 {saved_n} 题的题库，当前题库为 {n} 题')
+        self = cls(n, order)
+        pos = len(REVIEW_MAGIC) + REVIEW_HEADER.size
+        cols = {}
+        for name, code in COLUMNS:
+            col = array(code)
+            size = col.itemsize * count
+            col.frombytes(data[pos:pos + size])
+            pos += size
+            cols[name] = col
+        for j, idx in enumerate(cols['idx']):
+            self.seen[idx] = 1
+            for name, _ in COLUMNS[1:]:
+                getattr(self, name)[idx] = cols[name][j]
+        self.seen_list = cols['idx']
+        self.new_left -= sum(self.active[idx] for idx in self.seen_list)
+        self._rebuild()
+        return self
+
+    def save(self, path):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(self.to_bytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, n, order=None):
+        """读取复习记录；没有文件时从头开始，题库题数对不上时报 ValueError"""
+        if not os.path.exists(path):
+            return cls(n, order)
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read(), n, order)
@@ -0,0 +1,361 @@
+import os
+import re
+import math
+import atexit
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QRectF, QUrl, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QAbstractTextDocumentLayout, QFont, QImage, QImageReader, QPainter, QPalette, QTextDocument
+from PyQt5.QtWidgets import QApplication, QSizePolicy, QWidget
+
+import profiling
+from compiled_bank import content_hash
+
+# 富文本题面：题目带 "format": "markdown" 时，question 和 options 按 Markdown 显示（代码块、表格等用 Qt 自带的解析），
+# 另外支持 ![](图片路径) 插图和 $公式$ / $$公式$$（\$ 为美元符号本身）
+# 解析、插图解码、公式渲染和排版都比较慢，结果按内容哈希缓存成排好版的 QTextDocument，
+# 插图和公式渲染成 QImage 另外缓存，两者都按最近最少使用淘汰；换题时在线程池里提前准备前后几题
+# 后台线程只解析 Markdown、解码插图；排版和公式渲染要用字体引擎，字体引擎按线程缓存，都留在 GUI 线程做
+
+RICH_FORMAT = 'markdown'
+DOC_MARGIN = 2
+
+_FORMULA_RE = re.compile(r'(?<!\\)\$\$(.+?)(?<!\\)\$\$|(?<!\\)\$(.+?)(?<!\\)\$', re.S)
+_IMAGE_RE = re.compile(r'!\[([^\]]*)\]\(([^)\s]+)\)')
+
+# 公式里常用的 TeX 命令换成 Unicode，上下标、分式、根号换成 HTML，够显示一般的题目
+_TEX_SYMBOLS = {
+    'alpha': 'α', 'beta': 'β', 'gamma': 'γ', 'delta': 'δ', 'epsilon': 'ε', 'theta': 'θ', 'lambda': 'λ',
+    'mu': 'μ', 'pi': 'π', 'rho': 'ρ', 'sigma': 'σ', 'tau': 'τ', 'phi': 'φ', 'omega': 'ω',
+    'Delta': 'Δ', 'Sigma': 'Σ', 'Omega': 'Ω', 'Pi': 'Π',
+    'times': '×', 'cdot': '·', 'div': '÷', 'pm': '±', 'le': '≤', 'leq': '≤', 'ge': '≥', 'geq': '≥',
+    'ne': '≠', 'neq': '≠', 'approx': '≈', 'infty': '∞', 'to': '→', 'rightarrow': '→', 'in': '∈',
+    'sum': '∑', 'prod': '∏', 'int': '∫', 'partial': '∂', 'angle': '∠', 'circ': '°', 'perp': '⊥',
+    'parallel': '∥', 'triangle': '△', ',': ' ', ';': ' ', 'quad': '  ', '{': '{', '}': '}', '%': '%',
+}
+_TEX_TOKEN_RE = re.compile(r'\\([A-Za-z]+|.)|([_^])|(\{)|(\})|([<>&])|([^\\_^{}<>&]+)')
+
+
+def is_rich(q):
+    return q.get('format') == RICH_FORMAT
+
+
+def _tex_group(tokens, pos):
+    """从 pos 取一个参数（{...} 或单个记号），返回 (HTML, 新位置)"""
+    if pos >= len(tokens):
+        return '', pos
+    if tokens[pos] == '{':
+        depth, end = 1, pos + 1
+        while end < len(tokens) and depth:
+            depth += {'{': 1, '}': -1}.get(tokens[end], 0)
+            end += 1
+        return _tex_html(tokens[pos + 1:end - 1]), end
+    return _tex_html(tokens[pos:pos + 1]), pos + 1
+
+
+def _tex_html(tokens):
+    out, pos = [], 0
+    while pos < len(tokens):
+        tok = tokens[pos]
+        pos += 1
+        if tok in ('^', '_'):
+            arg, pos = _tex_group(tokens, pos)
+            tag = 'sup' if tok == '^' else 'sub'
+            out.append(f'<{tag}>{arg}</{tag}>')
+        elif tok == '\\frac':
+            num, pos = _tex_group(tokens, pos)
+            den, pos = _tex_group(tokens, pos)
+            out.append(f'<sup>{num}</sup>⁄<sub>{den}</sub>')
+        elif tok == '\\sqrt':
+            arg, pos = _tex_group(tokens, pos)
+            out.append(f'√<span style="text-decoration: overline">{arg}</span>')
+        elif tok.startswith('\\'):
+            out.append(_TEX_SYMBOLS.get(tok[1:], tok[1:]))
+        elif tok in ('{', '}'):
+            continue
+        else:
+            out.append(tok)
+    return ''.join(out)
+
+
+def tex_to_html(tex):
+    tokens = []
+    for m in _TEX_TOKEN_RE.finditer(tex):
+        cmd, script, lb, rb, special, text = m.groups()
+        if cmd is not None:
+            tokens.append('\\' + cmd)
+        elif text is not None:
+            # 字母按变量排成斜体，数字和其他符号保持正体
+            tokens.extend(f'<i>{t}</i>' if t[0].isascii() and t[0].isalpha() else t
+                          for t in re.findall(r'[A-Za-z]+|\d+|\s+|.', text))
+        else:
+            tokens.append(script or lb or rb or {'<': '&lt;', '>': '&gt;', '&': '&amp;'}[special])
+    return _tex_html(tokens)
+
+
+def render_formula(tex, font, display=False):
+    """公式渲染成透明底的 QImage；要用字体排版，只在 GUI 线程调用"""
+    doc = QTextDocument()
+    doc.setDocumentMargin(0)
+    f = QFont(font)
+    f.setFamily('serif')
+    if display and f.pointSizeF() > 0:
+        f.setPointSizeF(f.pointSizeF() * 1.2)
+    doc.setDefaultFont(f)
+    doc.setHtml(tex_to_html(tex))
+    size = doc.size().toSize()
+    image = QImage(max(1, size.width()), max(1, size.height()), QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    doc.drawContents(painter)
+    painter.end()
+    return image
+
+
+def load_image(path, max_width):
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and max_width and size.width() > max_width:
+        reader.setScaledSize(size.scaled(QSize(max_width, size.height()), Qt.KeepAspectRatio))
+    return reader.read()
+
+
+class ImageCache:
+    """插图和公式的 QImage，按估算字节数做 LRU；后台线程和 GUI 线程都会用，读写加锁"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.images = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, make):
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+                return image
+        image = make()
+        with self.lock:
+            if key not in self.images:
+                self.images[key] = image
+                self.nbytes += image.sizeInBytes()
+                while self.nbytes > self.max_bytes and len(self.images) > 1:
+                    _, old = self.images.popitem(last=False)
+                    self.nbytes -= old.sizeInBytes()
+        return image
+
+
+def add_formulas(doc, formulas, font, images):
+    """把 build_document 留下的公式渲染好加进文档，在 GUI 线程调用"""
+    for url, digest, tex, display in formulas:
+        image = images.get(('formula', digest, font.key()), lambda: render_formula(tex, font, display))
+        doc.addResource(QTextDocument.ImageResource, QUrl(url), image)
+
+
+def build_document(text, font, width, images, layout=True, formulas=None):
+    """解析 Markdown、准备插图和公式并按 width 排版；不碰 QPixmap 和控件。
+    后台线程调用时 layout=False 并传入列表 formulas：公式不渲染，(url, 哈希, tex, 是否独占一行) 记进列表，
+    由 GUI 线程用 add_formulas 补上，排版也留到 GUI 线程第一次用时再做"""
+    doc = QTextDocument()
+    doc.setDocumentMargin(DOC_MARGIN)
+    doc.setDefaultFont(font)
+    max_width = max(1, int(width) - 2 * DOC_MARGIN)
+    font_key = font.key()
+    resources = {}
+
+    def formula(m):
+        display = m.group(1) is not None
+        tex = m.group(1) if display else m.group(2)
+        digest = content_hash(f'{display}\0{tex}'.encode()).hex()
+        url = f'formula:{digest}'
+        if formulas is None:
+            resources[url] = images.get(('formula', digest, font_key), lambda: render_formula(tex, font, display))
+        else:
+            formulas.append((url, digest, tex, display))
+        alt = re.sub(r'[\[\]\n]', ' ', tex).strip() or 'formula'
+        return f'\n\n![{alt}]({url})\n\n' if display else f'![{alt}]({url})'
+
+    def image(m):
+        alt, path = m.groups()
+        if not path.startswith('formula:'):
+            image = images.get(('image', path, max_width), lambda: load_image(path, max_width))
+            if not image.isNull():
+                resources[path] = image
+        # Qt 5.15 的 Markdown 解析会丢掉替代文字为空的图片
+        return m.group(0) if alt.strip() else f'![{os.path.basename(path) or path}]({path})'
+
+    source = _IMAGE_RE.sub(image, _FORMULA_RE.sub(formula, text).replace('\\$', '$'))
+    doc.setMarkdown(source)
+    # setMarkdown 会清掉文档里的资源，解析完再加
+    for url, image in resources.items():
+        doc.addResource(QTextDocument.ImageResource, QUrl(url), image)
+    if layout:
+        doc.setTextWidth(width)
+        doc.size()  # 触发排版
+    return doc
+
+
+class _Signals(QObject):
+    done = pyqtSignal(object, object, object, object)
+
+
+class _BuildTask(QRunnable):
+    def __init__(self, key, text, font, width, cache):
+        super().__init__()
+        self.key = key
+        self.text = text
+        self.font = font
+        self.width = width
+        self.cache = cache
+
+    def run(self):
+        formulas = []
+        doc = build_document(self.text, self.font, self.width, self.cache.images, layout=False, formulas=formulas)
+        # 之后由 GUI 线程补上公式、使用和销毁
+        doc.moveToThread(self.cache.thread())
+        self.cache.signals.done.emit(self.key, doc, self.font, formulas)
+
+
+class RichTextCache(QObject):
+    """排好版的 QTextDocument，按 (内容哈希, 字体) 做 LRU；宽度不同时只重新排版，不重新解析"""
+
+    ready = pyqtSignal(object)
+
+    def __init__(self, size=256, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.docs = OrderedDict()
+        self.pending = set()
+        self.images = ImageCache()
+        self.pool = QThreadPool(self)
+        # 一个后台线程就够，多了只会和 GUI 线程抢 GIL
+        self.pool.setMaxThreadCount(1)
+        self.signals = _Signals(self)
+        self.signals.done.connect(self._on_done)
+
+    @staticmethod
+    def key(text, font):
+        return content_hash(text.encode()), font.key()
+
+    @profiling.traced("RichTextCache.document")
+    def document(self, text, font, width):
+        key = self.key(text, font)
+        doc = self.docs.get(key)
+        if doc is None:
+            doc = build_document(text, font, width, self.images)
+            self._put(key, doc)
+        else:
+            self.docs.move_to_end(key)
+            if doc.textWidth() != width:
+                doc.setTextWidth(width)
+        return doc
+
+    def warm(self, texts, font, width):
+        """在后台线程准备还没缓存的文档"""
+        for text in texts:
+            key = self.key(text, font)
+            if key in self.docs or key in self.pending:
+                continue
+            self.pending.add(key)
+            self.pool.start(_BuildTask(key, text, font, width, self))
+
+    def _on_done(self, key, doc, font, formulas):
+        self.pending.discard(key)
+        if key in self.docs:
+            doc.deleteLater()
+            return
+        add_formulas(doc, formulas, font, self.images)
+        self._put(key, doc)
+        self.ready.emit(key)
+
+    def _put(self, key, doc):
+        self.docs[key] = doc
+        while len(self.docs) > self.size:
+            _, old = self.docs.popitem(last=False)
+            old.deleteLater()
+
+    def stop(self):
+        """丢掉排队的预排版并等正在做的做完；后台线程不能活过解释器退出"""
+        try:
+            self.pool.clear()
+            self.pool.waitForDone()
+        except RuntimeError:
+            pass  # QApplication 已经销毁，线程池随它一起停了
+
+    def clear(self):
+        self.pool.waitForDone()
+        for doc in self.docs.values():
+            doc.deleteLater()
+        self.docs.clear()
+
+
+_cache = None
+
+
+def rich_cache():
+    global _cache
+    if _cache is None:
+        app = QApplication.instance()
+        _cache = RichTextCache(parent=app)
+        app.aboutToQuit.connect(_cache.stop)
+        atexit.register(_cache.stop)
+    return _cache
+
+
+class RichTextView(QWidget):
+    """显示缓存里的富文本文档，高度随宽度变化；点击发 clicked（选项文字点了也算选中）"""
+
+    clicked = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        profiling.track_widget(self)
+        self.text = ''
+        policy = QSizePolicy(QSizePolicy.Preferred, QSizePolicy.Minimum)
+        policy.setHeightForWidth(True)
+        self.setSizePolicy(policy)
+
+    def set_text(self, text):
+        if text == self.text:
+            return
+        self.text = text
+        self.updateGeometry()
+        self.update()
+
+    def _document(self, width):
+        return rich_cache().document(self.text, self.font(), max(1, width))
+
+    def hasHeightForWidth(self):
+        return True
+
+    def heightForWidth(self, width):
+        return math.ceil(self._document(width).size().height())
+
+    def sizeHint(self):
+        width = self.width() if self.width() > 1 else 400
+        return QSize(width, self.heightForWidth(width))
+
+    def minimumSizeHint(self):
+        return QSize(0, 0)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if event.oldSize().width() != event.size().width():
+            self.updateGeometry()
+
+    def paintEvent(self, event):
+        # 文字颜色跟随控件调色板，样式表里的 color（如答案高亮）才能生效
+        ctx = QAbstractTextDocumentLayout.PaintContext()
+        ctx.palette.setColor(QPalette.Text, self.palette().color(QPalette.WindowText))
+        ctx.clip = QRectF(event.rect())
+        painter = QPainter(self)
+        painter.setClipRect(event.rect())
+        self._document(self.width()).documentLayout().draw(painter, ctx)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.clicked.emit()
+        super().mousePressEvent(event)
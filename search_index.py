@@ -0,0 +1,127 @@
+import re
+import time
+import threading
+from array import array
+
+import numpy as np
+
+# 题目全文检索：倒排索引，键为英文/数字单词、中文等文字的单字和二字组，值为题号数组（升序）
+# 查询按空白分词，每个词都要出现；英文词按子串匹配单词表，中文词单字查单字表，多字拆成二字组后取交集
+# 索引在后台线程里逐题追加，建到一半也可以查询（只覆盖已建的部分）；不依赖 PyQt5
+
+_WORD_RE = re.compile(r'[0-9a-z_]+')
+_TEXT_RE = re.compile(r'[^\W0-9a-z_]+')
+
+
+def question_text(q):
+    """参与检索的字段：题干、选项、行名、列名"""
+    parts = [q.get('question') or '']
+    parts += q.get('options') or []
+    parts += q.get('row_names') or []
+    for group in q.get('col_names') or []:
+        parts += group.get('items') or []
+    return '\n'.join(str(p) for p in parts).lower()
+
+
+def _grams(run):
+    return (run[i:i + 2] for i in range(len(run) - 1))
+
+
+def tokenize(text):
+    """返回 (单词集合, 单字集合, 二字组集合)"""
+    words = set(_WORD_RE.findall(text))
+    chars = set()
+    grams = set()
+    for run in _TEXT_RE.findall(text):
+        chars.update(run)
+        grams.update(_grams(run))
+    return words, chars, grams
+
+
+class SearchIndex:
+    def __init__(self, questions):
+        self.questions = questions
+        self.words = {}
+        self.chars = {}
+        self.grams = {}
+        self.built = 0
+        self._lock = threading.Lock()
+        self._stop = False
+        self._thread = None
+
+    def __len__(self):
+        return len(self.questions)
+
+    @property
+    def complete(self):
+        return self.built >= len(self.questions)
+
+    def add(self, idx, q):
+        words, chars, grams = tokenize(question_text(q))
+        with self._lock:
+            for table, tokens in ((self.words, words), (self.chars, chars), (self.grams, grams)):
+                for tok in tokens:
+                    posting = table.get(tok)
+                    if posting is None:
+                        posting = table[tok] = array('I')
+                    posting.append(idx)
+            self.built = idx + 1
+
+    def build(self, start=0, stop=None):
+        stop = len(self.questions) if stop is None else stop
+        for idx in range(start, stop):
+            if self._stop:
+                return
+            self.add(idx, self.questions[idx])
+            # 每题之后主动让出 GIL，界面线程不用等满切换间隔
+            time.sleep(0)
+
+    def start(self):
+        """后台线程建索引"""
+        self._thread = threading.Thread(target=self.build, args=(self.built,), name='search-index', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop = True
+        if self._thread is not None:
+            self._thread.join()
+
+    def _postings(self, table, key):
+        posting = table.get(key)
+        return np.frombuffer(posting, dtype=np.uint32) if posting else np.zeros(0, dtype=np.uint32)
+
+    def _union(self, table, match):
+        parts = [np.frombuffer(p, dtype=np.uint32) for k, p in table.items() if match(k) and p]
+        if not parts:
+            return np.zeros(0, dtype=np.uint32)
+        return parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+    def _term(self, term):
+        sets = []
+        for word in _WORD_RE.findall(term):
+            sets.append(self._union(self.words, lambda k: word in k))
+        for run in _TEXT_RE.findall(term):
+            if len(run) == 1:
+                sets.append(self._postings(self.chars, run))
+            else:
+                sets.extend(self._postings(self.grams, g) for g in _grams(run))
+        return sets
+
+    def search(self, query, limit=None):
+        """返回命中题号（升序 numpy 数组）；空查询返回 None"""
+        terms = query.lower().split()
+        if not terms:
+            return None
+        with self._lock:
+            sets = [s for term in terms for s in self._term(term)]
+            # 拷贝出来再释放锁，后台线程还会继续往 posting 里追加
+            sets = [s.copy() for s in sets]
+        if not sets:
+            return np.zeros(0, dtype=np.uint32)
+        sets.sort(key=len)
+        hits = sets[0]
+        for s in sets[1:]:
+            if not len(hits):
+                break
+            hits = np.intersect1d(hits, s, assume_unique=True)
+        return hits[:limit] if limit else hits
@@ -0,0 +1,327 @@
+import os
+import struct
+import threading
+from array import array
+
+# 考试会话的崩溃保护：<path>.snap 为快照（题目顺序 + 卷子种子 + 作答原始数据 + 各题停留时间 + 已公开答案的题），
+# <path> 为快照之后的增量日志
+# 日志只追加定长二进制记录，后台线程按批写盘并 fsync；记录数过多时生成新快照并重开日志
+
+SNAP_MAGIC = b'QSNAP4\n'
+SNAP_MAGIC_V3 = b'QSNAP3\n'               # 没有已公开答案的题
+SNAP_MAGIC_V2 = b'QSNAP2\n'               # 没有停留时间
+SNAP_MAGIC_V1 = b'QSNAP1\n'               # 也没有卷子种子
+JOURNAL_MAGIC = b'QJRN1\n'
+SNAP_HEADER = struct.Struct('<IIIBQQ')   # 代号, 当前题, 题数, 是否已交卷, 作答数据长度, 卷子种子
+SNAP_HEADER_V1 = struct.Struct('<IIIBQ')
+JOURNAL_HEADER = struct.Struct('<I')     # 代号，与快照一致才回放
+
+R_BIT = 1      # 交叉表格子 / 多选选项
+R_SINGLE = 2   # 单选
+R_CUR = 3      # 当前题号
+R_FINISH = 4   # 已交卷
+R_REGION = 5   # 整题原始数据（后接 N 字节）
+R_DWELL = 6    # 某题累计停留毫秒数
+R_REVEAL = 7   # 某题已单题提交、答案已公开，之后不能再改
+
+RECORDS = {
+    R_BIT: struct.Struct('<BIIB'),
+    R_SINGLE: struct.Struct('<BIi'),
+    R_CUR: struct.Struct('<BI'),
+    R_FINISH: struct.Struct('<B'),
+    R_REGION: struct.Struct('<BIH'),
+    R_DWELL: struct.Struct('<BII'),
+    R_REVEAL: struct.Struct('<BI'),
+}
+
+
+def iter_records(buf):
+    """逐条解出 (类型, 字段, 附带数据)，遇到未知记录或写了一半的尾部就停"""
+    pos = 0
+    while pos < len(buf):
+        kind = buf[pos]
+        rec = RECORDS.get(kind)
+        if rec is None or pos + rec.size > len(buf):
+            return
+        fields = rec.unpack_from(buf, pos)
+        pos += rec.size
+        payload = b''
+        if kind == R_REGION:
+            size = fields[2]
+            if pos + size > len(buf):
+                return
+            payload = buf[pos:pos + size]
+            pos += size
+        yield kind, fields, payload
+
+
+class RevealedError(ValueError):
+    pass
+
+
+def check_records(store, buf, revealed=None):
+    """回放别处发来的记录前整批检查：题号、位、选项或数据长度越界抛 IndexError / ValueError，
+    改到 revealed 里已公开答案的题抛 RevealedError；检查通过再回放，出错时整批都不生效"""
+    n = len(store)
+    for kind, fields, payload in iter_records(buf):
+        if kind == R_FINISH:
+            continue
+        idx = fields[1]
+        if not 0 <= idx < n:
+            raise IndexError(f'question {idx} out of range')
+        if kind == R_BIT:
+            store.check_bit(idx, fields[2])
+        elif kind == R_SINGLE:
+            store.check_single(idx, fields[2])
+        elif kind == R_REGION:
+            store.check_region(idx, len(payload))
+        else:
+            continue
+        if revealed is not None and revealed[idx]:
+            raise RevealedError(f'question {idx} has been committed, answer is revealed')
+
+
+class SessionState:
+    def __init__(self, order, cur_idx=0, finished=False, offsets=None, widths=None, arena=b'', gen=0, seed=None,
+                 dwell=None, revealed=None):
+        self.order = order
+        self.seed = seed
+        self.dwell = dwell
+        self.revealed = revealed
+        self.gen = gen
+        self.cur_idx = cur_idx
+        self.finished = finished
+        self.offsets = offsets
+        self.widths = widths
+        self.arena = arena
+        self.records = b''
+
+    def apply(self, store, notify=False):
+        """把快照和日志回放到 AnswerStore 上，返回回放的记录数；notify 为 True 时改动照常通知 store.observer。
+        停留时间记进 self.dwell（为 None 时不记），notify 时也转给 observer.set_dwell；已公开答案的题记进 self.revealed"""
+        if self.offsets is not None:
+            store.restore(self.offsets, self.widths, self.arena)
+        count = 0
+        observer = store.observer
+        if not notify:
+            store.observer = None
+        try:
+            for kind, fields, payload in iter_records(self.records):
+                if kind == R_BIT:
+                    store.set_bit(fields[1], fields[2], fields[3])
+                elif kind == R_SINGLE:
+                    store.set_single(fields[1], fields[2])
+                elif kind == R_CUR:
+                    self.cur_idx = fields[1]
+                elif kind == R_FINISH:
+                    self.finished = True
+                elif kind == R_REGION:
+                    store.load(fields[1], payload)
+                elif kind == R_DWELL:
+                    if self.dwell is not None:
+                        self.dwell[fields[1]] = fields[2]
+                    if observer is not None and notify:
+                        observer.set_dwell(fields[1], fields[2])
+                elif kind == R_REVEAL:
+                    if self.revealed is not None:
+                        self.revealed[fields[1]] = 1
+                count += 1
+        finally:
+            store.observer = observer
+        return count
+
+
+def _fsync_replace(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+
+
+def _fsync_dir(path):
+    """改名记在目录里，目录也要 fsync，否则刚压缩完就掉电可能丢掉这次改名（只有 POSIX 能打开目录）"""
+    if os.name != 'posix':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def load_session(path):
+    """读取快照和日志，没有会话时返回 None"""
+    snap_path = path + '.snap'
+    if not os.path.exists(snap_path):
+        return None
+    with open(snap_path, 'rb') as f:
+        data = f.read()
+    version = (4 if data.startswith(SNAP_MAGIC) else 3 if data.startswith(SNAP_MAGIC_V3)
+               else 2 if data.startswith(SNAP_MAGIC_V2) else 1)
+    if version >= 2:
+        pos = len(SNAP_MAGIC)
+        gen, cur_idx, n, finished, arena_len, seed = SNAP_HEADER.unpack_from(data, pos)
+        pos += SNAP_HEADER.size
+    elif data.startswith(SNAP_MAGIC_V1):
+        pos = len(SNAP_MAGIC_V1)
+        gen, cur_idx, n, finished, arena_len = SNAP_HEADER_V1.unpack_from(data, pos)
+        pos += SNAP_HEADER_V1.size
+        seed = None
+    else:
+        return None
+    order = array('I')
+    order.frombytes(data[pos:pos + 4 * n])
+    pos += 4 * n
+    offsets = array('q')
+    offsets.frombytes(data[pos:pos + 8 * n])
+    pos += 8 * n
+    widths = array('I')
+    widths.frombytes(data[pos:pos + 4 * n])
+    pos += 4 * n
+    dwell = array('I')
+    if version >= 3:
+        dwell.frombytes(data[pos:pos + 4 * n])
+        pos += 4 * n
+    else:
+        dwell = array('I', [0]) * n
+    if version >= 4:
+        revealed = bytearray(data[pos:pos + n])
+        pos += n
+    else:
+        revealed = bytearray(n)
+    state = SessionState(order, cur_idx, bool(finished), offsets, widths, data[pos:pos + arena_len], gen, seed,
+                         dwell, revealed)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            journal = f.read()
+        head = len(JOURNAL_MAGIC)
+        if journal.startswith(JOURNAL_MAGIC) and JOURNAL_HEADER.unpack_from(journal, head)[0] == gen:
+            state.records = journal[head + JOURNAL_HEADER.size:]
+    return state
+
+
+class SessionJournal:
+    """作为 AnswerStore.observer 使用；改动先进内存缓冲，由后台线程成批写盘"""
+
+    def __init__(self, path, store, order, cur_idx=0, gen=0, flush_interval=0.2, compact_every=50000, seed=0,
+                 dwell=None, revealed=None):
+        self.path = path
+        self.store = store
+        self.order = array('I', order)
+        self.seed = seed
+        self.dwell = array('I', dwell) if dwell is not None else array('I', [0]) * len(self.order)
+        self.revealed = bytearray(revealed) if revealed is not None else bytearray(len(self.order))
+        self.cur_idx = cur_idx
+        self.finished = False
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self._gen = gen
+        self._buf = bytearray()
+        self._pre = b''
+        self._pending = None
+        self._count = 0
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        # 启动时先写一份快照，之前的日志并入快照
+        self._gen += 1
+        self._write_snapshot(self._gen, store.snapshot(), cur_idx, self.dwell.tobytes(), bytes(self.revealed))
+        self._fh = self._open_journal(self._gen)
+        store.observer = self
+        self._thread = threading.Thread(target=self._run, name='session-journal', daemon=True)
+        self._thread.start()
+
+    def _open_journal(self, gen):
+        _fsync_replace(self.path, JOURNAL_MAGIC + JOURNAL_HEADER.pack(gen))
+        return open(self.path, 'ab')
+
+    def _write_snapshot(self, gen, snap, cur_idx, dwell, revealed):
+        n = len(self.order)
+        parts = [SNAP_MAGIC, SNAP_HEADER.pack(gen, cur_idx, n, self.finished, len(snap.arena), self.seed),
+                 self.order.tobytes(), snap.offsets.tobytes(), snap.widths.tobytes(), dwell, revealed, snap.arena]
+        _fsync_replace(self.path + '.snap', b''.join(parts))
+
+    def _append(self, data):
+        with self._lock:
+            self._buf += data
+            self._count += 1
+            if self._count >= self.compact_every and self._pending is None:
+                # 快照在调用线程上取（只是拷贝一段内存），写盘交给后台线程
+                self._pending = (self.store.snapshot(), self.cur_idx, self.dwell.tobytes(), bytes(self.revealed))
+                self._pre = bytes(self._buf)
+                self._buf.clear()
+                self._count = 0
+                self._wake.set()
+
+    # AnswerStore 监听接口
+    def bit_changed(self, idx, bit, value):
+        self._append(RECORDS[R_BIT].pack(R_BIT, idx, bit, 1 if value else 0))
+
+    def single_changed(self, idx, option):
+        self._append(RECORDS[R_SINGLE].pack(R_SINGLE, idx, -1 if option is None else option))
+
+    def region_changed(self, idx, data):
+        self._append(RECORDS[R_REGION].pack(R_REGION, idx, len(data)) + bytes(data))
+
+    def set_cur(self, idx):
+        self.cur_idx = idx
+        self._append(RECORDS[R_CUR].pack(R_CUR, idx))
+
+    def set_dwell(self, idx, ms):
+        self.dwell[idx] = ms
+        self._append(RECORDS[R_DWELL].pack(R_DWELL, idx, ms))
+
+    def reveal(self, idx):
+        if not self.revealed[idx]:
+            self.revealed[idx] = 1
+            self._append(RECORDS[R_REVEAL].pack(R_REVEAL, idx))
+
+    def finish(self):
+        self.finished = True
+        self._append(RECORDS[R_FINISH].pack(R_FINISH))
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._io_lock:
+            self._flush()
+
+    def _flush(self):
+        with self._lock:
+            pre, pending = self._pre, self._pending
+            data = bytes(self._buf)
+            self._buf.clear()
+            self._pre, self._pending = b'', None
+        if pre:
+            self._fh.write(pre)
+        if pending is not None:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self._fh.close()
+            self._gen += 1
+            self._write_snapshot(self._gen, *pending)
+            self._fh = self._open_journal(self._gen)
+        if data:
+            self._fh.write(data)
+        if data or pre:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self._fh.close()
+        if self.store.observer is self:
+            self.store.observer = None
@@ -1,22 +1,61 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QRadioButton, QButtonGroup
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QRadioButton, QButtonGroup
+
+import profiling
+from app_style import install_style, set_flag
+from rich_text import RichTextView, is_rich
 
 class SingleChoiceWidget(QWidget):
-    def __init__(self, qobj, answer_data, show_answer, save_callback):
+    @profiling.traced("SingleChoiceWidget.__init__")
+    def __init__(self, qobj, answer_data, show_answer, save_callback, plan=None):
         super().__init__()
-        self.qobj = qobj
+        profiling.track_widget(self)
+        install_style()
         self.save_callback = save_callback
-        layout = QVBoxLayout()
-        self.setLayout(layout)
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
         self.options = []
+        self.option_views = []   # 富文本选项的文字，按钮本身不带字
         self.bg = QButtonGroup(self)
         self.bg.setExclusive(True)
-        for idx, opt in enumerate(qobj["options"]):
-            rb = QRadioButton(opt)
-            rb.setChecked(answer_data == idx)
-            rb.setEnabled(not show_answer)
-            rb.toggled.connect(self.save_callback)
+        self.bind(qobj, answer_data, show_answer, plan)
+
+    @profiling.traced("SingleChoiceWidget.bind")
+    def bind(self, qobj, answer_data, show_answer, plan=None):
+        """换题时复用已有的单选按钮，不够再补，多余的隐藏"""
+        self.qobj = qobj
+        rich = is_rich(qobj)
+        for idx in range(len(self.options), len(qobj["options"])):
+            rb = profiling.track_widget(QRadioButton())
+            rb.toggled.connect(lambda checked, i=idx: checked and self.save_callback(i))
             self.bg.addButton(rb, idx)
+            view = RichTextView()
+            view.setObjectName("richOption")
+            view.clicked.connect(rb.click)
+            view.hide()
+            row = QHBoxLayout()
+            row.addWidget(rb)
+            row.addWidget(view, 1)
             self.options.append(rb)
-            layout.addWidget(rb)
-        if show_answer and answer_data != qobj["answer"]:
-            self.options[qobj["answer"]].setStyleSheet("color: green; font-weight: bold;")
+            self.option_views.append(view)
+            self.layout.addLayout(row)
+        # 取消互斥才能把所有按钮清空
+        self.bg.setExclusive(False)
+        for idx, (rb, view) in enumerate(zip(self.options, self.option_views)):
+            rb.blockSignals(True)
+            if idx < len(qobj["options"]):
+                correct = show_answer and answer_data != qobj["answer"] and idx == qobj["answer"]
+                rb.setText("" if rich else qobj["options"][idx])
+                rb.setChecked(answer_data == idx)
+                rb.setEnabled(not show_answer)
+                set_flag(rb, "correct", correct)
+                rb.show()
+                if rich:
+                    view.set_text(qobj["options"][idx])
+                    set_flag(view, "correct", correct)
+                view.setVisible(rich)
+            else:
+                rb.setChecked(False)
+                rb.hide()
+                view.hide()
+            rb.blockSignals(False)
+        self.bg.setExclusive(True)
@@ -0,0 +1,46 @@
+from collections import OrderedDict
+
+from PyQt5.QtGui import QFontMetrics
+
+# 文字像素宽度缓存：按 (字体, 文字) 记住测量结果，同一字体只建一个 QFontMetrics
+# 交叉表的行名、列名在不同题目里大量重复，换题、重建表格时不用再逐个测量；只在 GUI 线程使用
+
+
+class TextWidthCache:
+    def __init__(self, size=8192):
+        self.size = size
+        self.widths = OrderedDict()
+        self.metrics = {}
+
+    def width(self, text, font):
+        text = str(text)
+        font_key = font.key()
+        key = (font_key, text)
+        w = self.widths.get(key)
+        if w is not None:
+            self.widths.move_to_end(key)
+            return w
+        metrics = self.metrics.get(font_key)
+        if metrics is None:
+            metrics = self.metrics[font_key] = QFontMetrics(font)
+        w = self.widths[key] = metrics.width(text)
+        if len(self.widths) > self.size:
+            self.widths.popitem(last=False)
+        return w
+
+    def max_width(self, texts, font):
+        return max((self.width(t, font) for t in texts), default=0)
+
+    def clear(self):
+        self.widths.clear()
+        self.metrics.clear()
+
+
+_cache = None
+
+
+def text_widths():
+    global _cache
+    if _cache is None:
+        _cache = TextWidthCache()
+    return _cache
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+import question_types
+
+
+def widget_class(q):
+    """题目对应的控件类，未知题型返回 None；控件模块在第一次用到时才导入"""
+    qtype = question_types.of(q)
+    return qtype.widget_class(q) if qtype is not None else None
+
+
+def prepare_question(q, rng=None):
+    """换题前可以提前算好的布局数据（乱序映射、列宽等），没有则返回 None"""
+    qtype = question_types.of(q)
+    return qtype.prepare(q, rng) if qtype is not None else None
+
+
+class WidgetPool:
+    """每种题型控件只建一个，换题时调用 bind 重新绑定题目和作答"""
+
+    def __init__(self, save_callback):
+        self.save_callback = save_callback
+        self.widgets = {}
+
+    def acquire(self, cls, q, answer, show_answer, plan=None):
+        """返回 (控件, 是否新建)"""
+        widget = self.widgets.get(cls)
+        if widget is None:
+            widget = self.widgets[cls] = cls(q, answer, show_answer, self.save_callback, plan)
+            return widget, True
+        widget.bind(q, answer, show_answer, plan)
+        return widget, False
+
+
+class PlanCache:
+    """按题号缓存 prepare_question 的结果，只保留最近几题；
+    给了 paper（ExamPaper）时乱序由卷子种子决定，淘汰后重新生成的布局也不变"""
+
+    def __init__(self, questions, size=8, paper=None):
+        self.questions = questions
+        self.size = size
+        self.paper = paper
+        self.plans = OrderedDict()
+
+    def get(self, idx):
+        if idx in self.plans:
+            self.plans.move_to_end(idx)
+            return self.plans[idx]
+        rng = self.paper.layout(idx) if self.paper is not None else None
+        plan = self.plans[idx] = prepare_question(self.questions[idx], rng)
+        if len(self.plans) > self.size:
+            self.plans.popitem(last=False)
+        return plan
+
+    def prefetch(self, *indices):
+        for idx in indices:
+            if 0 <= idx < len(self.questions):
+                self.get(idx)